@@ -1,5 +1,6 @@
 import os
 import sys
+import streamlit as st
 from dotenv import load_dotenv
 
 # Add the project root to Python path to make src imports work
@@ -11,7 +12,45 @@ from src.agents.research_agent import ResearchAgent
 from src.agents.editor_agent import EditorAgent
 from src.ui.app import run_app
 from src.utils.tracing import start_tracing, end_tracing
-from src.utils.azure_client import get_azure_openai_client, get_model_name
+from src.utils.azure_client import get_azure_openai_client, get_async_azure_openai_client, get_model_name, prewarm_connections
+
+@st.cache_resource
+def get_azure_clients():
+    """
+    Create the Azure OpenAI clients once per process.
+    
+    Streamlit re-runs this script on every interaction; caching the clients
+    keeps their connection pools (and open connections) across reruns and
+    sessions.
+    
+    Returns:
+        Tuple of (client, async_client, model_name)
+    """
+    azure_client = get_azure_openai_client()
+    async_azure_client = get_async_azure_openai_client()
+    model_name = get_model_name()
+    prewarm_connections()
+    return azure_client, async_azure_client, model_name
+
+def get_agents():
+    """
+    Return this browser session's agents, creating them on its first run.
+    
+    Agents hold per-user state (uploaded documents, persona, compiled
+    report), so they live in session state rather than the process-wide
+    resource cache. They share the cached clients.
+    
+    Returns:
+        Tuple of (triage_agent, research_agent, editor_agent)
+    """
+    if "agents" not in st.session_state:
+        azure_client, async_azure_client, model_name = get_azure_clients()
+        st.session_state.agents = (
+            TriageAgent(client=azure_client, model_name=model_name, async_client=async_azure_client),
+            ResearchAgent(client=azure_client, model_name=model_name, async_client=async_azure_client),
+            EditorAgent(client=azure_client, model_name=model_name, async_client=async_azure_client)
+        )
+    return st.session_state.agents
 
 def main():
     # Load environment variables
@@ -20,15 +59,9 @@ def main():
     # Start tracing
     start_tracing()
     
-    # Get Azure OpenAI client and model name
-    azure_client = get_azure_openai_client()
-    model_name = get_model_name()
+    # Initialize agents with the shared Azure clients
+    triage_agent, research_agent, editor_agent = get_agents()
     
-    # Initialize agents with Azure client
-    triage_agent = TriageAgent(client=azure_client, model_name=model_name)
-    research_agent = ResearchAgent(client=azure_client, model_name=model_name)
-    editor_agent = EditorAgent(client=azure_client, model_name=model_name)
-
     try:
         # Run the Streamlit application
         run_app(triage_agent, research_agent, editor_agent)
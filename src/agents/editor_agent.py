@@ -1,17 +1,22 @@
 from openai import AzureOpenAI
 import json
+from src.utils.async_utils import run_sync, create_chat_completion_async
+from src.utils.azure_client import get_task_deployment
+from src.utils.token_budget import TokenBudget, count_tokens, truncate_to_tokens, plan_call
 
 class EditorAgent:
-    def __init__(self, client=None, model_name=None):
+    def __init__(self, client=None, model_name=None, async_client=None):
         """
         Initialize the Editor Agent.
         
         Args:
             client: The Azure OpenAI client
             model_name: The deployment name to use
+            async_client: Optional asyncio Azure OpenAI client
         """
         self.report = None
         self.client = client
+        self.async_client = async_client
         self.model_name = model_name
         self.persona_prompt = "You are a research editor that creates well-structured, informative reports."
         print(f"EditorAgent initialized with deployment: {model_name}")
@@ -40,62 +45,151 @@ class EditorAgent:
         return organized_facts
 
     def generate_report(self, query, include_visuals=False, include_counter_points=False, max_tokens=3000):
+        """Generate a final report using Azure OpenAI (synchronous facade over generate_report_async)."""
+        return run_sync(self.generate_report_async(
+            query,
+            include_visuals=include_visuals,
+            include_counter_points=include_counter_points,
+            max_tokens=max_tokens
+        ))
+
+    async def generate_report_async(self, query, include_visuals=False, include_counter_points=False, max_tokens=3000):
         """Generate a final report using Azure OpenAI with additional options."""
-        if self.report is None:
-            raise ValueError("No report compiled. Please compile the report first.")
-        
-        # Convert organized facts to text format
-        report_sections = []
-        for category, facts in self.report.items():
-            section_facts = "\n".join([f"- {fact.get('fact', 'No fact provided')} (Source: {fact.get('source', 'Unknown')})" for fact in facts])
-            report_sections.append(f"## {category}\n{section_facts}")
+        facts_text, messages = self._build_report_messages(query, include_visuals, include_counter_points, max_tokens)
         
-        facts_text = "\n\n".join(report_sections)
+        # Use Azure OpenAI to generate a coherent report
+        try:
+            response = await create_chat_completion_async(
+                self.client,
+                self.async_client,
+                model=get_task_deployment("editor.report", self.model_name),
+                messages=messages,
+                temperature=0.5,
+                max_tokens=plan_call("editor.report", messages, max_tokens)
+            )
+            
+            return response.choices[0].message.content
+            
+        except Exception as e:
+            print(f"Error generating report: {e}")
+            # Fallback to basic report
+            return self._fallback_report(query, facts_text)
+
+    def generate_report_stream(self, query, include_visuals=False, include_counter_points=False, max_tokens=3000):
+        """
+        Generate the final report, yielding Markdown deltas as they arrive.
         
-        # Build prompt with options
-        prompt = f"""
-        Generate a comprehensive research report about "{query}" based on the following facts:
+        Takes the same options as generate_report(). If the request fails
+        before any text has arrived, the fallback report is yielded instead.
         
-        {facts_text}
+        Args:
+            query: The research query
+            include_visuals: Ask for suggested charts and visual aids
+            include_counter_points: Ask for a counter-arguments section
+            max_tokens: Maximum tokens for the report
+            
+        Yields:
+            Chunks of report Markdown, in order
+        """
+        facts_text, messages = self._build_report_messages(query, include_visuals, include_counter_points, max_tokens)
         
-        Format the report with the following sections:
-        1. Executive Summary
-        2. Key Findings
-        3. Detailed Analysis
-        4. Conclusions
-        5. References
+        received_text = False
+        try:
+            stream = self.client.chat.completions.create(
+                model=get_task_deployment("editor.report_stream", self.model_name),
+                messages=messages,
+                temperature=0.5,
+                max_tokens=plan_call("editor.report_stream", messages, max_tokens),
+                stream=True
+            )
+            
+            for chunk in stream:
+                # Azure sends content-filter results in chunks without choices
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    received_text = True
+                    yield delta
+                    
+        except Exception as e:
+            print(f"Error streaming report: {e}")
+            if not received_text:
+                yield self._fallback_report(query, facts_text)
+
+    def _build_report_messages(self, query, include_visuals=False, include_counter_points=False, max_tokens=3000):
+        """
+        Build the report messages from the compiled facts.
         
-        For the references section, properly list all sources cited in the research.
-        Make sure each fact is properly attributed to its source in the text.
+        The facts are trimmed to whatever fits the context window once
+        `max_tokens` of output and the instructions are accounted for.
         
-        Format the report in Markdown. Use proper headings, bullet points, and links.
-        Use markdown links for citations where appropriate.
+        Returns:
+            Tuple of (facts_text, messages)
         """
+        if self.report is None:
+            raise ValueError("No report compiled. Please compile the report first.")
         
-        if include_visuals:
-            prompt += "\n\nSuggest what kinds of charts, graphs, or visual aids would complement this report and why."
+        # Convert organized facts to text format
+        report_sections = []
+        for category, facts in self.report.items():
+            section_facts = "\n".join([f"- {fact.get('fact', 'No fact provided')} (Source: {self._cite(fact)})" for fact in facts])
+            report_sections.append(f"## {category}\n{section_facts}")
         
-        if include_counter_points:
-            prompt += "\n\nInclude a section on alternative perspectives or counter-arguments to provide a balanced view."
+        facts_text = "\n\n".join(report_sections)
         
-        # Use Azure OpenAI to generate a coherent report
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": self.persona_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.5,
-                max_tokens=max_tokens
-            )
+        def build_prompt(facts_text):
+            # Build prompt with options
+            prompt = f"""
+            Generate a comprehensive research report about "{query}" based on the following facts:
             
-            return response.choices[0].message.content
+            {facts_text}
             
-        except Exception as e:
-            print(f"Error generating report: {e}")
-            # Fallback to basic report
-            return f"""
+            Format the report with the following sections:
+            1. Executive Summary
+            2. Key Findings
+            3. Detailed Analysis
+            4. Conclusions
+            5. References
+            
+            For the references section, properly list all sources cited in the research.
+            Make sure each fact is properly attributed to its source in the text.
+            
+            Format the report in Markdown. Use proper headings, bullet points, and links.
+            Use markdown links for citations where appropriate.
+            """
+            
+            if include_visuals:
+                prompt += "\n\nSuggest what kinds of charts, graphs, or visual aids would complement this report and why."
+            
+            if include_counter_points:
+                prompt += "\n\nInclude a section on alternative perspectives or counter-arguments to provide a balanced view."
+            
+            return prompt
+        
+        # Fit the facts into what's left of the context window
+        instruction_tokens = count_tokens(self.persona_prompt) + count_tokens(build_prompt("")) + 20
+        facts_budget = TokenBudget().input_tokens_available(max_tokens, used_tokens=instruction_tokens)
+        facts_text = truncate_to_tokens(facts_text, facts_budget)
+        
+        messages = [
+            {"role": "system", "content": self.persona_prompt},
+            {"role": "user", "content": build_prompt(facts_text)}
+        ]
+        return facts_text, messages
+
+    def _cite(self, fact):
+        """Format a fact's sources, with the page range for facts taken from an uploaded document."""
+        citation = ", ".join(fact.get("sources") or [fact.get("source", "Unknown")])
+        location = fact.get("location")
+        if location:
+            first, last = location.get("page", 1), location.get("last_page", location.get("page", 1))
+            citation += f", p. {first}" if first == last else f", pp. {first}-{last}"
+        return citation
+
+    def _fallback_report(self, query, facts_text):
+        """Basic report used when the model can't be reached."""
+        return f"""
             # Research Report: {query}
             
             ## Executive Summary
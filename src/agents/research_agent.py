@@ -1,20 +1,58 @@
-import json
+import asyncio
+import hashlib
+import time
 from openai import AzureOpenAI
 from src.utils.azure_client import get_azure_openai_client, get_deployment_name
-from src.utils.document_handler import chunk_text
+from src.utils.azure_client import get_max_concurrency, get_task_deployment, get_cascade_deployment
+from src.utils.async_utils import run_sync, iter_sync, iterate_with_concurrency, create_json_completion_async
+from src.utils.bm25 import BM25Index
+from src.utils.chunk_executor import ChunkExecutor
+from src.utils.config import get_env_bool, get_env_float, get_env_int
+from src.utils.document_handler import chunk_document
+from src.utils.document_store import document_digest
+from src.utils.extraction_cache import ExtractionCache, get_extraction_cache
+from src.utils.fact_dedup import FactDeduplicator
+from src.utils.fact_store import get_fact_store
+from src.utils.structured_output import FACTS_SCHEMA, PACKED_FACTS_SCHEMA, json_schema_format
+from src.utils.structured_output import validate_facts, validate_packed_facts
+from src.utils.token_budget import TokenBudget, count_tokens, plan_call
+
+# Output tokens reserved for the facts of each chunk in a packed request
+PACKED_OUTPUT_TOKENS_PER_CHUNK = 400
 
 class ResearchAgent:
-    def __init__(self, client=None, model_name=None):
+    def __init__(self, client=None, model_name=None, async_client=None, max_concurrency=None, pack_chunks=None):
         """
         Initialize the Research Agent.
         
         Args:
             client: The Azure OpenAI client
             model_name: The deployment name to use
+            async_client: Optional asyncio Azure OpenAI client
+            max_concurrency: Maximum concurrent chat completions (defaults to AZURE_MAX_CONCURRENCY)
+            pack_chunks: Send several document chunks per request (defaults to RESEARCH_PACK_CHUNKS)
         """
         self.facts = []
         self.client = client
+        self.async_client = async_client
         self.model_name = model_name
+        self.max_concurrency = max_concurrency or get_max_concurrency()
+        self.pack_chunks = get_env_bool("RESEARCH_PACK_CHUNKS", True) if pack_chunks is None else pack_chunks
+        self.max_chunks_per_request = get_env_int("RESEARCH_MAX_CHUNKS_PER_REQUEST", 20)
+        self.chunk_tokens = get_env_int("DOCUMENT_CHUNK_TOKENS", 250)
+        self.chunk_overlap_tokens = get_env_int("DOCUMENT_CHUNK_OVERLAP_TOKENS", 0)
+        self.top_k_chunks = get_env_int("DOCUMENT_TOP_K_CHUNKS", 8)
+        self.chunk_retries = get_env_int("RESEARCH_CHUNK_RETRIES", 2)
+        self.chunk_progress = {}
+        self.document_indexes = {}
+        self.dedup_facts = get_env_bool("RESEARCH_DEDUP_FACTS", True)
+        self.dedup_threshold = get_env_float("FACT_DEDUP_THRESHOLD", 0.7)
+        self.fact_store = get_fact_store()
+        self.extraction_cache = get_extraction_cache()
+        self.fact_reuse_max_age = get_env_float("FACT_REUSE_MAX_AGE_HOURS", 24) * 3600
+        self.rerun_max_age = get_env_float("RESEARCH_RERUN_MAX_AGE_HOURS", 24) * 3600
+        self.topic = None
+        self.last_run = None
         self.document_content = None
         self.persona_prompt = "You are a research assistant that provides factual information."
         print(f"ResearchAgent initialized with deployment: {model_name}")
@@ -24,138 +62,398 @@ class ResearchAgent:
         self.persona_prompt = persona_prompt
         print(f"Persona set to: {persona_prompt[:50]}...")
 
-    def gather_information(self, query):
+    def gather_information(self, query, search_queries=None):
         """
         Gather information related to the query.
         
+        Synchronous facade over gather_information_async() for Streamlit.
+        
         Args:
             query: The research query
+            search_queries: Optional sub-queries from the research plan
+            
+        Returns:
+            A list of facts
+        """
+        return run_sync(self.gather_information_async(query, search_queries))
+
+    async def gather_information_async(self, query, search_queries=None):
+        """
+        Gather information related to the query.
+        
+        Args:
+            query: The research query
+            search_queries: Optional sub-queries from the research plan
             
         Returns:
             A list of facts
         """
         print(f"Gathering information for query: {query}")
+        self.topic = query
         
         # If we have document content, use that for research
         if self.document_content:
-            return self.research_from_document(query)
+            return await self.research_from_document_async(query)
         else:
             # For now, let's generate some mock facts
             # In a real implementation, this would use web search APIs
-            return self.research_from_web(query)
+            return await self.research_from_web_async(query, search_queries)
 
-    def research_from_web(self, query):
-        """Generate research facts from web search (simulation)."""
-        # Mock search queries
-        search_queries = [f"{query} overview", f"{query} recent studies", f"{query} key facts"]
-        mock_facts = []
+    def gather_information_incremental(self, query, search_queries, documents=None, previous_run=None, focus_areas=None):
+        """
+        Gather facts, reusing whatever the previous run already gathered.
+        
+        Synchronous facade over gather_information_incremental_async() for Streamlit.
+        """
+        return run_sync(self.gather_information_incremental_async(query, search_queries, documents, previous_run, focus_areas))
+
+    async def gather_information_incremental_async(self, query, search_queries, documents=None, previous_run=None, focus_areas=None):
+        """
+        Gather facts, reusing whatever the previous run already gathered.
+        
+        Collects stream_information_incremental_async() into a list.
+        
+        Args:
+            query: The research topic
+            search_queries: Sub-queries from the research plan
+            documents: Dictionary of document name to text or DocumentHandle
+            previous_run: The run returned by the previous call, or None for a full run
+            focus_areas: Optional focus areas from the research plan, used to pick document chunks
+            
+        Returns:
+            Tuple of (facts, run); pass `run` as previous_run next time
+        """
+        facts = [
+            fact async for fact in
+            self.stream_information_incremental_async(query, search_queries, documents, previous_run, focus_areas)
+        ]
+        return facts, self.last_run
+
+    def stream_information_incremental(self, query, search_queries, documents=None, previous_run=None, focus_areas=None):
+        """
+        Yield facts as they are gathered, reusing whatever the previous run already gathered.
+        
+        Synchronous facade over stream_information_incremental_async() for
+        Streamlit; each fact reaches the script as soon as it is ready.
+        """
+        return iter_sync(self.stream_information_incremental_async(query, search_queries, documents, previous_run, focus_areas))
+
+    async def stream_information_incremental_async(self, query, search_queries, documents=None, previous_run=None, focus_areas=None):
+        """
+        Yield facts as each sub-query or document chunk finishes, reusing the previous run's work.
+        
+        The sub-queries and documents are diffed against `previous_run`. Only
+        new or stale sub-queries (older than rerun_max_age) are researched,
+        and only new documents are extracted. Facts for sub-queries or
+        documents no longer present are dropped. Reused facts are yielded
+        first, then new ones in the order their requests complete.
+        
+        With dedup_facts on, a near-duplicate of a fact already yielded is not
+        yielded again; its sources are added to the earlier fact instead, so
+        callers holding that fact see the merged "sources".
         
+        When the stream ends, `facts` holds every yielded fact and `last_run`
+        the run to pass as previous_run next time.
+        
+        Only the document chunks most relevant to the topic, sub-queries and
+        focus areas are extracted (see top_k_chunks).
+        
+        Args:
+            query: The research topic
+            search_queries: Sub-queries from the research plan
+            documents: Dictionary of document name to text or DocumentHandle
+            previous_run: The run from a previous call, or None for a full run
+            focus_areas: Optional focus areas from the research plan
+            
+        Yields:
+            Fact dictionaries
+        """
+        print(f"Gathering information for query: {query}")
+        self.topic = query
+        documents = documents or {}
+        previous_run = previous_run or {}
+        previous_queries = previous_run.get("queries", {})
+        previous_documents = previous_run.get("documents", {})
+        fresh_after = time.time() - self.rerun_max_age
+        
+        run = {"topic": query, "queries": {}, "documents": {}}
+        for search_query in search_queries:
+            entry = previous_queries.get(search_query)
+            if entry is not None and entry["gathered_at"] >= fresh_after:
+                run["queries"][search_query] = entry
+        new_queries = [search_query for search_query in search_queries if search_query not in run["queries"]]
+        
+        # Document facts depend on the topic in the prompt and on the chunks retrieved for the
+        # plan, so either changing means a new key
+        retrieval_query = " ".join([query, *search_queries, *(focus_areas or [])])
+        document_scope = retrieval_query if self.top_k_chunks > 0 else query
+        document_keys = {
+            name: hashlib.sha256(f"{document_scope.strip().lower()}\n{document_digest(content)}".encode("utf-8")).hexdigest()
+            for name, content in documents.items()
+        }
+        for name, key in document_keys.items():
+            if key in previous_documents:
+                run["documents"][key] = previous_documents[key]
+        new_documents = [name for name, key in document_keys.items() if key not in run["documents"]]
+        
+        self.chunk_progress = {}
+        print(
+            f"Researching {len(new_queries)} of {len(search_queries)} sub-queries and "
+            f"{len(new_documents)} of {len(documents)} documents; reusing the rest"
+        )
+        
+        deduplicator = FactDeduplicator(threshold=self.dedup_threshold) if self.dedup_facts else None
+        facts = []
+        
+        def admit(batch):
+            """Return the facts in `batch` that aren't near-duplicates of earlier ones."""
+            admitted = []
+            for fact in batch:
+                if deduplicator is not None:
+                    known = len(deduplicator.facts)
+                    fact = deduplicator.add(fact)
+                    if len(deduplicator.facts) == known:
+                        continue
+                admitted.append(fact)
+            facts.extend(admitted)
+            return admitted
+        
+        reused = [run["queries"][q]["facts"] for q in search_queries if q in run["queries"]]
+        reused += [entry["facts"] for entry in run["documents"].values()]
+        for batch in reused:
+            for fact in admit(batch):
+                yield fact
+        
+        # Web research and each document feed one queue so facts are yielded in completion order.
+        # They share one semaphore, so max_concurrency caps the agent's requests across all of them
+        queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+        
+        async def produce_web():
+            try:
+                async for search_query, batch in self._stream_web_facts_async(query, new_queries, semaphore):
+                    run["queries"][search_query] = {"facts": batch, "gathered_at": time.time()}
+                    queue.put_nowait(batch)
+            except Exception as e:
+                print(f"Error gathering information: {e}")
+        
+        async def produce_document(name):
+            document_facts = []
+            executor = self._chunk_executor(name, semaphore)
+            try:
+                async for batch in self._stream_document_facts_async(query, documents[name], retrieval_query, executor):
+                    for fact in batch:
+                        fact["document"] = name
+                    document_facts.extend(batch)
+                    queue.put_nowait(batch)
+            except Exception as e:
+                print(f"Error extracting from document '{name}': {e}")
+                return
+            if executor.failures:
+                # Keep the facts already yielded, but extract the document again next run
+                print(f"{len(executor.failures)} of {executor.total} extractions from '{name}' failed")
+                return
+            run["documents"][document_keys[name]] = {"name": name, "facts": document_facts, "gathered_at": time.time()}
+        
+        producers = [asyncio.ensure_future(produce_web())]
+        producers += [asyncio.ensure_future(produce_document(name)) for name in new_documents]
+        finished = asyncio.gather(*producers)
+        finished.add_done_callback(lambda _: queue.put_nowait(None))
         try:
-            for search_query in search_queries:
-                prompt = f"""
-                Generate 3 factual pieces of information about "{query}".
-                Format each fact as a JSON object with the following structure:
-                {{
-                    "fact": "the factual statement",
-                    "source": "a plausible website URL where this information might be found",
-                    "category": "a relevant category for this fact"
-                }}
-                Return an array of these facts.
-                """
-                
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=[
-                        {"role": "system", "content": self.persona_prompt},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.3,
-                    max_tokens=800,
-                    response_format={"type": "json_object"}
-                )
-                
-                result = json.loads(response.choices[0].message.content)
-                if "facts" in result:
-                    mock_facts.extend(result["facts"])
-                else:
-                    # Handle case where the model didn't return in expected format
-                    for key, value in result.items():
-                        if isinstance(value, list):
-                            mock_facts.extend(value)
-        except Exception as e:
-            print(f"Error gathering information: {e}")
-            # Fallback to default facts
-            mock_facts = [
-                {
-                    "fact": f"This is a sample fact about {query}",
-                    "source": "https://example.com/sample",
-                    "category": "General"
-                },
-                {
-                    "fact": f"Another example fact related to {query}",
-                    "source": "https://research.org/example",
-                    "category": "Background"
-                }
-            ]
+            while True:
+                batch = await queue.get()
+                if batch is None:
+                    break
+                for fact in admit(batch):
+                    yield fact
+        finally:
+            finished.cancel()
+        
+        if deduplicator is not None and deduplicator.duplicates:
+            print(f"Merged {deduplicator.duplicates} near-duplicate facts")
+        if not facts:
+            for fact in admit(self._fallback_facts(query)):
+                yield fact
+        
+        self.facts = facts
+        self.last_run = run
+
+    def research_from_web(self, query, search_queries=None):
+        """Generate research facts from web search (simulation)."""
+        return run_sync(self.research_from_web_async(query, search_queries))
+
+    async def research_from_web_async(self, query, search_queries=None):
+        """
+        Generate research facts from web search (simulation).
+        
+        Issues one extraction per search query concurrently, bounded by
+        max_concurrency, and merges the results in query order. Each fact is
+        tagged with the search query that produced it. Sub-queries with fresh
+        facts in the fact store reuse those instead of calling the model, and
+        newly gathered facts are added to the store.
+        
+        Args:
+            query: The main research topic
+            search_queries: Sub-queries to research, usually the triage plan's
+                search_queries. Defaults to a generic overview/studies/facts set.
+            
+        Returns:
+            A list of facts
+        """
+        if not search_queries:
+            search_queries = [f"{query} overview", f"{query} recent studies", f"{query} key facts"]
+        
+        facts_by_query = await self._gather_web_facts_async(query, search_queries)
+        mock_facts = self._merge_fact_lists(
+            [facts_by_query[search_query] for search_query in search_queries if search_query in facts_by_query]
+        )
+        
+        if not mock_facts:
+            mock_facts = self._fallback_facts(query)
         
         self.facts = mock_facts
         return self.facts
 
+    async def _gather_web_facts_async(self, query, search_queries):
+        """
+        Gather facts for each search query, reusing fresh stored facts where possible.
+        
+        Args:
+            query: The main research topic
+            search_queries: Sub-queries to research
+            
+        Returns:
+            Dictionary of search query to its facts. Sub-queries that failed
+            are left out, so a failure only loses its own facts.
+        """
+        return {
+            search_query: facts
+            async for search_query, facts in self._stream_web_facts_async(query, search_queries)
+        }
+
+    async def _stream_web_facts_async(self, query, search_queries, semaphore=None):
+        """
+        Yield each search query's facts as soon as they are available.
+        
+        Sub-queries with fresh facts in the fact store come first; the rest
+        are researched concurrently, bounded by max_concurrency, and yielded
+        as each request completes. Sub-queries that fail are logged and
+        skipped. Newly gathered facts are added to the fact store.
+        
+        Args:
+            query: The main research topic
+            search_queries: Sub-queries to research
+            semaphore: Optional semaphore shared with the run's other requests
+            
+        Yields:
+            Tuples of (search query, facts)
+        """
+        stored = await asyncio.to_thread(self._find_stored_facts, search_queries)
+        for search_query in search_queries:
+            if search_query in stored:
+                yield search_query, stored[search_query]
+        new_queries = [search_query for search_query in search_queries if search_query not in stored]
+        
+        new_facts = []
+        try:
+            async for index, result in iterate_with_concurrency(
+                self.max_concurrency,
+                *(self._search_web_async(query, search_query) for search_query in new_queries),
+                semaphore=semaphore
+            ):
+                if isinstance(result, Exception):
+                    print(f"Error gathering information for '{new_queries[index]}': {result}")
+                    continue
+                new_facts.extend(result)
+                yield new_queries[index], result
+        finally:
+            if new_facts and self.fact_store is not None:
+                await asyncio.to_thread(self._store_facts, query, new_facts, "web")
+
+    async def _search_web_async(self, query, search_query):
+        """Generate the facts answering one search query, each tagged with that query."""
+        prompt = f"""
+        Generate 3 factual pieces of information about "{query}" that answer the search query "{search_query}".
+        Format each fact as a JSON object with the following structure:
+        {{
+            "fact": "the factual statement",
+            "source": "a plausible website URL where this information might be found",
+            "category": "a relevant category for this fact"
+        }}
+        Return a JSON object of the form {{"facts": [...]}} containing these facts.
+        """
+        
+        messages = [
+            {"role": "system", "content": self.persona_prompt},
+            {"role": "user", "content": prompt}
+        ]
+        result = await create_json_completion_async(
+            self.client,
+            self.async_client,
+            validate=validate_facts,
+            cascade_model=get_cascade_deployment("research.web"),
+            model=get_task_deployment("research.web", self.model_name),
+            messages=messages,
+            temperature=0.3,
+            max_tokens=plan_call("research.web", messages, 800),
+            response_format=json_schema_format("facts", FACTS_SCHEMA)
+        )
+        
+        facts = result["facts"]
+        for fact in facts:
+            fact["query"] = search_query
+        return facts
+
+    def _fallback_facts(self, query):
+        """Placeholder facts used when no research succeeded."""
+        return [
+            {
+                "fact": f"This is a sample fact about {query}",
+                "source": "https://example.com/sample",
+                "category": "General"
+            },
+            {
+                "fact": f"Another example fact related to {query}",
+                "source": "https://research.org/example",
+                "category": "Background"
+            }
+        ]
+
     def research_from_document(self, query):
         """
         Extract information from uploaded document based on query.
         
+        Synchronous facade over research_from_document_async() for Streamlit.
+        
         Args:
             query: The research question
             
         Returns:
             List of facts extracted from the document
         """
-        document_facts = []
+        return run_sync(self.research_from_document_async(query))
+
+    async def research_from_document_async(self, query):
+        """
+        Extract information from uploaded document based on query.
         
-        # Split document into manageable chunks to avoid token limits
-        chunks = chunk_text(self.document_content)
+        Only the top_k_chunks chunks most relevant to the query are used, and
+        chunks whose facts are in the extraction cache aren't sent again.
+        With pack_chunks enabled, as many chunks as fit the model's context
+        and output limits are sent together in one request, and the response
+        lists the facts per chunk id. Otherwise each chunk gets its own
+        request. Requests run concurrently, bounded by max_concurrency, and a
+        request that keeps failing only loses its own chunks. Every fact is
+        tagged with the chunk_id it came from.
         
+        Args:
+            query: The research question
+            
+        Returns:
+            List of facts extracted from the document
+        """
         try:
-            for i, chunk in enumerate(chunks):
-                prompt = f"""
-                Based on the following document content, extract relevant information about "{query}".
-                
-                Document content:
-                {chunk}
-                
-                Extract 3-5 key facts related to "{query}" from this text.
-                For each fact, include:
-                1. The fact itself
-                2. The source (in this case, cite it as "Uploaded Document")
-                3. A relevant category for organizing this information
-                
-                Format as a JSON array of fact objects.
-                """
-                
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=[
-                        {"role": "system", "content": self.persona_prompt},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.3,
-                    max_tokens=800,
-                    response_format={"type": "json_object"}
-                )
-                
-                try:
-                    result = json.loads(response.choices[0].message.content)
-                    if "facts" in result:
-                        document_facts.extend(result["facts"])
-                    else:
-                        # Handle case where the model didn't return in expected format
-                        for key, value in result.items():
-                            if isinstance(value, list):
-                                document_facts.extend(value)
-                except json.JSONDecodeError:
-                    print(f"Error parsing JSON from chunk {i}")
-                
+            document_facts = await self._extract_document_facts_async(query, self.document_content)
         except Exception as e:
             print(f"Error extracting from document: {e}")
             document_facts = [{
@@ -167,6 +465,370 @@ class ResearchAgent:
         self.facts = document_facts
         return self.facts
 
+    async def _extract_document_facts_async(self, query, content, retrieval_query=None):
+        """
+        Extract the facts about `query` from one document's text, in chunk order.
+        
+        Chunks whose extraction keeps failing are left out.
+        
+        Raises:
+            Exception: If every extraction request fails
+        """
+        executor = self._chunk_executor()
+        cached, units, extract = await self._document_extractions(query, content, retrieval_query)
+        facts = await executor.map_reduce(extract, units, lambda results: [fact for facts in results for fact in facts])
+        if executor.failures:
+            print(f"{len(executor.failures)} of {executor.total} extractions failed; keeping the facts from the rest")
+            if len(executor.failures) == executor.total:
+                raise executor.failures[0][1]
+        facts = [fact for facts in cached for fact in facts] + facts
+        facts.sort(key=lambda fact: fact.get("chunk_id", 0))
+        return self._merge_fact_lists([facts])
+
+    async def _stream_document_facts_async(self, query, content, retrieval_query=None, executor=None):
+        """
+        Yield the facts from one document's text as each extraction request completes.
+        
+        Failed extractions are left out; check the executor's failures afterwards.
+        
+        Args:
+            query: The research question
+            content: The document text
+            retrieval_query: Text used to pick the relevant chunks (defaults to `query`)
+            executor: ChunkExecutor to run the extractions on (defaults to a new one)
+            
+        Yields:
+            Lists of facts, each tagged with its chunk_id
+        """
+        executor = executor or self._chunk_executor()
+        cached, units, extract = await self._document_extractions(query, content, retrieval_query)
+        for facts in cached:
+            yield facts
+        async for _, facts in executor.map(extract, units):
+            yield facts
+
+    async def _document_extractions(self, query, content, retrieval_query=None):
+        """
+        Plan the extraction requests for one document.
+        
+        Chunks already in the extraction cache are served from it. With
+        pack_chunks enabled, as many of the remaining chunks as fit one
+        request are batched together; otherwise each chunk is its own request.
+        
+        Returns:
+            Tuple of (cached, units, extract): the cached facts as one list per
+            chunk, and the requests still needed, where extract(unit) is the
+            coroutine for one request
+        """
+        chunks = self._select_chunks(content, retrieval_query or query)
+        
+        cached = []
+        if self.extraction_cache is not None and chunks:
+            model = get_task_deployment(self._extraction_task(), self.model_name)
+            keys = {chunk_id: ExtractionCache.make_key(chunk.text, query, self.persona_prompt, model) for chunk_id, chunk in chunks}
+            found = await asyncio.to_thread(self.extraction_cache.get_many, keys.values())
+            for chunk_id, chunk in chunks:
+                if keys[chunk_id] in found:
+                    cached.append([dict(fact, chunk_id=chunk_id, location=chunk.location()) for fact in found[keys[chunk_id]]])
+            if found:
+                print(f"Reusing cached facts for {len(cached)} of {len(chunks)} chunks")
+                chunks = [(chunk_id, chunk) for chunk_id, chunk in chunks if keys[chunk_id] not in found]
+        
+        if self.pack_chunks:
+            return cached, self._pack_chunks(chunks), lambda batch: self._extract_packed_chunks(query, batch)
+        return cached, chunks, lambda chunk: self._extract_chunk(query, *chunk)
+
+    def _extraction_task(self):
+        """Task name (and so deployment) used for document fact extraction."""
+        return "research.document_batch" if self.pack_chunks else "research.document_chunk"
+
+    async def _cache_extracted(self, query, chunks, facts):
+        """
+        Store each chunk's facts, including chunks that had none, in the extraction cache.
+        
+        Only pass chunks whose answer is known to be complete; a chunk cached
+        with no facts is never extracted again.
+        """
+        if self.extraction_cache is None or not chunks:
+            return
+        
+        model = get_task_deployment(self._extraction_task(), self.model_name)
+        facts_by_chunk = {chunk_id: [] for chunk_id, _ in chunks}
+        for fact in facts:
+            facts_by_chunk[fact["chunk_id"]].append(fact)
+        entries = {
+            ExtractionCache.make_key(chunk.text, query, self.persona_prompt, model): facts_by_chunk[chunk_id]
+            for chunk_id, chunk in chunks
+        }
+        await asyncio.to_thread(self.extraction_cache.set_many, entries)
+
+    def _chunk_executor(self, name="document", semaphore=None):
+        """
+        Create a ChunkExecutor that reports its progress in chunk_progress[name].
+        
+        Pass the run's shared semaphore when other requests run alongside it.
+        """
+        def report(completed, total, failed):
+            self.chunk_progress[name] = {"completed": completed, "total": total, "failed": failed}
+        
+        return ChunkExecutor(self.max_concurrency, max_retries=self.chunk_retries, on_progress=report, semaphore=semaphore)
+
+    def index_document(self, content):
+        """
+        Chunk a document and build its BM25 index, once per distinct text.
+        
+        Called when a document is uploaded so research doesn't pay for it;
+        research calls it again and gets the cached index.
+        
+        Args:
+            content: The document text, or a DocumentHandle from the document store
+            
+        Returns:
+            Tuple of (chunks, BM25Index), the chunks being TextChunk records
+        """
+        key = document_digest(content)
+        if key not in self.document_indexes:
+            # Chunks of a stored document slice it from the store, so the index doesn't hold the text
+            text = content if isinstance(content, str) else content.read()
+            chunks = chunk_document(
+                text,
+                max_chunk_tokens=self.chunk_tokens,
+                overlap_tokens=self.chunk_overlap_tokens,
+                source=content
+            )
+            self.document_indexes[key] = (chunks, BM25Index([text[chunk.start:chunk.end] for chunk in chunks]))
+            print(f"Indexed document ({len(chunks)} chunks)")
+        return self.document_indexes[key]
+
+    def forget_document(self, content):
+        """Drop the cached index for a document that was removed."""
+        self.document_indexes.pop(document_digest(content), None)
+
+    def _select_chunks(self, content, retrieval_query):
+        """
+        Pick the chunks worth sending to the model.
+        
+        With top_k_chunks set, only the top_k_chunks chunks ranked highest by
+        BM25 against `retrieval_query` are kept, so a long document costs k
+        extractions instead of one per chunk.
+        
+        Returns:
+            List of (chunk_id, TextChunk) pairs in document order
+        """
+        chunks, index = self.index_document(content)
+        if self.top_k_chunks <= 0 or len(chunks) <= self.top_k_chunks:
+            return list(enumerate(chunks))
+        
+        chunk_ids = sorted(chunk_id for chunk_id, _ in index.search(retrieval_query, self.top_k_chunks))
+        print(f"Extracting from the {len(chunk_ids)} of {len(chunks)} chunks most relevant to the research plan")
+        return [(chunk_id, chunks[chunk_id]) for chunk_id in chunk_ids]
+
+    async def _extract_chunk(self, query, chunk_id, chunk):
+        """Extract facts from a single document chunk."""
+        prompt = f"""
+        Based on the following document content, extract relevant information about "{query}".
+        
+        Document content:
+        {chunk.text}
+        
+        Extract 3-5 key facts related to "{query}" from this text.
+        For each fact, include:
+        1. The fact itself
+        2. The source (in this case, cite it as "Uploaded Document")
+        3. A relevant category for organizing this information
+        
+        Return a JSON object of the form {{"facts": [{{"fact": "...", "source": "Uploaded Document", "category": "..."}}]}}.
+        """
+        
+        messages = [
+            {"role": "system", "content": self.persona_prompt},
+            {"role": "user", "content": prompt}
+        ]
+        # Invalid JSON is raised to the ChunkExecutor, which retries the chunk
+        result, complete = await create_json_completion_async(
+            self.client,
+            self.async_client,
+            validate=validate_facts,
+            cascade_model=get_cascade_deployment("research.document_chunk"),
+            model=get_task_deployment("research.document_chunk", self.model_name),
+            return_complete=True,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=plan_call("research.document_chunk", messages, 800),
+            response_format=json_schema_format("facts", FACTS_SCHEMA)
+        )
+        
+        facts = result["facts"]
+        
+        for fact in facts:
+            fact["chunk_id"] = chunk_id
+            fact["location"] = chunk.location()
+        if complete:
+            await self._cache_extracted(query, [(chunk_id, chunk)], facts)
+        return facts
+
+    async def _extract_packed_chunks(self, query, batch):
+        """
+        Extract facts from several chunks in one request.
+        
+        Args:
+            query: The research question
+            batch: List of (chunk_id, TextChunk) pairs
+            
+        Returns:
+            List of facts, each tagged with its chunk_id
+        """
+        excerpts = "\n\n".join(f'<chunk id="{chunk_id}">\n{chunk.text}\n</chunk>' for chunk_id, chunk in batch)
+        prompt = f"""
+        Based on the following document excerpts, extract relevant information about "{query}".
+        Each excerpt is wrapped in a <chunk> tag carrying its chunk id.
+        
+        {excerpts}
+        
+        For each excerpt, extract 3-5 key facts related to "{query}".
+        For each fact, include:
+        1. The fact itself
+        2. The source (in this case, cite it as "Uploaded Document")
+        3. A relevant category for organizing this information
+        
+        Return a JSON object with one entry per chunk, in this format:
+        {{
+            "chunks": [
+                {{
+                    "chunk_id": <chunk id>,
+                    "facts": [
+                        {{"fact": "the factual statement", "source": "Uploaded Document", "category": "a relevant category"}}
+                    ]
+                }}
+            ]
+        }}
+        Leave out chunks that contain nothing relevant.
+        """
+        
+        messages = [
+            {"role": "system", "content": self.persona_prompt},
+            {"role": "user", "content": prompt}
+        ]
+        chunks = dict(batch)
+        # Invalid JSON is raised to the ChunkExecutor, which retries the batch
+        result, complete = await create_json_completion_async(
+            self.client,
+            self.async_client,
+            validate=validate_packed_facts,
+            cascade_model=get_cascade_deployment("research.document_batch"),
+            model=get_task_deployment("research.document_batch", self.model_name),
+            return_complete=True,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=plan_call("research.document_batch", messages, PACKED_OUTPUT_TOKENS_PER_CHUNK * len(batch)),
+            response_format=json_schema_format("packed_facts", PACKED_FACTS_SCHEMA)
+        )
+        
+        facts = []
+        answered = []
+        for entry in result["chunks"]:
+            chunk_id = entry["chunk_id"]
+            if chunk_id not in chunks:
+                continue
+            answered.append(chunk_id)
+            for fact in entry["facts"]:
+                fact["chunk_id"] = chunk_id
+                fact["location"] = chunks[chunk_id].location()
+                facts.append(fact)
+        
+        if complete:
+            await self._cache_extracted(query, batch, facts)
+        else:
+            # Chunks after the cut-off are missing rather than empty, and the last
+            # answered chunk may have lost facts to it, so only cache the ones before
+            print(f"Answer for chunks {min(chunks)}-{max(chunks)} was cut off; caching {max(0, len(answered) - 1)} of {len(batch)} chunks")
+            kept = set(answered[:-1])
+            await self._cache_extracted(
+                query,
+                [(chunk_id, chunk) for chunk_id, chunk in batch if chunk_id in kept],
+                [fact for fact in facts if fact["chunk_id"] in kept]
+            )
+        return facts
+
+    def _pack_chunks(self, chunks):
+        """
+        Group (chunk_id, TextChunk) pairs into batches that fit a single request.
+        
+        A batch is closed when adding the next chunk would exceed the context
+        window (after reserving room for instructions and output), the output
+        token limit, or max_chunks_per_request.
+        
+        Args:
+            chunks: List of (chunk_id, TextChunk) pairs
+            
+        Returns:
+            List of batches, each a list of (chunk_id, chunk) pairs
+        """
+        budget = TokenBudget()
+        # Room for the persona, instructions and per-chunk tags
+        instruction_tokens = 400 + count_tokens(self.persona_prompt)
+        max_chunks_by_output = max(1, budget.max_output_tokens // PACKED_OUTPUT_TOKENS_PER_CHUNK)
+        max_chunks = max(1, min(self.max_chunks_per_request, max_chunks_by_output))
+        
+        batches = []
+        batch = []
+        batch_tokens = instruction_tokens
+        for chunk_id, chunk in chunks:
+            chunk_tokens = count_tokens(chunk.text) + 10
+            output_tokens = PACKED_OUTPUT_TOKENS_PER_CHUNK * (len(batch) + 1)
+            fits = chunk_tokens <= budget.input_tokens_available(output_tokens, used_tokens=batch_tokens)
+            if batch and (len(batch) >= max_chunks or not fits):
+                batches.append(batch)
+                batch = []
+                batch_tokens = instruction_tokens
+            batch.append((chunk_id, chunk))
+            batch_tokens += chunk_tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _find_stored_facts(self, search_queries):
+        """
+        Look up fresh stored facts for each search query.
+        
+        Returns:
+            Dictionary of search query to its reused facts, for the queries that had any
+        """
+        if self.fact_store is None or self.fact_reuse_max_age <= 0:
+            return {}
+        
+        stored = {}
+        for search_query in search_queries:
+            facts = self.fact_store.find_for_query(search_query, self.fact_reuse_max_age)
+            if facts:
+                for fact in facts:
+                    fact["query"] = search_query
+                stored[search_query] = facts
+                print(f"Reusing {len(facts)} stored facts for '{search_query}'")
+        return stored
+
+    def _store_facts(self, topic, facts, origin):
+        """Write facts to the fact store right away."""
+        self.fact_store.add_facts(topic, facts, origin=origin)
+        self.fact_store.flush()
+
+    def _merge_fact_lists(self, fact_lists):
+        """
+        Combine fact lists in order, merging near-duplicates unless dedup_facts is off.
+        
+        Merged facts keep the first version's text and list every source in
+        "sources".
+        """
+        if not self.dedup_facts:
+            return [fact for facts in fact_lists for fact in facts]
+        
+        deduplicator = FactDeduplicator(threshold=self.dedup_threshold)
+        for facts in fact_lists:
+            deduplicator.add_all(facts)
+        if deduplicator.duplicates:
+            print(f"Merged {deduplicator.duplicates} near-duplicate facts")
+        return deduplicator.facts
+
     def set_document_content(self, content):
         """
         Set the document content for research.
@@ -183,8 +845,17 @@ class ResearchAgent:
         print("Document content cleared")
 
     def save_facts(self):
-        """Save the collected facts for later use."""
-        print("Saving collected facts:")
-        for fact in self.facts:
-            print(f"Fact: {fact.get('fact', 'Unknown')} (Source: {fact.get('source', 'Unknown')})")
-        return self.facts
\ No newline at end of file
+        """
+        Save the collected facts to the fact store for later runs.
+        
+        Returns:
+            The collected facts
+        """
+        if self.fact_store is None:
+            print(f"Fact store disabled; not saving {len(self.facts)} facts")
+            return self.facts
+        
+        origin = "document" if self.document_content else "web"
+        self._store_facts(self.topic or "", self.facts, origin)
+        print(f"Saved {len(self.facts)} facts to the fact store")
+        return self.facts
@@ -1,17 +1,22 @@
-import json
 from src.utils.azure_client import get_azure_openai_client, get_deployment_name
+from src.utils.azure_client import get_task_deployment, get_cascade_deployment
+from src.utils.async_utils import run_sync, create_json_completion_async
+from src.utils.structured_output import PLAN_SCHEMA, json_schema_format, validate_plan
+from src.utils.token_budget import plan_call
 
 class TriageAgent:
-    def __init__(self, client=None, model_name=None):
+    def __init__(self, client=None, model_name=None, async_client=None):
         """
         Initialize the Triage Agent.
         
         Args:
             client: The Azure OpenAI client
             model_name: The deployment name to use
+            async_client: Optional asyncio Azure OpenAI client
         """
         self.research_plan = {}
         self.client = client
+        self.async_client = async_client
         self.model_name = model_name
         print(f"TriageAgent initialized with deployment: {model_name}")
 
@@ -19,6 +24,20 @@ class TriageAgent:
         """
         Create a structured research plan based on the user's query.
         
+        Synchronous facade over plan_research_async() for Streamlit.
+        
+        Args:
+            query: The research question or topic
+            
+        Returns:
+            A dictionary containing the research plan
+        """
+        return run_sync(self.plan_research_async(query))
+
+    async def plan_research_async(self, query):
+        """
+        Create a structured research plan based on the user's query.
+        
         Args:
             query: The research question or topic
             
@@ -43,20 +62,25 @@ class TriageAgent:
         """
         
         try:
-            print(f"Calling Azure OpenAI with model: {self.model_name}")
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": "You are a research planner that creates detailed research strategies."},
-                    {"role": "user", "content": prompt}
-                ],
+            model = get_task_deployment("triage.plan", self.model_name)
+            print(f"Calling Azure OpenAI with model: {model}")
+            messages = [
+                {"role": "system", "content": "You are a research planner that creates detailed research strategies."},
+                {"role": "user", "content": prompt}
+            ]
+            self.research_plan = await create_json_completion_async(
+                self.client,
+                self.async_client,
+                validate=validate_plan,
+                cascade_model=get_cascade_deployment("triage.plan"),
+                model=model,
+                messages=messages,
                 temperature=0.7,
-                max_tokens=800,
-                response_format={"type": "json_object"}
+                max_tokens=plan_call("triage.plan", messages, 800),
+                response_format=json_schema_format("research_plan", PLAN_SCHEMA)
             )
             
             print("Successfully received response from Azure OpenAI")
-            self.research_plan = json.loads(response.choices[0].message.content)
             # Ensure the required fields are present
             self.research_plan.setdefault('query', query)
             self.research_plan.setdefault('search_queries', self.generate_search_queries(query))
@@ -95,7 +119,10 @@ class TriageAgent:
             The final research report
         """
         # Execute research using the research agent
-        facts = research_agent.gather_information(self.research_plan['query'])
+        facts = research_agent.gather_information(
+            self.research_plan['query'],
+            self.research_plan.get('search_queries')
+        )
         
         # Save the facts
         research_agent.save_facts()
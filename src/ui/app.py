@@ -6,8 +6,6 @@ import base64
 from datetime import datetime
 import json
 from io import BytesIO
-import PyPDF2
-import docx2txt
 import markdown2
 import numpy as np
 from reportlab.lib.pagesizes import letter
@@ -17,6 +15,12 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from src.agents.triage_agent import TriageAgent
 from src.agents.research_agent import ResearchAgent
 from src.agents.editor_agent import EditorAgent
+from src.utils.azure_client import get_task_deployment
+from src.utils.config import get_env_int
+from src.utils.document_handler import ExtractionError, extract_text, supported_extensions
+from src.utils.document_store import get_document_store
+from src.utils.token_budget import CHARS_PER_TOKEN, TokenBudget, count_tokens, truncate_to_tokens, plan_call
+from src.utils.vector_index import VectorIndex
 
 # Additional imports for better visualizations
 import plotly.express as px
@@ -71,6 +75,8 @@ def initialize_session_state():
     """Initialize all session state variables."""
     if "uploaded_docs" not in st.session_state:
         st.session_state.uploaded_docs = {}
+    if "document_index" not in st.session_state:
+        st.session_state.document_index = VectorIndex()
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
     if "current_persona" not in st.session_state:
@@ -132,18 +138,28 @@ def show_sidebar_content(triage_agent, research_agent, editor_agent):
     # Document upload section
     st.subheader("Upload Documents")
     uploaded_file = st.file_uploader(
-        "Upload research materials (PDF, DOCX, TXT)", 
-        type=["pdf", "docx", "txt"],
+        "Upload research materials (PDF, DOCX, TXT, CSV, XLSX)", 
+        type=supported_extensions(),
         key="doc_uploader"
     )
     
     if uploaded_file is not None:
-        # Extract and store document content
-        doc_content = extract_document_text(uploaded_file)
+        # Keep only a handle in the session; the text lives once in the shared document store,
+        # and a file uploaded before (by anyone) isn't extracted again
+        document_store = get_document_store()
         doc_name = uploaded_file.name
+        upload_digest = document_store.digest_bytes(uploaded_file.getbuffer())
+        doc_content = document_store.find_upload(upload_digest, doc_name)
+        if doc_content is None:
+            extracted_text = extract_document_text(uploaded_file)
+            if extracted_text:
+                doc_content = document_store.put(extracted_text, doc_name, upload_digest)
         
         if doc_content:
             st.session_state.uploaded_docs[doc_name] = doc_content
+            # Chunk and index it now so research and chat only have to rank the chunks
+            chunks, _ = research_agent.index_document(doc_content)
+            st.session_state.document_index.add(doc_name, doc_content, chunks)
             st.success(f"Successfully uploaded: {doc_name}")
             
     # Show uploaded documents
@@ -155,7 +171,8 @@ def show_sidebar_content(triage_agent, research_agent, editor_agent):
                 st.write(f"📄 {doc_name}")
             with col2:
                 if st.button("Remove", key=f"remove_{doc_name}"):
-                    del st.session_state.uploaded_docs[doc_name]
+                    research_agent.forget_document(st.session_state.uploaded_docs.pop(doc_name))
+                    st.session_state.document_index.remove(doc_name)
                     st.rerun()
     
     # Help information
@@ -199,6 +216,11 @@ def show_research_tab(triage_agent, research_agent, editor_agent):
         with col2:
             include_visuals = st.checkbox("Suggest visualizations", value=True)
             include_counter_points = st.checkbox("Include counter perspectives", value=True)
+            incremental = st.checkbox(
+                "Only research what changed",
+                value=True,
+                help="Reuse the last run's plan and facts; research only new sub-queries and new documents"
+            )
     
     # Start research button
     if st.button("Start Research", key="start_research", type="primary"):
@@ -212,7 +234,8 @@ def show_research_tab(triage_agent, research_agent, editor_agent):
                 st.session_state.uploaded_docs,
                 depth,
                 include_visuals,
-                include_counter_points
+                include_counter_points,
+                incremental
             )
         else:
             st.warning("Please enter a research topic.")
@@ -881,7 +904,12 @@ def show_chat_tab(research_agent):
                 # Show thinking indicator
                 with st.spinner("Thinking..."):
                     # Generate response based on uploaded documents
-                    answer = generate_document_response(user_question, st.session_state.uploaded_docs, research_agent)
+                    answer = generate_document_response(
+                        user_question,
+                        st.session_state.uploaded_docs,
+                        research_agent,
+                        st.session_state.document_index
+                    )
                 
                 # Add assistant response to chat history
                 st.session_state.chat_history.append({"role": "assistant", "content": answer})
@@ -927,29 +955,20 @@ def show_about_tab():
 
 def extract_document_text(uploaded_file):
     """Extract text from uploaded documents."""
-    file_type = uploaded_file.name.split('.')[-1].lower()
+    status = st.empty()
+    
+    def report_pages(pages):
+        # Large PDFs stream their pages in; show how far along they are
+        if pages % 25 == 0:
+            status.text(f"Extracted {pages} pages of {uploaded_file.name}...")
     
     try:
-        if file_type == 'pdf':
-            pdf_reader = PyPDF2.PdfReader(uploaded_file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            return text
-        
-        elif file_type == 'docx':
-            text = docx2txt.process(uploaded_file)
-            return text
-        
-        elif file_type == 'txt':
-            text = uploaded_file.read().decode('utf-8')
-            return text
-        
-        else:
-            return None
-    except Exception as e:
+        return extract_text(uploaded_file, uploaded_file.name, uploaded_file.type, on_progress=report_pages)
+    except ExtractionError as e:
         st.error(f"Error processing file: {e}")
         return None
+    finally:
+        status.empty()
 
 def process_research(
     research_topic, 
@@ -959,9 +978,16 @@ def process_research(
     uploaded_docs,
     depth="Standard",
     include_visuals=True,
-    include_counter_points=True
+    include_counter_points=True,
+    incremental=False
 ):
-    """Process research request and generate a report with enhanced tracking of resources."""
+    """
+    Process research request and generate a report with enhanced tracking of resources.
+    
+    With `incremental`, the previous run in this session is reused: the plan
+    is kept if the topic is unchanged, and only new or stale sub-queries and
+    new documents are researched before the report is rewritten.
+    """
     
     # Update UI with progress
     progress_container = st.empty()
@@ -979,8 +1005,10 @@ def process_research(
     if uploaded_docs:
         status_text.text("Analyzing uploaded documents...")
         # Combine document texts (limit length for API constraints)
+        context_tokens = get_env_int("DOCUMENT_CONTEXT_TOKENS", 1250)
         for doc_name, doc_content in uploaded_docs.items():
-            context += f"\n--- Document: {doc_name} ---\n{doc_content[:5000]}\n"
+            # Only a prefix of the stored text is read; a token is rarely over 4x the average length
+            context += f"\n--- Document: {doc_name} ---\n{truncate_to_tokens(doc_content[:context_tokens * 4 * CHARS_PER_TOKEN], context_tokens)}\n"
     
     # Prepare research parameters based on depth
     max_tokens_map = {
@@ -990,8 +1018,14 @@ def process_research(
     }
     max_tokens = max_tokens_map.get(depth, 3000)
     
-    # Plan research with triage agent
-    research_plan = triage_agent.plan_research(research_topic)
+    previous_run = st.session_state.get("research_run") if incremental else None
+    
+    # Plan research with triage agent, unless this topic was just planned
+    same_topic = previous_run and previous_run["topic"].strip().lower() == research_topic.strip().lower()
+    if same_topic and st.session_state.research_plan:
+        research_plan = st.session_state.research_plan
+    else:
+        research_plan = triage_agent.plan_research(research_topic)
     
     # Save research plan to session state
     st.session_state.research_plan = research_plan
@@ -1015,108 +1049,95 @@ def process_research(
             "topic": research_topic
         })
     
-    # Track progress for each query
-    query_count = len(search_queries)
-    if query_count > 0:
-        progress_step = 50 / query_count  # 60% total for this phase - 10% for context analysis
-    else:
-        progress_step = 50
-    
     # Incorporate document content if available
     if context:
         research_agent.add_context(context)
         status_text.text("Analyzing document context...")
         progress_bar.progress(20)
     
-    # Track search progress
-    current_progress = 20
-    
-    # Process and display each search query
-    for i, query in enumerate(search_queries):
-        query_container = st.empty()
-        with query_container.container():
+    # Research every planned search query concurrently
+    queries_container = st.empty()
+    with queries_container.container():
+        for query in search_queries:
             st.markdown(f"**Searching**: {query}")
-        
-        # Update progress
-        current_progress += progress_step/2
-        progress_bar.progress(min(int(current_progress), 70))
-        status_text.text(f"Gathering information for query: {query}")
-        
-        # In a real implementation, we'd search for each query separately
-        # For now, we'll just use the gather_information method
-        query_container.empty()
+    status_text.text(f"Gathering information for {len(search_queries)} search queries...")
     
-    # Get information from research agent
-    facts = research_agent.gather_information(research_topic)
-    
-    # Save facts with search query info and timestamp
+    # Facts arrive as each search query or document chunk finishes, already deduplicated
+    # by the agent, and are enriched and categorized as they come in
+    fact_feed = st.empty()
     enriched_facts = []
-    for fact in facts:
+    categories = {}
+    last_render = 0.0
+    
+    # Reuse the previous run's facts where they still apply
+    fact_stream = research_agent.stream_information_incremental(
+        research_topic,
+        search_queries,
+        uploaded_docs,
+        previous_run,
+        focus_areas=research_plan.get("focus_areas")
+    )
+    for fact in fact_stream:
         # Add timestamp and corresponding search query if possible
         enriched_fact = fact.copy()
         enriched_fact["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        # Try to match this fact with a query
-        for query in search_queries:
-            if query.lower() in fact.get("fact", "").lower():
-                enriched_fact["query"] = query
-                break
-        else:
-            # If no specific query matched, use the main topic
-            enriched_fact["query"] = research_topic
+        # Keep the search query that produced this fact, if the agent recorded one
+        if not enriched_fact.get("query"):
+            for query in search_queries:
+                if query.lower() in fact.get("fact", "").lower():
+                    enriched_fact["query"] = query
+                    break
+            else:
+                # If no specific query matched, use the main topic
+                enriched_fact["query"] = research_topic
         
         enriched_facts.append(enriched_fact)
+        categories.setdefault(enriched_fact.get("category", "General"), []).append(enriched_fact)
+        
+        if time.monotonic() - last_render >= 0.25:
+            render_fact_feed(fact_feed, enriched_facts, research_agent.chunk_progress)
+            last_render = time.monotonic()
+    
+    st.session_state.research_run = research_agent.last_run
+    fact_feed.empty()
+    queries_container.empty()
+    progress_bar.progress(70)
     
     # Save to session state
     st.session_state.research_facts = enriched_facts
     
-    # Extract and save all unique sources
+    # Extract and save all unique sources (after the stream, once every duplicate has been merged)
     sources = set()
     for fact in enriched_facts:
-        source = fact.get("source", "Unknown")
-        if source != "Unknown":
-            sources.add(source)
+        # Merged duplicates list every source that reported them
+        for source in fact.get("sources") or [fact.get("source", "Unknown")]:
+            if source != "Unknown":
+                sources.add(source)
     
     st.session_state.research_sources = sources
     
-    # Calculate facts by category
-    categories = {}
-    for fact in enriched_facts:
-        category = fact.get("category", "General")
-        if category not in categories:
-            categories[category] = []
-        categories[category].append(fact)
-    
     st.session_state.research_categories = categories
     
     # Update progress
     progress_bar.progress(75)
-    status_text.text("Compiling final report...")
+    status_text.text("Writing final report...")
     
     # Step 3: Compiling report (25%)
     # Compile report
     editor_agent.compile_report(enriched_facts)
     
-    # Generate report with appropriate style
-    if st.session_state.current_persona == "default":
-        report = editor_agent.generate_report(
-            research_topic,
-            include_visuals=include_visuals,
-            include_counter_points=include_counter_points,
-            max_tokens=max_tokens
-        )
-    else:
-        report = editor_agent.generate_report(
-            research_topic, 
-            include_visuals=include_visuals,
-            include_counter_points=include_counter_points,
-            max_tokens=max_tokens
-        )
+    # Stream the report into the page as it is written
+    report_stream = editor_agent.generate_report_stream(
+        research_topic,
+        include_visuals=include_visuals,
+        include_counter_points=include_counter_points,
+        max_tokens=max_tokens
+    )
+    report = render_report_stream(report_stream)
     
     # Complete progress
-    for i in range(75, 101):
-        progress_bar.progress(i)
-        time.sleep(0.01)
+    progress_bar.progress(100)
     
     # Save report to session state
     st.session_state.generated_report = report
@@ -1128,15 +1149,78 @@ def process_research(
     # Show success message
     st.success("Research completed successfully!")
 
-def generate_document_response(question, documents, research_agent):
-    """Generate a response based on the uploaded documents."""
-    # Combine document content (with truncation if needed)
-    combined_text = ""
+def render_fact_feed(placeholder, facts, chunk_progress=None, limit=8):
+    """
+    Show the most recent facts gathered so far in a placeholder.
+    
+    Args:
+        placeholder: The st.empty() slot to render into
+        facts: The facts gathered so far, oldest first
+        chunk_progress: Optional ResearchAgent.chunk_progress, shown per document
+        limit: How many of the newest facts to list
+    """
+    with placeholder.container():
+        st.markdown(f"**{len(facts)} facts gathered so far**")
+        for name, progress in (chunk_progress or {}).items():
+            failed = f", {progress['failed']} failed" if progress["failed"] else ""
+            st.caption(f"📄 {name}: {progress['completed']}/{progress['total']} extraction requests done{failed}")
+        for fact in facts[-limit:][::-1]:
+            st.markdown(f"- *{fact.get('category', 'General')}*: {fact.get('fact', '')}")
+
+def render_report_stream(report_stream):
+    """
+    Render a streamed report progressively and return the full text.
+    
+    Args:
+        report_stream: Iterator of Markdown deltas from EditorAgent.generate_report_stream
+        
+    Returns:
+        The complete report Markdown
+    """
+    report_placeholder = st.empty()
+    report_parts = []
+    last_render = 0.0
+    
+    for delta in report_stream:
+        report_parts.append(delta)
+        # Re-rendering on every token floods the browser; a few updates a second reads as live
+        if time.monotonic() - last_render >= 0.1:
+            report_placeholder.markdown("".join(report_parts) + "▌")
+            last_render = time.monotonic()
+    
+    report_placeholder.empty()
+    return "".join(report_parts)
+
+def generate_document_response(question, documents, research_agent, document_index):
+    """Generate a response from the passages of the uploaded documents most relevant to the question."""
+    # Index anything uploaded before the index existed and drop removed documents
     for doc_name, content in documents.items():
-        # Add document name as context
-        combined_text += f"\n--- From document: {doc_name} ---\n"
-        # Add truncated content to avoid token limits
-        combined_text += content[:10000] + ("\n..." if len(content) > 10000 else "")
+        document_index.add(doc_name, content, research_agent.index_document(content)[0])
+    for doc_name in set(document_index.documents) - set(documents):
+        document_index.remove(doc_name)
+    
+    # The passages get whatever prompt budget is left after the answer and instructions
+    budget = TokenBudget()
+    answer_tokens = get_env_int("CHAT_ANSWER_TOKENS", 1000)
+    documents_budget = min(
+        get_env_int("CHAT_MAX_DOCUMENT_TOKENS", 2500),
+        budget.input_tokens_available(answer_tokens, used_tokens=count_tokens(question) + 200)
+    )
+    
+    # Only the top-k passages are sent, so the prompt doesn't grow with the number of documents
+    passages = []
+    used_tokens = 0
+    for doc_name, chunk, _ in document_index.search(question, get_env_int("CHAT_TOP_K_PASSAGES", 6)):
+        header = f"--- From document: {doc_name}, page {chunk.page} ---"
+        passage = f"{header}\n{chunk.text}"
+        passage_tokens = count_tokens(passage)
+        if used_tokens + passage_tokens > documents_budget:
+            if not passages:
+                passages.append(f"{header}\n{truncate_to_tokens(chunk.text, documents_budget)}\n...")
+            break
+        passages.append(passage)
+        used_tokens += passage_tokens
+    combined_text = "\n\n".join(passages)
     
     # Use research agent to answer question based on documents
     try:
@@ -1226,14 +1310,15 @@ def add_agent_methods():
                 Provide specific references to where in the documents you found the information.
                 """
                 
+                messages = [
+                    {"role": "system", "content": "You are a helpful assistant that answers questions based solely on the provided documents."},
+                    {"role": "user", "content": prompt}
+                ]
                 response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=[
-                        {"role": "system", "content": "You are a helpful assistant that answers questions based solely on the provided documents."},
-                        {"role": "user", "content": prompt}
-                    ],
+                    model=get_task_deployment("chat.documents", self.model_name),
+                    messages=messages,
                     temperature=0.3,
-                    max_tokens=1000
+                    max_tokens=plan_call("chat.documents", messages, get_env_int("CHAT_ANSWER_TOKENS", 1000))
                 )
                 
                 return response.choices[0].message.content
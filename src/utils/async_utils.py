@@ -0,0 +1,196 @@
+import asyncio
+import threading
+from src.utils.structured_output import parse_json
+
+# A single long-lived event loop shared by every synchronous caller. Async HTTP
+# clients keep connection pools that are bound to the loop they were first used
+# on, so reusing one loop keeps those pools (and their keep-alive connections)
+# valid across Streamlit reruns instead of spinning up a new loop per call.
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+def _get_background_loop():
+    """Return the shared background event loop, starting it on first use."""
+    global _loop, _loop_thread
+    
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(
+                target=_loop.run_forever,
+                name="research-agents-event-loop",
+                daemon=True
+            )
+            _loop_thread.start()
+    return _loop
+
+def run_sync(coro):
+    """
+    Run a coroutine to completion from synchronous code (e.g. a Streamlit script).
+    
+    Args:
+        coro: The coroutine to run
+    
+    Returns:
+        The coroutine's result
+    """
+    loop = _get_background_loop()
+    if threading.current_thread() is _loop_thread:
+        coro.close()
+        raise RuntimeError("run_sync() cannot be called from inside the shared event loop; await the coroutine instead")
+    
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+def iter_sync(agen):
+    """
+    Iterate an async generator from synchronous code (e.g. a Streamlit script).
+    
+    Each item is produced on the shared event loop and handed back to the
+    calling thread as soon as it is ready, so the caller can update the UI
+    between items. Abandoning the iteration closes the async generator.
+    
+    Args:
+        agen: The async generator to iterate
+    
+    Yields:
+        The generator's items
+    """
+    loop = _get_background_loop()
+    if threading.current_thread() is _loop_thread:
+        raise RuntimeError("iter_sync() cannot be called from inside the shared event loop; use async for instead")
+    
+    try:
+        while True:
+            try:
+                item = asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+async def gather_with_concurrency(limit, *coros, return_exceptions=False, semaphore=None):
+    """
+    Run coroutines concurrently with at most `limit` of them in flight at once.
+    
+    Args:
+        limit: Maximum number of coroutines running at the same time
+        *coros: The coroutines to run
+        return_exceptions: Return exceptions in the result list instead of raising
+        semaphore: Optional asyncio.Semaphore shared with other concurrent
+            work, so the limit holds across all of it; `limit` is then ignored
+    
+    Returns:
+        List of results in the same order as `coros`
+    """
+    semaphore = semaphore or asyncio.Semaphore(max(1, limit))
+
+    async def run_limited(coro):
+        async with semaphore:
+            return await coro
+    
+    return await asyncio.gather(
+        *(run_limited(coro) for coro in coros),
+        return_exceptions=return_exceptions
+    )
+
+async def iterate_with_concurrency(limit, *coros, semaphore=None):
+    """
+    Run coroutines concurrently like gather_with_concurrency(), yielding each result as it finishes.
+    
+    Exceptions are yielded in place of results so one failure doesn't stop
+    the rest. If the consumer stops early, unfinished coroutines are cancelled.
+    
+    Args:
+        limit: Maximum number of coroutines running at the same time
+        *coros: The coroutines to run
+        semaphore: Optional asyncio.Semaphore shared with other concurrent
+            work, so the limit holds across all of it; `limit` is then ignored
+    
+    Yields:
+        Tuples of (index in `coros`, result or exception), in completion order
+    """
+    semaphore = semaphore or asyncio.Semaphore(max(1, limit))
+
+    async def run_limited(index, coro):
+        async with semaphore:
+            try:
+                return index, await coro
+            except Exception as e:
+                return index, e
+    
+    tasks = [asyncio.ensure_future(run_limited(index, coro)) for index, coro in enumerate(coros)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+async def create_chat_completion_async(client, async_client, **kwargs):
+    """
+    Create a chat completion without blocking the event loop.
+    
+    Uses the async client when one is available and otherwise runs the
+    synchronous client's call on a worker thread.
+    
+    Args:
+        client: The synchronous Azure OpenAI client (may be None)
+        async_client: The asyncio Azure OpenAI client (may be None)
+        **kwargs: Arguments for chat.completions.create
+        
+    Returns:
+        The chat completion response
+    """
+    if async_client is not None:
+        return await async_client.chat.completions.create(**kwargs)
+    if client is None:
+        raise ValueError("No Azure OpenAI client configured")
+    return await asyncio.to_thread(client.chat.completions.create, **kwargs)
+
+async def create_json_completion_async(client, async_client, validate=None, cascade_model=None, return_complete=False, **kwargs):
+    """
+    Create a JSON-mode chat completion and return the parsed, validated result.
+    
+    Truncated JSON is repaired locally (see structured_output.parse_json).
+    If the response still isn't valid JSON or `validate` rejects it, the
+    request is repeated once on `cascade_model`, so a small fast deployment
+    can handle most calls and a larger one only the calls it gets wrong.
+    
+    Args:
+        client: The synchronous Azure OpenAI client (may be None)
+        async_client: The asyncio Azure OpenAI client (may be None)
+        validate: Optional callable that raises ValueError for an unusable result
+        cascade_model: Deployment to retry on after a validation failure, or None
+        return_complete: Also return whether the answer is complete: False if it
+            stopped for any reason other than "stop" or had to be repaired
+        **kwargs: Arguments for chat.completions.create
+        
+    Returns:
+        The parsed JSON response, or a tuple of (parsed JSON, complete) with return_complete
+        
+    Raises:
+        ValueError: If the response (after any cascade) isn't valid
+    """
+    def parse(response):
+        choice = response.choices[0]
+        result, repaired = parse_json(choice.message.content, validate, return_repaired=True)
+        if not return_complete:
+            return result
+        # Responses that don't report a finish reason are taken at their word
+        finish_reason = getattr(choice, "finish_reason", None)
+        return result, not repaired and finish_reason in (None, "stop")
+    
+    response = await create_chat_completion_async(client, async_client, **kwargs)
+    try:
+        return parse(response)
+    except ValueError as e:
+        if not cascade_model or cascade_model == kwargs.get("model"):
+            raise
+        print(f"Invalid JSON from {kwargs.get('model')} ({e}), escalating to {cascade_model}")
+    
+    kwargs["model"] = cascade_model
+    response = await create_chat_completion_async(client, async_client, **kwargs)
+    return parse(response)
@@ -1,18 +1,49 @@
 import os
+import threading
+import httpx
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+from openai import AzureOpenAI, AsyncAzureOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+from src.utils.async_utils import run_sync
+from src.utils.completion_cache import CachedChatClient, get_completion_cache
+from src.utils.config import get_env_bool, get_env_float, get_env_int
+from src.utils.deployment_pool import PooledChatClient, get_deployment_pool
+from src.utils.hedging import HedgedChatClient, get_hedging_policy
+from src.utils.rate_limiter import RateLimitedChatClient, wrap_with_rate_limiter
 
 # Load environment variables
 load_dotenv()
 
-def get_azure_openai_client():
+DEFAULT_MAX_CONCURRENCY = 4
+
+DEFAULT_MOCK_SERVER_URL = "http://127.0.0.1:8765"
+
+# Connections kept open to the endpoint so later calls skip the TCP/TLS handshake
+DEFAULT_HTTP_MAX_CONNECTIONS = 20
+DEFAULT_HTTP_KEEPALIVE_SECONDS = 120
+
+# Give up on a single request after this long (it is then retried)
+DEFAULT_REQUEST_TIMEOUT_SECONDS = 120.0
+
+_http_client = None
+_async_http_client = None
+_http_client_lock = threading.Lock()
+
+def _get_client_settings():
     """
-    Initialize and return Azure OpenAI client using environment variables.
+    Read and validate the Azure OpenAI connection settings from the environment.
+    
+    Returns:
+        Tuple of (azure_endpoint, api_key, api_version)
     """
-    # Get environment variables
+    api_version = os.environ.get("AZURE_API_VERSION", "2024-08-01-preview")
+    
+    # Offline target: the local stand-in from src/utils/mock_azure_server.py
+    if get_env_bool("AZURE_USE_MOCK_SERVER", False):
+        mock_endpoint = os.environ.get("AZURE_MOCK_SERVER_URL", DEFAULT_MOCK_SERVER_URL).rstrip("/")
+        return mock_endpoint, "mock-api-key", api_version
+    
     azure_endpoint = os.environ.get("AZURE_ENDPOINT")
     api_key = os.environ.get("AZURE_API_KEY")
-    api_version = os.environ.get("AZURE_API_VERSION", "2024-08-01-preview")
     
     if not azure_endpoint:
         raise ValueError("AZURE_ENDPOINT must be set in environment variables")
@@ -22,21 +53,190 @@ def get_azure_openai_client():
     
     # Ensure the endpoint doesn't already have /openai (the SDK adds it)
     if azure_endpoint.endswith("/openai"):
-        azure_endpoint = azure_endpoint.rstrip("/openai")
+        azure_endpoint = azure_endpoint[:-len("/openai")]
     
-    # Print diagnostic information
-    print(f"Connecting to Azure OpenAI at: {azure_endpoint}")
-    print(f"Using API version: {api_version}")
+    return azure_endpoint, api_key, api_version
+
+def _get_http_limits():
+    """Connection pool limits for the shared HTTP clients (AZURE_HTTP_MAX_CONNECTIONS, AZURE_HTTP_KEEPALIVE_SECONDS)."""
+    max_connections = max(1, get_env_int("AZURE_HTTP_MAX_CONNECTIONS", DEFAULT_HTTP_MAX_CONNECTIONS))
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=get_env_int("AZURE_HTTP_KEEPALIVE_SECONDS", DEFAULT_HTTP_KEEPALIVE_SECONDS)
+    )
+
+def get_http_client():
+    """
+    Return the process-wide HTTP client used by every sync Azure OpenAI client.
+    
+    Sharing one keep-alive connection pool means a new client (for example on
+    a Streamlit rerun) reuses open connections instead of handshaking again.
+    """
+    global _http_client
     
-    # Create Azure OpenAI client
-    client = AzureOpenAI(
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = DefaultHttpxClient(limits=_get_http_limits())
+    return _http_client
+
+def get_async_http_client():
+    """
+    Return the process-wide HTTP client used by every async Azure OpenAI client.
+    
+    Async connections belong to the event loop that opened them, so this
+    client is only used from the shared background loop in async_utils.
+    """
+    global _async_http_client
+    
+    with _http_client_lock:
+        if _async_http_client is None:
+            _async_http_client = DefaultAsyncHttpxClient(limits=_get_http_limits())
+    return _async_http_client
+
+def _get_endpoints():
+    """Return every endpoint the app sends requests to."""
+    pool = get_deployment_pool()
+    if pool is not None:
+        return [member.endpoint for member in pool.members]
+    azure_endpoint, _, _ = _get_client_settings()
+    return [azure_endpoint]
+
+def prewarm_connections():
+    """
+    Open a connection to each endpoint on both shared HTTP clients.
+    
+    Called once at startup so the first LLM call doesn't pay for DNS, TCP
+    and TLS setup. Failures are only logged; the real call will report them.
+    """
+    try:
+        endpoints = _get_endpoints()
+    except ValueError as e:
+        print(f"Skipping connection prewarm: {e}")
+        return
+    
+    for azure_endpoint in endpoints:
+        try:
+            get_http_client().head(azure_endpoint)
+            run_sync(get_async_http_client().head(azure_endpoint))
+            print(f"Prewarmed connections to {azure_endpoint}")
+        except Exception as e:
+            print(f"Connection prewarm failed for {azure_endpoint}: {str(e)}")
+
+def _create_raw_client(azure_endpoint, api_key, api_version, is_async=False):
+    """
+    Create an AzureOpenAI or AsyncAzureOpenAI client on the shared HTTP client.
+    
+    Retries are left to the layers in front of it, so throttled calls queue
+    on the quota (or move to another deployment) instead.
+    """
+    client_class = AsyncAzureOpenAI if is_async else AzureOpenAI
+    return client_class(
         azure_endpoint=azure_endpoint,
         api_key=api_key,
-        api_version=api_version
+        api_version=api_version,
+        max_retries=0,
+        timeout=get_env_float("AZURE_REQUEST_TIMEOUT_SECONDS", DEFAULT_REQUEST_TIMEOUT_SECONDS),
+        http_client=get_async_http_client() if is_async else get_http_client()
     )
+
+def _create_pooled_client(pool, is_async=False):
+    """
+    Create a client that spreads calls across every member of a deployment pool.
+    
+    Each member gets its own client and rate limiter. Failover between
+    members replaces per-member retries.
+    """
+    api_version = os.environ.get("AZURE_API_VERSION", "2024-08-01-preview")
+    clients = []
+    for member in pool.members:
+        print(f"Adding {member.endpoint} to the deployment pool as '{member.name}'")
+        client = _create_raw_client(member.endpoint, member.api_key, member.api_version or api_version, is_async)
+        clients.append(RateLimitedChatClient(client, member.limiter, max_retries=0))
+    
+    return PooledChatClient(
+        clients,
+        pool,
+        max_retries=get_env_int("AZURE_MAX_RETRIES", 6),
+        backoff_base=get_env_float("AZURE_BACKOFF_BASE_SECONDS", 1.0),
+        backoff_max=get_env_float("AZURE_BACKOFF_MAX_SECONDS", 60.0)
+    )
+
+def get_azure_openai_client():
+    """
+    Initialize and return Azure OpenAI client using environment variables.
+    
+    If AZURE_DEPLOYMENT_POOL is set, the client balances calls across the
+    pool's deployments instead of the single AZURE_ENDPOINT.
+    """
+    pool = get_deployment_pool()
+    if pool is not None:
+        return _wrap_client(_create_pooled_client(pool))
+    
+    azure_endpoint, api_key, api_version = _get_client_settings()
+    
+    # Print diagnostic information
+    print(f"Connecting to Azure OpenAI at: {azure_endpoint}")
+    print(f"Using API version: {api_version}")
+    
+    # Create Azure OpenAI client. Retries are handled by the rate limiter
+    # layer so throttled calls queue on the shared quota instead.
+    client = _create_raw_client(azure_endpoint, api_key, api_version)
+    
+    return _wrap_client(wrap_with_rate_limiter(client))
+
+def get_async_azure_openai_client():
+    """
+    Initialize and return an asyncio Azure OpenAI client using environment variables.
+    
+    The async client lets the agents issue independent chat completions
+    concurrently instead of waiting on each round trip in turn.
+    """
+    pool = get_deployment_pool()
+    if pool is not None:
+        return _wrap_client(_create_pooled_client(pool, is_async=True))
+    
+    azure_endpoint, api_key, api_version = _get_client_settings()
+    
+    print(f"Connecting async client to Azure OpenAI at: {azure_endpoint}")
+    
+    client = _create_raw_client(azure_endpoint, api_key, api_version, is_async=True)
+    
+    return _wrap_client(wrap_with_rate_limiter(client))
+
+def _wrap_client(client):
+    """
+    Stack the configured layers in front of a rate-limited client.
+    
+    Calls go through the response cache first, so cache hits never spend
+    rate-limit quota or get hedged. Misses then pass the optional hedging
+    layer before reaching the rate limiter (or the deployment pool), so a
+    hedge is charged against the quota like any other request.
+    
+    Args:
+        client: A RateLimitedChatClient or PooledChatClient
+        
+    Returns:
+        A client exposing the same chat.completions.create interface
+    """
+    hedging_policy = get_hedging_policy()
+    if hedging_policy is not None:
+        client = HedgedChatClient(client, hedging_policy)
+    
+    cache = get_completion_cache()
+    if cache is not None:
+        client = CachedChatClient(client, cache)
     
     return client
 
+def get_max_concurrency():
+    """
+    Return the maximum number of chat completions an agent may have in flight at once.
+    
+    Read from AZURE_MAX_CONCURRENCY, defaulting to DEFAULT_MAX_CONCURRENCY.
+    """
+    return max(1, get_env_int("AZURE_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+
 def get_model_name():
     """
     Return the deployment name from environment variables.
@@ -48,8 +248,58 @@ def get_model_name():
     print(f"Using deployment: {deployment_name}")
     return deployment_name
 
+def _lookup_task_setting(prefix, task):
+    """
+    Find the most specific `prefix`_<TASK> environment variable for a task.
+    
+    "research.document_batch" checks PREFIX_RESEARCH_DOCUMENT_BATCH, then
+    PREFIX_RESEARCH_DOCUMENT, then PREFIX_RESEARCH.
+    
+    Returns:
+        The value, or None if none of them is set
+    """
+    parts = [part for part in task.upper().replace(".", "_").split("_") if part]
+    for end in range(len(parts), 0, -1):
+        value = os.environ.get(f"{prefix}_{'_'.join(parts[:end])}")
+        if value:
+            return value
+    return None
+
+def get_task_deployment(task, default=None):
+    """
+    Return the deployment to use for a task.
+    
+    Tasks are named "<agent>.<task>" (the same names used for token budget
+    logging), so a deployment can be routed per agent with e.g.
+    AZURE_DEPLOYMENT_NAME_RESEARCH or per task with
+    AZURE_DEPLOYMENT_NAME_RESEARCH_DOCUMENT.
+    
+    Args:
+        task: Task name, e.g. "research.document_batch"
+        default: Deployment to use when no override is set (defaults to get_model_name())
+        
+    Returns:
+        The deployment name
+    """
+    return _lookup_task_setting("AZURE_DEPLOYMENT_NAME", task) or default or get_model_name()
+
+def get_cascade_deployment(task):
+    """
+    Return the larger deployment a task escalates to when its JSON fails validation.
+    
+    Configured with AZURE_CASCADE_DEPLOYMENT_NAME, optionally narrowed per
+    agent or task like get_task_deployment().
+    
+    Args:
+        task: Task name, e.g. "research.document_batch"
+        
+    Returns:
+        The deployment name, or None if the task has no cascade
+    """
+    return _lookup_task_setting("AZURE_CASCADE_DEPLOYMENT_NAME", task) or os.environ.get("AZURE_CASCADE_DEPLOYMENT_NAME") or None
+
 def get_deployment_name():
     """
     Alias for get_model_name() - returns the deployment name.
     """
-    return get_model_name()
\ No newline at end of file
+    return get_model_name()
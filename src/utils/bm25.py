@@ -0,0 +1,92 @@
+import math
+import re
+from collections import Counter
+import numpy as np
+
+# Words too common to say anything about relevance
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be been but by can could did do does for from had has have
+how if in into is it its may more most not of on or other over such than that the their them then there
+these they this those through to under was were what when where which while who why will with would you
+""".split())
+
+def tokenize(text):
+    """Split text into lowercase index terms, dropping stopwords and single characters."""
+    return [word for word in re.findall(r"\w+", text.lower()) if len(word) > 1 and word not in STOPWORDS]
+
+class BM25Index:
+    """
+    Okapi BM25 ranking over a fixed list of texts, such as a document's chunks.
+    
+    The index is an inverted list per term (text ids and term frequencies as
+    NumPy arrays), so scoring a query only touches the texts containing its
+    terms. Build it once per document and query it as often as needed.
+    """
+
+    def __init__(self, texts, k1=1.5, b=0.75):
+        """
+        Build the index.
+        
+        Args:
+            texts: The texts to rank; their positions are the ids returned by search
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        self.size = len(texts)
+        self.k1 = k1
+        
+        postings = {}
+        lengths = np.zeros(self.size)
+        for text_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths[text_id] = sum(counts.values())
+            for term, frequency in counts.items():
+                ids, frequencies = postings.setdefault(term, ([], []))
+                ids.append(text_id)
+                frequencies.append(frequency)
+        
+        average_length = lengths.mean() if self.size else 0.0
+        self._length_norm = k1 * (1 - b + b * lengths / max(average_length, 1e-9))
+        self._postings = {
+            term: (
+                np.array(ids, dtype=np.int64),
+                np.array(frequencies, dtype=np.float64),
+                math.log(1 + (self.size - len(ids) + 0.5) / (len(ids) + 0.5))
+            )
+            for term, (ids, frequencies) in postings.items()
+        }
+
+    def scores(self, query):
+        """
+        Score every text against `query`.
+        
+        Terms repeated in the query count more, with diminishing returns, so
+        words shared by several sub-queries weigh more than one-off words.
+        
+        Returns:
+            NumPy array of scores, indexed by text id
+        """
+        scores = np.zeros(self.size)
+        for term, query_frequency in Counter(tokenize(query)).items():
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            ids, frequencies, idf = posting
+            weight = idf * (1 + math.log(query_frequency))
+            scores[ids] += weight * frequencies * (self.k1 + 1) / (frequencies + self._length_norm[ids])
+        return scores
+
+    def search(self, query, k):
+        """
+        Return the `k` best-scoring texts for `query`.
+        
+        Args:
+            query: Free text
+            k: Number of results
+        
+        Returns:
+            List of (text id, score) pairs, best first; ties keep text order
+        """
+        scores = self.scores(query)
+        best = np.argsort(-scores, kind="stable")[:k]
+        return [(int(text_id), float(scores[text_id])) for text_id in best]
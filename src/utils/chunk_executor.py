@@ -0,0 +1,99 @@
+import asyncio
+import random
+from src.utils.async_utils import iterate_with_concurrency
+
+# Failures worth another attempt at the chunk: unparseable or invalid answers, and timeouts.
+# Rate-limit, server and connection errors have already been retried by the client.
+RETRYABLE_CHUNK_ERRORS = (ValueError, asyncio.TimeoutError)
+
+class ChunkExecutor:
+    """
+    Map-reduce over document chunks with bounded concurrency, retries and failure isolation.
+    
+    Each chunk (or packed batch of chunks) is mapped by an async function,
+    with at most `max_concurrency` running at once, so N chunks take about
+    N / max_concurrency round trips. A chunk whose answer can't be parsed or
+    validated, or that times out, is retried with jittered exponential
+    backoff. Other errors aren't retried here: rate-limit, server and
+    connection errors were already retried by the client, and retrying them
+    again would multiply its attempts. A chunk that still fails is recorded
+    in `failures` and left out, and the other chunks carry on.
+    """
+
+    def __init__(self, max_concurrency, max_retries=2, backoff_base=0.5, on_progress=None, semaphore=None):
+        """
+        Initialize the executor.
+        
+        Args:
+            max_concurrency: Maximum chunks being mapped at the same time
+            max_retries: Retries per chunk before it counts as failed
+            backoff_base: Base delay in seconds between retries
+            on_progress: Optional callable(completed, total, failed), called
+                after every chunk finishes or fails
+            semaphore: Optional asyncio.Semaphore shared with other work running
+                at the same time, so `max_concurrency` is a limit across all of it
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.on_progress = on_progress
+        self.semaphore = semaphore
+        self.total = 0
+        self.completed = 0
+        self.failures = []
+
+    async def _run_with_retries(self, func, item):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await func(item)
+            except RETRYABLE_CHUNK_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_base * (2 ** attempt) * random.uniform(0.5, 1.0)
+                print(f"Chunk extraction failed ({e.__class__.__name__}: {e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def map(self, func, items):
+        """
+        Map every item, yielding results as they complete.
+        
+        Args:
+            func: Async function taking one item
+            items: The chunks or batches to map
+        
+        Yields:
+            Tuples of (index in `items`, result) for the items that succeeded
+        """
+        items = list(items)
+        self.total += len(items)
+        async for index, result in iterate_with_concurrency(
+            self.max_concurrency,
+            *(self._run_with_retries(func, item) for item in items),
+            semaphore=self.semaphore
+        ):
+            failed = isinstance(result, Exception)
+            if failed:
+                self.failures.append((index, result))
+                print(f"Giving up on extraction {index + 1} of {len(items)}: {result}")
+            self.completed += 1
+            if self.on_progress is not None:
+                self.on_progress(self.completed, self.total, len(self.failures))
+            if not failed:
+                yield index, result
+
+    async def map_reduce(self, func, items, reduce):
+        """
+        Map every item, then reduce the results in the order of `items`.
+        
+        Args:
+            func: Async function taking one item
+            items: The chunks or batches to map
+            reduce: Function taking the list of successful results, in item order
+        
+        Returns:
+            Whatever `reduce` returns
+        """
+        results = {}
+        async for index, result in self.map(func, items):
+            results[index] = result
+        return reduce([results[index] for index in sorted(results)])
@@ -0,0 +1,64 @@
+import contextlib
+import contextvars
+from types import SimpleNamespace
+from openai import AsyncOpenAI
+
+# Callback of a layer that wants to know when its request leaves the rate-limit queue (see on_sent())
+_sent_callback = contextvars.ContextVar("sent_callback", default=None)
+
+@contextlib.contextmanager
+def on_sent(callback):
+    """
+    Call `callback(sent)` while the request made inside the block moves between queue and wire.
+    
+    The rate-limiting layers call report_sent(False) when a request starts
+    waiting for quota, a pool member or a retry backoff, and
+    report_sent(True) when it is actually sent, so a layer above them can
+    time the service rather than the queue.
+    
+    Args:
+        callback: Callable taking True when the request is sent and False when it waits again
+    """
+    token = _sent_callback.set(callback)
+    try:
+        yield
+    finally:
+        _sent_callback.reset(token)
+
+def report_sent(sent=True):
+    """Tell the layer above (see on_sent()) whether the current request is being sent or waiting."""
+    callback = _sent_callback.get()
+    if callback is not None:
+        callback(sent)
+
+def is_async_client(client):
+    """Return True if `client` is an asyncio OpenAI client (or a wrapper around one)."""
+    return isinstance(client, AsyncOpenAI) or getattr(client, "is_async", False)
+
+class ChatClientWrapper:
+    """
+    Base class for layers that sit in front of an OpenAI-style client.
+    
+    A wrapper exposes the same ``chat.completions.create(**kwargs)`` entry point
+    as the client it wraps, so agents use a wrapped client unchanged and
+    wrappers can be stacked. Subclasses override _create() and _create_async();
+    whichever matches the wrapped client is exposed as ``chat.completions.create``.
+    Any other attribute is delegated to the wrapped client.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.is_async = is_async_client(client)
+        create = self._create_async if self.is_async else self._create
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+    def _create(self, **kwargs):
+        return self.client.chat.completions.create(**kwargs)
+
+    async def _create_async(self, **kwargs):
+        return await self.client.chat.completions.create(**kwargs)
+
+    def __getattr__(self, name):
+        if name == "client":
+            raise AttributeError(name)
+        return getattr(self.client, name)
@@ -0,0 +1,287 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from openai.types.chat import ChatCompletion
+from src.utils.client_wrapper import ChatClientWrapper
+from src.utils.config import get_env_bool, get_env_int
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "completions.sqlite3")
+
+# Only these request fields make up the cache key. Requests using any other
+# argument (tools, n, stream, ...) are passed straight through uncached.
+CACHE_KEY_FIELDS = ("model", "messages", "temperature", "max_tokens", "response_format")
+
+# Run the disk eviction sweep once every this many writes
+EVICTION_INTERVAL = 50
+
+class CompletionCache:
+    """
+    Two-tier cache for chat completion responses.
+    
+    An in-process LRU dictionary sits in front of a SQLite database on disk.
+    The SQLite file runs in WAL mode with a busy timeout so several Streamlit
+    worker processes on one host can share it. Entries expire after
+    `ttl_seconds`, and the disk tier is trimmed least-recently-used first once
+    it grows past `max_disk_bytes`.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=86400, max_memory_entries=256, max_disk_bytes=256 * 1024 * 1024):
+        """
+        Initialize the cache.
+        
+        Args:
+            path: SQLite database file for the disk tier, or None for memory only
+            ttl_seconds: Age after which an entry is treated as a miss
+            max_memory_entries: Size of the in-process LRU tier
+            max_disk_bytes: Approximate size bound of the disk tier
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes_since_eviction = 0
+        
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connect().execute(
+                """
+                CREATE TABLE IF NOT EXISTS completions (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            self._connect().execute("CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed_at)")
+
+    def _connect(self):
+        """Return this thread's SQLite connection (sqlite3 connections are not shared across threads)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(request):
+        """
+        Build the cache key for a chat completion request.
+        
+        Args:
+            request: The keyword arguments for chat.completions.create
+        
+        Returns:
+            A hex digest, or None if the request can't be cached
+        """
+        if any(field not in CACHE_KEY_FIELDS for field in request):
+            return None
+        
+        canonical = json.dumps(
+            {field: request.get(field) for field in CACHE_KEY_FIELDS},
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+            default=str
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Look up a cached response.
+        
+        Args:
+            key: Key from make_key()
+        
+        Returns:
+            The cached ChatCompletion, or None on a miss
+        """
+        now = time.time()
+        
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return ChatCompletion.model_validate_json(value)
+                del self._memory[key]
+        
+        if self.path:
+            row = self._connect().execute(
+                "SELECT value, created_at FROM completions WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row is not None:
+                value, created_at = row
+                # Refresh the LRU timestamp at most once a minute to keep hits read-mostly
+                self._connect().execute(
+                    "UPDATE completions SET accessed_at = ? WHERE key = ? AND accessed_at < ?",
+                    (now, key, now - 60)
+                )
+                with self._lock:
+                    self._remember(key, value, created_at)
+                    self.stats["disk_hits"] += 1
+                return ChatCompletion.model_validate_json(value)
+        
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def set(self, key, response):
+        """
+        Store a response under `key` in both tiers.
+        
+        Args:
+            key: Key from make_key()
+            response: The ChatCompletion to cache
+        """
+        if not hasattr(response, "model_dump_json"):
+            return
+        
+        value = response.model_dump_json()
+        now = time.time()
+        
+        with self._lock:
+            self._remember(key, value, now)
+            self.stats["writes"] += 1
+            self._writes_since_eviction += 1
+            run_eviction = self._writes_since_eviction >= EVICTION_INTERVAL
+            if run_eviction:
+                self._writes_since_eviction = 0
+        
+        if self.path:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO completions (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now)
+            )
+            if run_eviction:
+                self.evict()
+
+    def _remember(self, key, value, created_at):
+        """Insert into the memory tier, dropping the least recently used entries. Caller holds the lock."""
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def evict(self):
+        """Drop expired disk entries, then the least recently used ones until under max_disk_bytes."""
+        if not self.path:
+            return
+        
+        conn = self._connect()
+        removed = conn.execute(
+            "DELETE FROM completions WHERE created_at < ?",
+            (time.time() - self.ttl_seconds,)
+        ).rowcount
+        
+        total_size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total_size > self.max_disk_bytes:
+            excess = total_size - self.max_disk_bytes
+            stale_keys = []
+            for key, size in conn.execute("SELECT key, size FROM completions ORDER BY accessed_at ASC"):
+                stale_keys.append((key,))
+                excess -= size
+                if excess <= 0:
+                    break
+            conn.executemany("DELETE FROM completions WHERE key = ?", stale_keys)
+            removed += len(stale_keys)
+        
+        with self._lock:
+            self.stats["evictions"] += removed
+
+    def clear(self):
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self.path:
+            self._connect().execute("DELETE FROM completions")
+
+    def get_stats(self):
+        """Return a copy of the hit/miss counters plus the overall hit rate."""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+class CachedChatClient(ChatClientWrapper):
+    """
+    Client wrapper that serves repeated chat completions from a CompletionCache.
+    
+    Pass ``use_cache=False`` to ``chat.completions.create`` to bypass the cache
+    for a single call.
+    """
+
+    def __init__(self, client, cache):
+        super().__init__(client)
+        self.cache = cache
+
+    def _create(self, use_cache=True, **kwargs):
+        key = self.cache.make_key(kwargs) if use_cache else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        response = self.client.chat.completions.create(**kwargs)
+        
+        if key is not None:
+            self.cache.set(key, response)
+        return response
+
+    async def _create_async(self, use_cache=True, **kwargs):
+        key = self.cache.make_key(kwargs) if use_cache else None
+        if key is not None:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                return cached
+        
+        response = await self.client.chat.completions.create(**kwargs)
+        
+        if key is not None:
+            await asyncio.to_thread(self.cache.set, key, response)
+        return response
+
+_completion_cache = None
+_completion_cache_lock = threading.Lock()
+
+def get_completion_cache():
+    """
+    Return the process-wide completion cache configured from the environment.
+    
+    Returns:
+        The shared CompletionCache, or None if COMPLETION_CACHE_ENABLED is false
+    """
+    global _completion_cache
+    
+    if not get_env_bool("COMPLETION_CACHE_ENABLED", True):
+        return None
+    
+    with _completion_cache_lock:
+        if _completion_cache is None:
+            _completion_cache = CompletionCache(
+                path=os.environ.get("COMPLETION_CACHE_PATH", DEFAULT_CACHE_PATH),
+                ttl_seconds=get_env_int("COMPLETION_CACHE_TTL_SECONDS", 86400),
+                max_memory_entries=get_env_int("COMPLETION_CACHE_MEMORY_ENTRIES", 256),
+                max_disk_bytes=get_env_int("COMPLETION_CACHE_MAX_DISK_MB", 256) * 1024 * 1024
+            )
+    return _completion_cache
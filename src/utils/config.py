@@ -0,0 +1,24 @@
+import os
+
+def get_env_int(name, default):
+    """Read an integer setting from the environment, falling back to `default` if unset or invalid."""
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        print(f"Invalid integer for {name}, using default: {default}")
+        return default
+
+def get_env_float(name, default):
+    """Read a float setting from the environment, falling back to `default` if unset or invalid."""
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        print(f"Invalid number for {name}, using default: {default}")
+        return default
+
+def get_env_bool(name, default):
+    """Read a boolean setting (1/true/yes/on) from the environment."""
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
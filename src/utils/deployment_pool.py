@@ -0,0 +1,405 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from src.utils.client_wrapper import ChatClientWrapper, report_sent
+from src.utils.config import get_env_float, get_env_int
+from openai import AuthenticationError, NotFoundError, PermissionDeniedError, RateLimitError
+from src.utils.rate_limiter import RETRYABLE_ERRORS, RateLimiter, get_retry_after
+
+# Errors caused by one member's key, permissions or deployment names rather than by the
+# request, so another member may well serve it
+MEMBER_ERRORS = (AuthenticationError, PermissionDeniedError, NotFoundError)
+
+# Weight of the newest observation in the health and latency averages
+HEALTH_SMOOTHING = 0.2
+
+# Members below this health score are treated as nearly saturated when balancing
+MIN_HEALTH = 0.05
+
+class PoolMember:
+    """One Azure OpenAI endpoint in a DeploymentPool, with its own quota and health."""
+
+    def __init__(self, name, endpoint, api_key, api_version=None, deployments=None, rpm=None, tpm=None):
+        """
+        Initialize the member.
+        
+        Args:
+            name: Label used in logs and stats
+            endpoint: The Azure OpenAI endpoint URL
+            api_key: Key for the endpoint
+            api_version: API version (defaults to the app-wide AZURE_API_VERSION)
+            deployments: Optional mapping of model name to this endpoint's
+                deployment name. If given, the member only serves those models.
+            rpm: This deployment's requests-per-minute quota, or None
+            tpm: This deployment's tokens-per-minute quota, or None
+        """
+        self.name = name
+        self.endpoint = endpoint.rstrip("/")
+        self.api_key = api_key
+        self.api_version = api_version
+        self.deployments = deployments
+        self.limiter = RateLimiter(requests_per_minute=rpm or None, tokens_per_minute=tpm or None)
+        self.outstanding = 0
+        self.health = 1.0
+        self.latency = None
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.trial_in_flight = False
+        self.stats = {"requests": 0, "failures": 0, "ejections": 0}
+
+    def serves(self, model):
+        """Return True if this member can serve requests for `model`."""
+        return self.deployments is None or model in self.deployments
+
+    def deployment_for(self, model):
+        """Return this member's deployment name for `model`."""
+        if self.deployments is None:
+            return model
+        return self.deployments[model]
+
+class DeploymentPool:
+    """
+    A set of Azure OpenAI deployments that share the app's traffic.
+    
+    Requests go to the member with the fewest outstanding requests, scaled by
+    its health score (a moving average of recent successes), so slow or
+    failing members get less traffic. After `failure_threshold` consecutive
+    failures (5xx, connection errors, or a 401/403/404 pointing at the
+    member's own key or deployment) its circuit opens and it is left out for
+    `cooldown_seconds`. It then gets a single trial request and rejoins if
+    that succeeds, or is left out again if it fails. 429s don't count as
+    failures: the member is only held back for the Retry-After it asked for.
+    Cancelled requests don't count either way (see cancel()).
+    """
+
+    def __init__(self, members, failure_threshold=5, cooldown_seconds=30.0):
+        """
+        Initialize the pool.
+        
+        Args:
+            members: List of PoolMember
+            failure_threshold: Consecutive failures that eject a member
+            cooldown_seconds: How long an ejected member is left out
+        """
+        if not members:
+            raise ValueError("A deployment pool needs at least one member")
+        self.members = members
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+
+    def _wait_time(self, member, now):
+        """Seconds until `member` can take a request. Caller holds the lock."""
+        wait = max(0.0, member.limiter.blocked_for())
+        if member.open_until > now:
+            wait = max(wait, member.open_until - now)
+        elif member.consecutive_failures >= self.failure_threshold and member.trial_in_flight:
+            # Half-open with its trial request still running
+            wait = max(wait, self.cooldown_seconds)
+        return wait
+
+    def acquire(self, model, exclude=()):
+        """
+        Pick a member for a request and count it as outstanding.
+        
+        Members not in `exclude` are preferred. If none can take a request
+        right now, the one that frees up soonest is returned with its wait.
+        
+        Args:
+            model: The requested model name
+            exclude: Members that already failed this request
+        
+        Returns:
+            Tuple of (member, seconds to wait before sending, whether the
+            request is the member's half-open trial); pass the last one to release()
+        """
+        with self._lock:
+            eligible = [member for member in self.members if member.serves(model)]
+            if not eligible:
+                raise ValueError(f"No deployment in the pool serves model '{model}'")
+            
+            now = time.monotonic()
+            waits = {id(member): self._wait_time(member, now) for member in eligible}
+            ready = [member for member in eligible if waits[id(member)] == 0]
+            preferred = [member for member in ready if member not in exclude] or ready
+            if preferred:
+                member = min(
+                    preferred,
+                    key=lambda m: ((m.outstanding + 1) / max(MIN_HEALTH, m.health), m.latency or 0.0)
+                )
+                wait = 0.0
+            else:
+                member = min(eligible, key=lambda m: waits[id(m)])
+                wait = waits[id(member)]
+            
+            trial = member.consecutive_failures >= self.failure_threshold and not member.trial_in_flight
+            if trial:
+                member.trial_in_flight = True
+            member.outstanding += 1
+            member.stats["requests"] += 1
+            return member, wait, trial
+
+    def release(self, member, latency=None, error=None, trial=False):
+        """
+        Record the outcome of a request sent to `member`.
+        
+        Args:
+            member: The member from acquire()
+            latency: Seconds the request took, if it succeeded
+            error: The exception if it failed with a retryable or member error
+            trial: The trial flag returned by acquire()
+        """
+        retry_after = get_retry_after(error) if error is not None else None
+        if retry_after:
+            member.limiter.block_for(retry_after)
+        
+        with self._lock:
+            member.outstanding -= 1
+            if trial:
+                member.trial_in_flight = False
+            if error is None:
+                member.health += HEALTH_SMOOTHING * (1.0 - member.health)
+                if latency is not None:
+                    member.latency = latency if member.latency is None else member.latency + HEALTH_SMOOTHING * (latency - member.latency)
+                if member.consecutive_failures >= self.failure_threshold:
+                    print(f"Deployment '{member.name}' recovered and rejoined the pool")
+                member.consecutive_failures = 0
+                return
+            
+            member.health -= HEALTH_SMOOTHING * member.health
+            member.stats["failures"] += 1
+            if isinstance(error, RateLimitError):
+                # Throttling means busy, not broken: Retry-After holds the member back instead
+                return
+            
+            member.consecutive_failures += 1
+            # Open the circuit when the threshold is first reached, or again when the trial fails;
+            # failures of requests already in flight while it is open don't extend it
+            if member.consecutive_failures == self.failure_threshold or (trial and member.consecutive_failures > self.failure_threshold):
+                cooldown = max(self.cooldown_seconds, retry_after or 0.0)
+                member.open_until = time.monotonic() + cooldown
+                member.stats["ejections"] += 1
+                print(f"Deployment '{member.name}' ejected from the pool for {cooldown:.0f}s after {member.consecutive_failures} consecutive failures")
+
+    def cancel(self, member, trial=False):
+        """
+        Release a request that ended without telling anything about `member`.
+        
+        Used for cancelled requests (a hedge that lost, a stream nobody reads)
+        and for errors caused by the request itself. Health and the circuit
+        are left alone; if it was the trial, the next request becomes the trial.
+        
+        Args:
+            member: The member from acquire()
+            trial: The trial flag returned by acquire()
+        """
+        with self._lock:
+            member.outstanding -= 1
+            if trial:
+                member.trial_in_flight = False
+
+    def get_stats(self):
+        """Return per-member load, health and circuit state."""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                member.name: dict(
+                    member.stats,
+                    outstanding=member.outstanding,
+                    health=round(member.health, 3),
+                    latency=member.latency,
+                    ejected=member.open_until > now
+                )
+                for member in self.members
+            }
+
+class PooledChatClient(ChatClientWrapper):
+    """
+    Client wrapper that spreads calls across a DeploymentPool and fails over between members.
+    
+    A call that fails with a 429, 5xx or connection error is retried right
+    away on another member. Once every eligible member has failed it, the
+    next round starts after an exponential backoff with full jitter. Up to
+    `max_retries` retries are made in total. A 401, 403 or 404 is also
+    retried on another member, but raised once no untried member is left,
+    since waiting won't fix a key or deployment name.
+    """
+
+    def __init__(self, clients, pool, max_retries=6, backoff_base=1.0, backoff_max=60.0):
+        """
+        Initialize the wrapper.
+        
+        Args:
+            clients: One client per pool member, in the same order as pool.members
+            pool: The DeploymentPool
+            max_retries: Retries across all members before giving up
+            backoff_base: Base delay in seconds between rounds
+            backoff_max: Maximum delay in seconds between rounds
+        """
+        super().__init__(clients[0])
+        self.clients = {id(member): client for member, client in zip(pool.members, clients)}
+        self.pool = pool
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def _after_failure(self, member, error, attempt, failed):
+        """Note that `member` failed this request so the retry prefers another one."""
+        failed.add(member)
+        print(f"Deployment '{member.name}' failed ({error.__class__.__name__}), retrying (attempt {attempt + 1}/{self.max_retries})")
+
+    def _has_untried(self, model, failed):
+        """Return True if some member serving `model` hasn't failed this request yet."""
+        return any(m.serves(model) and m not in failed for m in self.pool.members)
+
+    def _next_delay(self, model, failed, rounds):
+        """Return 0 while untried members remain, otherwise the backoff before a new round."""
+        if self._has_untried(model, failed):
+            return 0.0
+        failed.clear()
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** rounds)))
+
+    def _create(self, **kwargs):
+        model = kwargs.get("model")
+        failed = set()
+        attempt = 0
+        rounds = 0
+        while True:
+            member, wait, trial = self.pool.acquire(model, exclude=failed)
+            start = time.monotonic()
+            try:
+                if wait > 0:
+                    report_sent(False)
+                    time.sleep(wait)
+                    start = time.monotonic()
+                response = self.clients[id(member)].chat.completions.create(**dict(kwargs, model=member.deployment_for(model)))
+            except RETRYABLE_ERRORS as e:
+                self.pool.release(member, error=e, trial=trial)
+                if attempt >= self.max_retries:
+                    raise
+                self._after_failure(member, e, attempt, failed)
+                delay = self._next_delay(model, failed, rounds)
+                if delay > 0:
+                    rounds += 1
+                    report_sent(False)
+                    time.sleep(delay)
+                attempt += 1
+                continue
+            except MEMBER_ERRORS as e:
+                self.pool.release(member, error=e, trial=trial)
+                if attempt >= self.max_retries or not self._has_untried(model, failed | {member}):
+                    raise
+                self._after_failure(member, e, attempt, failed)
+                attempt += 1
+                continue
+            except BaseException:
+                self.pool.cancel(member, trial=trial)
+                raise
+            self.pool.release(member, latency=time.monotonic() - start, trial=trial)
+            return response
+
+    async def _create_async(self, **kwargs):
+        model = kwargs.get("model")
+        failed = set()
+        attempt = 0
+        rounds = 0
+        while True:
+            member, wait, trial = self.pool.acquire(model, exclude=failed)
+            start = time.monotonic()
+            try:
+                if wait > 0:
+                    report_sent(False)
+                    await asyncio.sleep(wait)
+                    start = time.monotonic()
+                response = await self.clients[id(member)].chat.completions.create(**dict(kwargs, model=member.deployment_for(model)))
+            except RETRYABLE_ERRORS as e:
+                self.pool.release(member, error=e, trial=trial)
+                if attempt >= self.max_retries:
+                    raise
+                self._after_failure(member, e, attempt, failed)
+                delay = self._next_delay(model, failed, rounds)
+                if delay > 0:
+                    rounds += 1
+                    report_sent(False)
+                    await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except MEMBER_ERRORS as e:
+                self.pool.release(member, error=e, trial=trial)
+                if attempt >= self.max_retries or not self._has_untried(model, failed | {member}):
+                    raise
+                self._after_failure(member, e, attempt, failed)
+                attempt += 1
+                continue
+            except BaseException:
+                self.pool.cancel(member, trial=trial)
+                raise
+            self.pool.release(member, latency=time.monotonic() - start, trial=trial)
+            return response
+
+def load_pool_members(config):
+    """
+    Build pool members from configuration.
+    
+    Args:
+        config: JSON text, or the path of a JSON file, holding a list of
+            entries with "endpoint" and "api_key" (or "api_key_env", the name
+            of an environment variable holding the key), and optionally
+            "name", "api_version", "deployments", "rpm" and "tpm"
+    
+    Returns:
+        List of PoolMember
+    """
+    if os.path.isfile(config):
+        with open(config, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    else:
+        entries = json.loads(config)
+    
+    members = []
+    for i, entry in enumerate(entries):
+        api_key = entry.get("api_key") or os.environ.get(entry.get("api_key_env", ""))
+        if not entry.get("endpoint") or not api_key:
+            raise ValueError(f"Deployment pool entry {i} needs an endpoint and an api_key or api_key_env")
+        members.append(PoolMember(
+            name=entry.get("name") or entry["endpoint"],
+            endpoint=entry["endpoint"],
+            api_key=api_key,
+            api_version=entry.get("api_version"),
+            deployments=entry.get("deployments"),
+            rpm=entry.get("rpm"),
+            tpm=entry.get("tpm")
+        ))
+    return members
+
+_deployment_pool = None
+_deployment_pool_lock = threading.Lock()
+
+def get_deployment_pool():
+    """
+    Return the process-wide deployment pool configured from the environment.
+    
+    AZURE_DEPLOYMENT_POOL holds the member list (see load_pool_members()).
+    AZURE_POOL_FAILURE_THRESHOLD and AZURE_POOL_COOLDOWN_SECONDS tune the
+    circuit breaker.
+    
+    Returns:
+        The shared DeploymentPool, or None if no pool is configured
+    """
+    global _deployment_pool
+    
+    config = os.environ.get("AZURE_DEPLOYMENT_POOL")
+    if not config:
+        return None
+    
+    with _deployment_pool_lock:
+        if _deployment_pool is None:
+            _deployment_pool = DeploymentPool(
+                load_pool_members(config),
+                failure_threshold=max(1, get_env_int("AZURE_POOL_FAILURE_THRESHOLD", 5)),
+                cooldown_seconds=get_env_float("AZURE_POOL_COOLDOWN_SECONDS", 30.0)
+            )
+    return _deployment_pool
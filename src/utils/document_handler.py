@@ -1,95 +1,345 @@
+import bisect
 import os
-import tempfile
+import re
+import threading
+import time
 from typing import Dict, List, Optional
-import PyPDF2
 import docx2txt
 import pandas as pd
 import base64
 from io import BytesIO
+from src.utils.config import get_env_int
+from src.utils.pdf_extraction import iter_pdf_pages
+from src.utils.token_budget import CHARS_PER_TOKEN, count_tokens
 
-def process_uploaded_file(file) -> str:
+# Separates pages in extracted PDF text so chunks can report their page numbers
+PAGE_BREAK = "\f"
+
+# Markdown headings, numbered section titles ("2.1 Methods") and short all-caps lines
+_HEADING = re.compile(r"\s{0,3}(#{1,6}\s+\S.*|\d+(\.\d+)*\.?\s+[A-Z][^.!?]*|[A-Z][A-Z0-9 ,&:'()/-]{2,79})\s*$")
+_TABLE_ROW = re.compile(r"\s*\|.*\|\s*$|.*\S\t+\S")
+_PARAGRAPH = re.compile(r"[^\n\f]*\S[^\n\f]*(?:\n[^\n\f]*\S[^\n\f]*)*")
+_LINE = re.compile(r"[^\n]+")
+_SENTENCE = re.compile(r"\S.*?(?:[.!?][\"')\]]*(?=\s)|$)", re.DOTALL)
+
+class ExtractionError(ValueError):
+    """Raised when an upload can't be turned into text (unsupported, too large or unreadable)."""
+
+# Registered extractors by file extension, and extensions by MIME type
+_EXTRACTORS = {}
+_MIME_TYPES = {}
+_extraction_stats = {}
+_extraction_stats_lock = threading.Lock()
+
+def register_extractor(extensions, mime_types=(), reports_progress=False):
     """
-    Extract text content from an uploaded file.
+    Register a text extractor for some file formats.
+    
+    Used as a decorator. The extractor is called with a binary file object
+    (or a path) and returns the document text; registering an extension
+    again replaces its extractor.
     
     Args:
-        file: The uploaded file object from Streamlit
+        extensions: File extensions handled, without the dot
+        mime_types: MIME types mapped to the first extension
+        reports_progress: Whether the extractor takes an `on_progress` keyword
+            argument, called with the number of pages (or other units) done
+    """
+    def decorator(func):
+        for extension in extensions:
+            _EXTRACTORS[extension.lower()] = (func, reports_progress)
+        for mime_type in mime_types:
+            _MIME_TYPES[mime_type] = extensions[0].lower()
+        return func
+    return decorator
+
+def supported_extensions() -> List[str]:
+    """Return the extensions that have a registered extractor."""
+    return sorted(_EXTRACTORS)
+
+def extract_text(source, filename: str, mime_type: Optional[str] = None, max_bytes: Optional[int] = None, on_progress=None) -> str:
+    """
+    Extract the text of an uploaded document with the extractor registered for its format.
+    
+    The extractor reads the upload's in-memory buffer directly; nothing is
+    written to disk. Time spent per format is recorded for get_extraction_stats().
+    
+    Args:
+        source: Raw bytes, or a binary file object such as a Streamlit upload
+        filename: The file name; its extension picks the extractor
+        mime_type: Used when the extension isn't recognised
+        max_bytes: Size limit (defaults to DOCUMENT_MAX_UPLOAD_MB)
+        on_progress: Optional callable(units done), for extractors that report progress
         
     Returns:
         str: Extracted text content
+        
+    Raises:
+        ExtractionError: If the format is unsupported, the file too large or extraction fails
     """
-    # Create a temporary file to store the uploaded file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.name)[1]) as tmp:
-        tmp.write(file.getbuffer())
-        tmp_path = tmp.name
+    extension = os.path.splitext(filename)[1].lstrip(".").lower()
+    if extension not in _EXTRACTORS:
+        extension = _MIME_TYPES.get(mime_type, extension)
+    if extension not in _EXTRACTORS:
+        raise ExtractionError(f"Unsupported file format: .{extension}")
+    extractor, reports_progress = _EXTRACTORS[extension]
     
+    # BytesIO shares the bytes object's buffer instead of copying it
+    buffer = BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source
+    buffer.seek(0, os.SEEK_END)
+    size = buffer.tell()
+    buffer.seek(0)
+    max_bytes = max_bytes or get_env_int("DOCUMENT_MAX_UPLOAD_MB", 50) * 1024 * 1024
+    if size > max_bytes:
+        raise ExtractionError(f"{filename} is {size / 1024 / 1024:.1f} MB; the limit is {max_bytes / 1024 / 1024:.1f} MB")
+    
+    start = time.perf_counter()
     try:
-        # Process based on file extension
-        file_ext = os.path.splitext(file.name)[1].lower()
-        
-        if file_ext == '.pdf':
-            return extract_text_from_pdf(tmp_path)
-        elif file_ext == '.docx':
-            return extract_text_from_docx(tmp_path)
-        elif file_ext == '.txt':
-            return extract_text_from_txt(tmp_path)
-        elif file_ext == '.csv':
-            return extract_text_from_csv(tmp_path)
-        elif file_ext == '.xlsx':
-            return extract_text_from_excel(tmp_path)
-        else:
-            return f"Unsupported file format: {file_ext}"
-    finally:
-        # Clean up the temporary file
-        if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
-
-def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text from a PDF file."""
-    text = ""
-    with open(file_path, 'rb') as file:
-        pdf_reader = PyPDF2.PdfReader(file)
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
+        text = extractor(buffer, on_progress=on_progress) if reports_progress and on_progress else extractor(buffer)
+    except Exception as e:
+        _record_extraction(extension, size, time.perf_counter() - start, failed=True)
+        raise ExtractionError(f"Could not read {filename}: {e}") from e
+    elapsed = time.perf_counter() - start
+    _record_extraction(extension, size, elapsed)
+    print(f"Extracted {filename} ({extension}, {size} bytes) in {elapsed:.2f}s")
     return text
 
-def extract_text_from_docx(file_path: str) -> str:
-    """Extract text from a DOCX file."""
+def _record_extraction(extension, size, seconds, failed=False):
+    with _extraction_stats_lock:
+        stats = _extraction_stats.setdefault(extension, {"files": 0, "failures": 0, "bytes": 0, "seconds": 0.0, "max_seconds": 0.0})
+        stats["files"] += 1
+        stats["failures"] += int(failed)
+        stats["bytes"] += size
+        stats["seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+def get_extraction_stats() -> Dict[str, Dict]:
+    """Return per-format extraction counts and timings, with the average seconds per file."""
+    with _extraction_stats_lock:
+        stats = {extension: dict(entry) for extension, entry in _extraction_stats.items()}
+    for entry in stats.values():
+        entry["avg_seconds"] = entry["seconds"] / entry["files"] if entry["files"] else 0.0
+    return stats
+
+def process_uploaded_file(file) -> str:
+    """
+    Extract text content from an uploaded file.
+    
+    Args:
+        file: The uploaded file object from Streamlit
+        
+    Returns:
+        str: Extracted text content, or a message if the file couldn't be read
+    """
+    try:
+        return extract_text(file, file.name, getattr(file, "type", None))
+    except ExtractionError as e:
+        return str(e)
+
+@register_extractor(["pdf"], ["application/pdf"], reports_progress=True)
+def extract_text_from_pdf(file_path, on_progress=None) -> str:
+    """Extract text from a PDF file (path or binary file object), joining its pages in one pass."""
+    pages = []
+    for text in iter_pdf_pages(file_path):
+        pages.append(text)
+        if on_progress is not None:
+            on_progress(len(pages))
+    return PAGE_BREAK.join(pages)
+
+@register_extractor(["docx"], ["application/vnd.openxmlformats-officedocument.wordprocessingml.document"])
+def extract_text_from_docx(file_path) -> str:
+    """Extract text from a DOCX file (path or binary file object)."""
     return docx2txt.process(file_path)
 
-def extract_text_from_txt(file_path: str) -> str:
-    """Extract text from a text file."""
-    with open(file_path, 'r', encoding='utf-8', errors='replace') as file:
-        return file.read()
+@register_extractor(["txt", "md"], ["text/plain", "text/markdown"])
+def extract_text_from_txt(file_path) -> str:
+    """Extract text from a text file (path or binary file object)."""
+    if isinstance(file_path, str):
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as file:
+            return file.read()
+    return file_path.read().decode('utf-8', errors='replace')
 
-def extract_text_from_csv(file_path: str) -> str:
-    """Extract text from a CSV file."""
+@register_extractor(["csv"], ["text/csv"])
+def extract_text_from_csv(file_path) -> str:
+    """Extract text from a CSV file (path or binary file object)."""
     df = pd.read_csv(file_path)
     return df.to_string()
 
-def extract_text_from_excel(file_path: str) -> str:
-    """Extract text from an Excel file."""
+@register_extractor(["xlsx"], ["application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"])
+def extract_text_from_excel(file_path) -> str:
+    """Extract text from an Excel file (path or binary file object)."""
     df = pd.read_excel(file_path)
     return df.to_string()
 
-def chunk_text(text, max_chunk_size=1000, overlap=100):
+class TextChunk:
+    """
+    A span of a document's text and the pages it covers.
+    
+    Chunks hold offsets into the original text rather than copies of it, so
+    a document's chunks cost a few integers each, and facts extracted from
+    a chunk can cite exactly where they came from.
     """
-    Split text into smaller chunks with overlap.
+    
+    __slots__ = ("source", "start", "end", "page", "last_page")
+
+    def __init__(self, source, start, end, page=1, last_page=None):
+        """
+        Initialize the chunk.
+        
+        Args:
+            source: The full document text, or anything sliceable like it
+            start: Offset of the chunk's first character
+            end: Offset just past its last character
+            page: Page the chunk starts on
+            last_page: Page it ends on (defaults to `page`)
+        """
+        self.source = source
+        self.start = start
+        self.end = end
+        self.page = page
+        self.last_page = last_page or page
+
+    @property
+    def text(self):
+        """The chunk's text, sliced from the document on access."""
+        return self.source[self.start:self.end]
+
+    def location(self):
+        """Return the chunk's offsets and pages as a JSON-friendly dictionary."""
+        return {"start": self.start, "end": self.end, "page": self.page, "last_page": self.last_page}
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f"TextChunk(start={self.start}, end={self.end}, page={self.page})"
+
+def _blocks(text):
+    """
+    Yield (start, end, kind) for the paragraphs, headings and tables of `text`.
+    
+    Paragraphs are separated by blank lines or page breaks. A heading line at
+    the top of a paragraph becomes its own block, and a paragraph made mostly
+    of table rows is kept whole as a table.
+    """
+    for paragraph in _PARAGRAPH.finditer(text):
+        start, end = paragraph.span()
+        lines = [line.span() for line in _LINE.finditer(text, start, end)]
+        first_start, first_end = lines[0]
+        if len(lines) > 1 and _HEADING.match(text, first_start, first_end):
+            yield first_start, first_end, "heading"
+            lines = lines[1:]
+            start = lines[0][0]
+        elif len(lines) == 1 and _HEADING.match(text, first_start, first_end):
+            yield start, end, "heading"
+            continue
+        
+        table_rows = sum(1 for line_start, line_end in lines if _TABLE_ROW.match(text, line_start, line_end))
+        yield start, end, "table" if table_rows * 2 > len(lines) else "text"
+
+def _segments(text, max_chunk_tokens):
+    """
+    Yield (start, end, kind, tokens) pieces no larger than `max_chunk_tokens` where possible.
+    
+    Blocks that fit are kept whole. Larger tables are split between rows and
+    larger paragraphs between sentences; only a single sentence or row longer
+    than a whole chunk is cut mid-text.
+    """
+    for start, end, kind in _blocks(text):
+        tokens = count_tokens(text[start:end])
+        if tokens <= max_chunk_tokens:
+            yield start, end, kind, tokens
+            continue
+        
+        pieces = _LINE if kind == "table" else _SENTENCE
+        for piece in pieces.finditer(text, start, end):
+            piece_start, piece_end = piece.span()
+            piece_tokens = count_tokens(piece.group())
+            if piece_tokens <= max_chunk_tokens:
+                yield piece_start, piece_end, kind, piece_tokens
+                continue
+            # Cut an oversized sentence into even windows, at whitespace where there is some
+            window = max(1, (piece_end - piece_start) * max_chunk_tokens // piece_tokens)
+            while piece_start < piece_end:
+                cut = min(piece_end, piece_start + window)
+                if cut < piece_end:
+                    space = text.rfind(" ", piece_start + window // 2, cut)
+                    cut = space + 1 if space > 0 else cut
+                yield piece_start, cut, kind, count_tokens(text[piece_start:cut])
+                piece_start = cut
+
+def chunk_document(text, max_chunk_tokens=250, overlap_tokens=0, source=None):
+    """
+    Split text into chunks that follow its structure.
+    
+    Whole paragraphs, table blocks and sentences are packed into chunks of up
+    to `max_chunk_tokens`. A heading always starts a new chunk, so a section
+    stays with its title. Because chunks end on boundaries, little or no
+    overlap is needed; with `overlap_tokens`, a chunk also repeats the
+    previous chunk's trailing sentences that fit in that many tokens.
     
     Args:
-        text: The text to chunk
-        max_chunk_size: Maximum characters per chunk
-        overlap: Number of characters to overlap between chunks
+        text: The text to chunk; PDF pages are separated by PAGE_BREAK
+        max_chunk_tokens: Maximum tokens per chunk
+        overlap_tokens: Tokens of whole sentences to repeat from the previous chunk
+        source: What the chunks slice their text from, if not `text` itself
+            (e.g. a DocumentHandle, so the chunks don't keep the text alive)
         
     Returns:
-        List of text chunks
+        List of TextChunk, in document order
     """
     if not text:
         return []
+    page_breaks = [match.start() for match in re.finditer(PAGE_BREAK, text)]
     
     chunks = []
-    start = 0
-    while start < len(text):
-        end = start + max_chunk_size
-        chunks.append(text[start:end])
-        start += max_chunk_size - overlap
-    return chunks
\ No newline at end of file
+    current = []
+    current_tokens = 0
+    
+    def close():
+        start, end = current[0][0], current[-1][1]
+        chunks.append(TextChunk(
+            text if source is None else source,
+            start,
+            end,
+            page=bisect.bisect_right(page_breaks, start) + 1,
+            last_page=bisect.bisect_right(page_breaks, end - 1) + 1
+        ))
+    
+    for segment in _segments(text, max_chunk_tokens):
+        _, _, kind, tokens = segment
+        if current and (current_tokens + tokens > max_chunk_tokens or kind == "heading"):
+            close()
+            # Carry over trailing sentences as overlap, unless a new section starts here
+            carried = []
+            if kind != "heading":
+                carried_tokens = 0
+                for previous in reversed(current):
+                    if carried_tokens + previous[3] + tokens > min(overlap_tokens + tokens, max_chunk_tokens):
+                        break
+                    carried.insert(0, previous)
+                    carried_tokens += previous[3]
+            current = carried
+            current_tokens = sum(piece[3] for piece in current)
+        current.append(segment)
+        current_tokens += tokens
+    if current:
+        close()
+    return chunks
+
+def chunk_text(text, max_chunk_size=1000, overlap=100):
+    """
+    Split text into structure-aware chunks of about `max_chunk_size` characters.
+    
+    Kept for callers that size chunks in characters; new code should use
+    chunk_document(), which sizes them in tokens.
+    
+    Args:
+        text: The text to chunk
+        max_chunk_size: Maximum characters per chunk (converted to tokens)
+        overlap: Characters of trailing sentences to repeat between chunks
+        
+    Returns:
+        List of text chunks
+    """
+    return [chunk.text for chunk in chunk_document(text, max(1, max_chunk_size // CHARS_PER_TOKEN), overlap // CHARS_PER_TOKEN)]
@@ -0,0 +1,298 @@
+import hashlib
+import json
+import mmap
+import os
+import threading
+import weakref
+from src.utils.config import get_env_int
+
+DEFAULT_DOCUMENT_STORE_PATH = os.path.join(".cache", "documents")
+
+# Characters between the byte-offset checkpoints kept for non-ASCII documents
+CHECKPOINT_INTERVAL = 4096
+
+def document_digest(content):
+    """Return the content hash of a document given as text or as a DocumentHandle."""
+    digest = getattr(content, "digest", None)
+    if digest is not None:
+        return digest
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+class DocumentHandle:
+    """
+    A reference to a document's text in the DocumentStore.
+    
+    Handles are what sessions keep instead of the text. Slicing a handle
+    (`handle[start:end]`) decodes just that span from the memory-mapped
+    file, so a TextChunk can use a handle as its source. The document can't
+    be evicted while any handle to it is alive.
+    """
+    
+    __slots__ = ("store", "digest", "name", "length", "__weakref__")
+
+    def __init__(self, store, digest, name, length):
+        """
+        Initialize the handle. Use DocumentStore.open() or put() rather than calling this.
+        
+        Args:
+            store: The DocumentStore holding the text
+            digest: SHA-256 of the text
+            name: The uploaded file's name
+            length: Length of the text in characters
+        """
+        self.store = store
+        self.digest = digest
+        self.name = name
+        self.length = length
+
+    def read(self):
+        """Return the whole text."""
+        return self.store._slice(self.digest, 0, self.length)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError("documents can only be sliced with [start:end]")
+        start, end, _ = key.indices(self.length)
+        return self.store._slice(self.digest, start, max(start, end))
+
+    def __len__(self):
+        return self.length
+
+    def __repr__(self):
+        return f"DocumentHandle(name={self.name!r}, digest={self.digest[:12]}, length={self.length})"
+
+class DocumentStore:
+    """
+    Extracted document text stored once on disk, addressed by its hash.
+    
+    Each text is written to `<digest>.txt` as UTF-8 and memory-mapped when
+    read, so the same document uploaded in several sessions takes its size
+    once, in the page cache, rather than once per session. For non-ASCII text
+    a sidecar file keeps the byte offset of every CHECKPOINT_INTERVAL-th
+    character so any character span can be decoded without reading from the
+    start. Uploads are also recorded by the hash of the uploaded file, so
+    re-uploading a file skips text extraction.
+    
+    Live handles are reference counted per document; once the store grows
+    past `max_disk_bytes`, documents without handles are removed, least
+    recently opened first. The reference counts live in this process only,
+    so the store is meant to be used by one server process: another process
+    sharing the directory could evict a document this one still holds.
+    """
+
+    def __init__(self, directory=DEFAULT_DOCUMENT_STORE_PATH, max_disk_bytes=512 * 1024 * 1024):
+        """
+        Initialize the store.
+        
+        Args:
+            directory: Where the texts are written
+            max_disk_bytes: Approximate size bound of the stored texts
+        """
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.stats = {"upload_hits": 0, "upload_misses": 0, "writes": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._refcounts = {}
+        self._maps = {}
+        os.makedirs(os.path.join(self.directory, "uploads"), exist_ok=True)
+
+    def _path(self, digest, suffix=".txt"):
+        return os.path.join(self.directory, digest + suffix)
+
+    def _write_atomic(self, path, data):
+        """Write a file under a temporary name and rename it, so readers never see it half written."""
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def digest_bytes(data):
+        """Return the hash used to recognise an uploaded file's raw bytes."""
+        return hashlib.sha256(data).hexdigest()
+
+    def find_upload(self, upload_digest, name):
+        """
+        Look up the text extracted from a previously uploaded file.
+        
+        Args:
+            upload_digest: digest_bytes() of the uploaded file
+            name: The file name the new handle should carry
+        
+        Returns:
+            A DocumentHandle, or None if the file hasn't been seen (or its text was evicted)
+        """
+        pointer = os.path.join(self.directory, "uploads", upload_digest)
+        try:
+            with open(pointer, "r", encoding="utf-8") as f:
+                handle = self.open(f.read().strip(), name)
+        except (OSError, KeyError, ValueError):
+            with self._lock:
+                self.stats["upload_misses"] += 1
+            return None
+        with self._lock:
+            self.stats["upload_hits"] += 1
+        return handle
+
+    def put(self, text, name, upload_digest=None):
+        """
+        Store a document's text, if it isn't stored already.
+        
+        Args:
+            text: The extracted text
+            name: The file name
+            upload_digest: digest_bytes() of the uploaded file, so find_upload() recognises it next time
+        
+        Returns:
+            A DocumentHandle for the text
+        """
+        digest = document_digest(text)
+        stored = os.path.exists(self._path(digest))
+        if not stored:
+            data = text.encode("utf-8")
+            meta = {"chars": len(text), "bytes": len(data), "checkpoints": []}
+            if len(data) != len(text):
+                offset = 0
+                for start in range(0, len(text), CHECKPOINT_INTERVAL):
+                    meta["checkpoints"].append(offset)
+                    offset += len(text[start:start + CHECKPOINT_INTERVAL].encode("utf-8"))
+            # The metadata goes first: a .txt file is only ever visible with its metadata in place
+            self._write_atomic(self._path(digest, ".json"), json.dumps(meta).encode("utf-8"))
+            self._write_atomic(self._path(digest), data)
+            with self._lock:
+                self.stats["writes"] += 1
+            print(f"Stored {name} ({len(data)} bytes) as {digest[:12]}")
+        
+        if upload_digest:
+            self._write_atomic(os.path.join(self.directory, "uploads", upload_digest), digest.encode("utf-8"))
+        # Take the handle before evicting so the new document itself is safe
+        handle = self.open(digest, name)
+        if not stored:
+            self.evict()
+        return handle
+
+    def open(self, digest, name=None):
+        """
+        Return a new handle to a stored document.
+        
+        Args:
+            digest: The text's hash
+            name: The file name the handle should carry
+        
+        Raises:
+            KeyError: If the document isn't stored
+        """
+        meta = self._load(digest)
+        handle = DocumentHandle(self, digest, name or digest[:12], meta["chars"])
+        with self._lock:
+            self._refcounts[digest] = self._refcounts.get(digest, 0) + 1
+        weakref.finalize(handle, self._release, digest)
+        try:
+            # The file's modification time doubles as its last use, which drives eviction
+            os.utime(self._path(digest))
+        except OSError:
+            pass
+        return handle
+
+    def _release(self, digest):
+        with self._lock:
+            count = self._refcounts.get(digest, 0) - 1
+            if count > 0:
+                self._refcounts[digest] = count
+            else:
+                self._refcounts.pop(digest, None)
+
+    def _load(self, digest):
+        """Return (opening if needed) the memory map and metadata of a document."""
+        with self._lock:
+            entry = self._maps.get(digest)
+        if entry is not None:
+            return entry["meta"]
+        
+        try:
+            with open(self._path(digest, ".json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(self._path(digest), "rb") as f:
+                # Empty files can't be mapped
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if meta["bytes"] else b""
+        except FileNotFoundError:
+            raise KeyError(digest)
+        
+        with self._lock:
+            entry = self._maps.setdefault(digest, {"meta": meta, "data": data})
+        if entry["data"] is not data and isinstance(data, mmap.mmap):
+            data.close()
+        return entry["meta"]
+
+    def _slice(self, digest, start, end):
+        """Decode characters start:end of a stored document."""
+        meta = self._load(digest)
+        with self._lock:
+            data = self._maps[digest]["data"]
+        checkpoints = meta["checkpoints"]
+        if not checkpoints:
+            return data[start:end].decode("utf-8")
+        
+        first = start // CHECKPOINT_INTERVAL
+        last = (end + CHECKPOINT_INTERVAL - 1) // CHECKPOINT_INTERVAL
+        byte_end = checkpoints[last] if last < len(checkpoints) else meta["bytes"]
+        text = data[checkpoints[first]:byte_end].decode("utf-8")
+        offset = first * CHECKPOINT_INTERVAL
+        return text[start - offset:end - offset]
+
+    def evict(self):
+        """Remove unreferenced documents, least recently opened first, until the store is under max_disk_bytes."""
+        documents = []
+        total_size = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".txt") and entry.is_file():
+                stat = entry.stat()
+                documents.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+                total_size += stat.st_size
+        if total_size <= self.max_disk_bytes:
+            return
+        
+        for _, digest, size in sorted(documents):
+            if total_size <= self.max_disk_bytes:
+                break
+            with self._lock:
+                if self._refcounts.get(digest):
+                    continue
+                entry = self._maps.pop(digest, None)
+                self.stats["evictions"] += 1
+            if entry is not None and isinstance(entry["data"], mmap.mmap):
+                entry["data"].close()
+            for path in (self._path(digest), self._path(digest, ".json")):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total_size -= size
+            print(f"Evicted stored document {digest[:12]} ({size} bytes)")
+
+    def get_stats(self):
+        """Return a copy of the counters plus the number of documents with live handles."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["referenced_documents"] = len(self._refcounts)
+        return stats
+
+_document_store = None
+_document_store_lock = threading.Lock()
+
+def get_document_store():
+    """
+    Return the process-wide document store configured from the environment.
+    
+    Returns:
+        The shared DocumentStore
+    """
+    global _document_store
+    
+    with _document_store_lock:
+        if _document_store is None:
+            _document_store = DocumentStore(
+                directory=os.environ.get("DOCUMENT_STORE_PATH", DEFAULT_DOCUMENT_STORE_PATH),
+                max_disk_bytes=get_env_int("DOCUMENT_STORE_MAX_DISK_MB", 512) * 1024 * 1024
+            )
+    return _document_store
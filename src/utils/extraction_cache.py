@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from src.utils.config import get_env_bool, get_env_int
+
+DEFAULT_EXTRACTION_CACHE_PATH = os.path.join(".cache", "extractions.sqlite3")
+
+# Run the eviction sweep once every this many writes
+EVICTION_INTERVAL = 200
+
+class ExtractionCache:
+    """
+    Facts extracted from document chunks, addressed by content.
+    
+    An entry is keyed by the hash of the chunk text together with the
+    normalized research query, the persona and the deployment, so the same
+    chunk reappearing in a re-uploaded or different document is recognised
+    without another request, while a different question or model is not.
+    Unlike the completion cache, hits don't depend on how chunks happened to
+    be packed into requests. The SQLite file runs in WAL mode so several app
+    processes can share it, and is trimmed least-recently-used first once it
+    grows past `max_disk_bytes`.
+    """
+
+    def __init__(self, path=DEFAULT_EXTRACTION_CACHE_PATH, max_disk_bytes=64 * 1024 * 1024):
+        """
+        Initialize the cache.
+        
+        Args:
+            path: SQLite database file
+            max_disk_bytes: Approximate size bound of the database
+        """
+        self.path = path
+        self.max_disk_bytes = max_disk_bytes
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes_since_eviction = 0
+        
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect().execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunk_facts (
+                key TEXT PRIMARY KEY,
+                facts TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._connect().execute("CREATE INDEX IF NOT EXISTS chunk_facts_accessed ON chunk_facts (accessed_at)")
+
+    def _connect(self):
+        """Return this thread's SQLite connection (sqlite3 connections are not shared across threads)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(chunk, query, persona, model):
+        """
+        Build the key for one chunk's facts.
+        
+        Args:
+            chunk: The chunk text
+            query: The research question the facts answer
+            persona: The system prompt used for extraction
+            model: The deployment that extracted them
+        
+        Returns:
+            A hex digest
+        """
+        parts = [
+            hashlib.sha256(chunk.encode("utf-8")).hexdigest(),
+            " ".join(re.findall(r"\w+", query.lower())),
+            hashlib.sha256(persona.encode("utf-8")).hexdigest(),
+            model or ""
+        ]
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """
+        Look up several chunks at once.
+        
+        Args:
+            keys: Keys from make_key()
+        
+        Returns:
+            Dictionary of key to its list of facts, for the keys that were found
+        """
+        keys = list(keys)
+        found = {}
+        conn = self._connect()
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            for key, facts in conn.execute(f"SELECT key, facts FROM chunk_facts WHERE key IN ({placeholders})", batch):
+                found[key] = json.loads(facts)
+        
+        if found:
+            conn.executemany(
+                "UPDATE chunk_facts SET accessed_at = ? WHERE key = ?",
+                [(time.time(), key) for key in found]
+            )
+        with self._lock:
+            self.stats["hits"] += len(found)
+            self.stats["misses"] += len(keys) - len(found)
+        return found
+
+    def set_many(self, entries):
+        """
+        Store the facts for several chunks.
+        
+        Args:
+            entries: Dictionary of key (from make_key()) to list of facts
+        """
+        if not entries:
+            return
+        now = time.time()
+        rows = []
+        for key, facts in entries.items():
+            value = json.dumps(facts, ensure_ascii=False)
+            rows.append((key, value, len(value), now, now))
+        
+        with self._lock:
+            self.stats["writes"] += len(rows)
+            self._writes_since_eviction += len(rows)
+            run_eviction = self._writes_since_eviction >= EVICTION_INTERVAL
+            if run_eviction:
+                self._writes_since_eviction = 0
+        
+        self._connect().executemany(
+            "INSERT OR REPLACE INTO chunk_facts (key, facts, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        if run_eviction:
+            self.evict()
+
+    def evict(self):
+        """Drop the least recently used entries until the cache is under max_disk_bytes."""
+        conn = self._connect()
+        total_size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM chunk_facts").fetchone()[0]
+        if total_size <= self.max_disk_bytes:
+            return
+        
+        excess = total_size - self.max_disk_bytes
+        stale_keys = []
+        for key, size in conn.execute("SELECT key, size FROM chunk_facts ORDER BY accessed_at ASC"):
+            stale_keys.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM chunk_facts WHERE key = ?", stale_keys)
+        with self._lock:
+            self.stats["evictions"] += len(stale_keys)
+
+    def clear(self):
+        """Remove every entry."""
+        self._connect().execute("DELETE FROM chunk_facts")
+
+    def get_stats(self):
+        """Return a copy of the hit/miss counters plus the overall hit rate."""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+_extraction_cache = None
+_extraction_cache_lock = threading.Lock()
+
+def get_extraction_cache():
+    """
+    Return the process-wide extraction cache configured from the environment.
+    
+    Returns:
+        The shared ExtractionCache, or None if EXTRACTION_CACHE_ENABLED is false
+    """
+    global _extraction_cache
+    
+    if not get_env_bool("EXTRACTION_CACHE_ENABLED", True):
+        return None
+    
+    with _extraction_cache_lock:
+        if _extraction_cache is None:
+            _extraction_cache = ExtractionCache(
+                path=os.environ.get("EXTRACTION_CACHE_PATH", DEFAULT_EXTRACTION_CACHE_PATH),
+                max_disk_bytes=get_env_int("EXTRACTION_CACHE_MAX_DISK_MB", 64) * 1024 * 1024
+            )
+    return _extraction_cache
@@ -0,0 +1,129 @@
+import re
+import zlib
+import numpy as np
+
+# Mersenne prime for the universal hash family; shingle hashes are reduced
+# below it so a * x + b fits in 64 bits
+MERSENNE_PRIME = (1 << 31) - 1
+
+def _normalize(text):
+    """Lowercase and collapse punctuation/whitespace so trivial edits don't matter."""
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+def _shingles(text, size):
+    """Return the hashed character `size`-grams of the normalized text."""
+    text = _normalize(text)
+    if len(text) <= size:
+        return np.array([zlib.crc32(text.encode("utf-8"))], dtype=np.uint64)
+    hashes = {zlib.crc32(text[i:i + size].encode("utf-8")) for i in range(len(text) - size + 1)}
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+class FactDeduplicator:
+    """
+    Merges near-duplicate facts as they arrive, using MinHash and LSH.
+    
+    Each fact gets a MinHash signature over the character shingles of its
+    text. The signature is split into bands that are looked up in hash
+    tables, so each insert only compares against the few facts sharing a
+    band instead of every fact so far. A candidate whose estimated Jaccard
+    similarity reaches `threshold` is treated as the same fact: the first
+    version is kept and the new one's sources are added to its "sources".
+    """
+
+    def __init__(self, threshold=0.7, num_perm=64, bands=16, shingle_size=5, seed=1):
+        """
+        Initialize the deduplicator.
+        
+        Args:
+            threshold: Estimated Jaccard similarity at which two facts are merged
+            num_perm: MinHash signature length (must be divisible by bands)
+            bands: LSH bands; more bands catch lower similarities as candidates
+            shingle_size: Characters per shingle
+            seed: Seed for the hash functions
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, MERSENNE_PRIME, size=num_perm).astype(np.uint64)[:, None]
+        self._b = rng.randint(0, MERSENNE_PRIME, size=num_perm).astype(np.uint64)[:, None]
+        self._tables = [{} for _ in range(bands)]
+        self._signatures = []
+        self.facts = []
+        self.duplicates = 0
+
+    def signature(self, text):
+        """Return the MinHash signature of `text`."""
+        shingles = _shingles(text, self.shingle_size) % MERSENNE_PRIME
+        return ((self._a * shingles[None, :] + self._b) % MERSENNE_PRIME).min(axis=1)
+
+    def add(self, fact):
+        """
+        Add a fact, merging it into an earlier near-duplicate if there is one.
+        
+        Args:
+            fact: Fact dictionary with at least a "fact" entry
+        
+        Returns:
+            The fact now representing this content (the earlier one if merged)
+        """
+        signature = self.signature(fact.get("fact", ""))
+        band_keys = [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+        
+        candidates = set()
+        for table, key in zip(self._tables, band_keys):
+            candidates.update(table.get(key, ()))
+        
+        if candidates:
+            candidates = list(candidates)
+            similarities = (np.stack([self._signatures[index] for index in candidates]) == signature).mean(axis=1)
+            best = int(similarities.argmax())
+            if similarities[best] >= self.threshold:
+                self.duplicates += 1
+                return self._merge(self.facts[candidates[best]], fact)
+        
+        index = len(self.facts)
+        fact = dict(fact)
+        fact["sources"] = _sources_of(fact)
+        self.facts.append(fact)
+        self._signatures.append(signature)
+        for table, key in zip(self._tables, band_keys):
+            table.setdefault(key, []).append(index)
+        return fact
+
+    def add_all(self, facts):
+        """Add every fact in `facts` and return the deduplicated list so far."""
+        for fact in facts:
+            self.add(fact)
+        return self.facts
+
+    def _merge(self, kept, duplicate):
+        """Fold `duplicate`'s sources into `kept`."""
+        for source in _sources_of(duplicate):
+            if source not in kept["sources"]:
+                kept["sources"].append(source)
+        return kept
+
+def _sources_of(fact):
+    """Return the sources cited by a fact, as a list."""
+    sources = list(fact.get("sources") or [])
+    if fact.get("source") and fact["source"] not in sources:
+        sources.insert(0, fact["source"])
+    return sources
+
+def deduplicate_facts(facts, threshold=0.7):
+    """
+    Merge near-duplicate facts, keeping the first of each group and the union of their sources.
+    
+    Args:
+        facts: List of fact dictionaries
+        threshold: Estimated Jaccard similarity at which two facts are merged
+    
+    Returns:
+        The deduplicated list, in first-seen order
+    """
+    return FactDeduplicator(threshold=threshold).add_all(facts)
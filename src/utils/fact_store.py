@@ -0,0 +1,270 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from src.utils.config import get_env_bool, get_env_int
+
+DEFAULT_FACT_STORE_PATH = os.path.join(".cache", "facts.sqlite3")
+
+# Buffered facts are written once this many are waiting
+DEFAULT_BATCH_SIZE = 50
+
+def _normalize(text):
+    """Lowercase and collapse punctuation/whitespace."""
+    return " ".join(re.findall(r"\w+", (text or "").lower()))
+
+# Words ignored when matching search queries against each other
+STOPWORDS = frozenset("a an and are as at by for from in is of on or the to with".split())
+
+def _match_expression(text, column=None):
+    """
+    Build an FTS5 query requiring every non-stopword of `text`, optionally in one column.
+    
+    Words are quoted so FTS5 operators in user text are taken literally.
+    """
+    terms = " ".join(f'"{word}"' for word in _normalize(text).split() if word not in STOPWORDS)
+    if not terms:
+        return None
+    return f"{column} : ({terms})" if column else terms
+
+class FactStore:
+    """
+    Persistent research facts in SQLite with an FTS5 full-text index.
+    
+    Facts are recorded with the topic and search query that produced them,
+    their sources, category, origin ("web" or "document") and the time they
+    were gathered. The same fact text for the same topic is stored once and
+    its timestamp refreshed when it is gathered again. Writes are buffered and
+    committed in batches. Like the completion cache, the database runs in WAL
+    mode so several app processes can share it.
+    """
+
+    def __init__(self, path=DEFAULT_FACT_STORE_PATH, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Initialize the store.
+        
+        Args:
+            path: SQLite database file
+            batch_size: Number of buffered facts that triggers a write
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self._pending = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect().executescript(
+            """
+            CREATE TABLE IF NOT EXISTS facts (
+                id INTEGER PRIMARY KEY,
+                content_hash TEXT NOT NULL UNIQUE,
+                topic TEXT NOT NULL,
+                query TEXT NOT NULL,
+                fact TEXT NOT NULL,
+                source TEXT,
+                sources TEXT,
+                category TEXT,
+                origin TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS facts_created ON facts (created_at);
+            CREATE VIRTUAL TABLE IF NOT EXISTS facts_fts USING fts5(
+                fact, topic, query, content='facts', content_rowid='id'
+            );
+            CREATE TRIGGER IF NOT EXISTS facts_ai AFTER INSERT ON facts BEGIN
+                INSERT INTO facts_fts (rowid, fact, topic, query) VALUES (new.id, new.fact, new.topic, new.query);
+            END;
+            CREATE TRIGGER IF NOT EXISTS facts_ad AFTER DELETE ON facts BEGIN
+                INSERT INTO facts_fts (facts_fts, rowid, fact, topic, query) VALUES ('delete', old.id, old.fact, old.topic, old.query);
+            END;
+            CREATE TRIGGER IF NOT EXISTS facts_au AFTER UPDATE OF fact, topic, query ON facts BEGIN
+                INSERT INTO facts_fts (facts_fts, rowid, fact, topic, query) VALUES ('delete', old.id, old.fact, old.topic, old.query);
+                INSERT INTO facts_fts (rowid, fact, topic, query) VALUES (new.id, new.fact, new.topic, new.query);
+            END;
+            """
+        )
+
+    def _connect(self):
+        """Return this thread's SQLite connection (sqlite3 connections are not shared across threads)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def add_facts(self, topic, facts, origin="web"):
+        """
+        Queue facts for writing; they are committed once batch_size are waiting.
+        
+        Args:
+            topic: The research topic the facts were gathered for
+            facts: Fact dictionaries; each fact's "query" is stored with it
+            origin: "web" or "document"
+        """
+        now = time.time()
+        rows = []
+        for fact in facts:
+            text = fact.get("fact")
+            if not text:
+                continue
+            content_hash = hashlib.sha256(f"{_normalize(topic)}\n{_normalize(text)}".encode("utf-8")).hexdigest()
+            rows.append((
+                content_hash,
+                topic,
+                fact.get("query") or topic,
+                text,
+                fact.get("source"),
+                json.dumps(fact.get("sources") or ([fact["source"]] if fact.get("source") else [])),
+                fact.get("category"),
+                origin,
+                now
+            ))
+        
+        with self._lock:
+            self._pending.extend(rows)
+            flush = len(self._pending) >= self.batch_size
+        if flush:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered fact in one transaction."""
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return
+        
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                """
+                INSERT INTO facts (content_hash, topic, query, fact, source, sources, category, origin, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (content_hash) DO UPDATE SET
+                    query = excluded.query,
+                    sources = excluded.sources,
+                    category = excluded.category,
+                    created_at = excluded.created_at
+                """,
+                rows
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _rows_to_facts(self, rows):
+        return [
+            {
+                "fact": fact,
+                "source": source,
+                "sources": json.loads(sources or "[]"),
+                "category": category,
+                "query": query,
+                "topic": topic,
+                "gathered_at": created_at
+            }
+            for fact, source, sources, category, query, topic, created_at in rows
+        ]
+
+    def find_for_query(self, search_query, max_age_seconds, origin="web", limit=20):
+        """
+        Return fresh facts previously gathered for an equivalent search query.
+        
+        A stored query matches if it contains every word of `search_query`
+        apart from stopwords, in any order.
+        
+        Args:
+            search_query: The sub-query about to be researched
+            max_age_seconds: Only facts gathered this recently count
+            origin: Only facts from this origin count
+            limit: Maximum facts to return
+        
+        Returns:
+            List of fact dictionaries, most recent first
+        """
+        self.flush()
+        expression = _match_expression(search_query, column="query")
+        if expression is None:
+            return []
+        rows = self._connect().execute(
+            """
+            SELECT f.fact, f.source, f.sources, f.category, f.query, f.topic, f.created_at
+            FROM facts_fts JOIN facts f ON f.id = facts_fts.rowid
+            WHERE facts_fts MATCH ? AND f.origin = ? AND f.created_at >= ?
+            ORDER BY f.created_at DESC
+            LIMIT ?
+            """,
+            (expression, origin, time.time() - max_age_seconds, limit)
+        ).fetchall()
+        return self._rows_to_facts(rows)
+
+    def search(self, text, limit=20):
+        """
+        Full-text search over every stored fact, best matches first.
+        
+        Args:
+            text: Words to look for
+            limit: Maximum facts to return
+        
+        Returns:
+            List of fact dictionaries
+        """
+        self.flush()
+        expression = _match_expression(text)
+        if expression is None:
+            return []
+        rows = self._connect().execute(
+            """
+            SELECT f.fact, f.source, f.sources, f.category, f.query, f.topic, f.created_at
+            FROM facts_fts JOIN facts f ON f.id = facts_fts.rowid
+            WHERE facts_fts MATCH ?
+            ORDER BY bm25(facts_fts)
+            LIMIT ?
+            """,
+            (expression, limit)
+        ).fetchall()
+        return self._rows_to_facts(rows)
+
+    def prune(self, max_age_seconds):
+        """Delete facts older than `max_age_seconds` and return how many were removed."""
+        self.flush()
+        return self._connect().execute(
+            "DELETE FROM facts WHERE created_at < ?",
+            (time.time() - max_age_seconds,)
+        ).rowcount
+
+_fact_store = None
+_fact_store_lock = threading.Lock()
+
+def get_fact_store():
+    """
+    Return the process-wide fact store configured from the environment.
+    
+    Returns:
+        The shared FactStore, or None if FACT_STORE_ENABLED is false
+    """
+    global _fact_store
+    
+    if not get_env_bool("FACT_STORE_ENABLED", True):
+        return None
+    
+    with _fact_store_lock:
+        if _fact_store is None:
+            _fact_store = FactStore(
+                path=os.environ.get("FACT_STORE_PATH", DEFAULT_FACT_STORE_PATH),
+                batch_size=get_env_int("FACT_STORE_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+            )
+            # Don't lose a partly filled batch when the app shuts down
+            atexit.register(_fact_store.flush)
+    return _fact_store
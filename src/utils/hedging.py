@@ -0,0 +1,322 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from src.utils.client_wrapper import ChatClientWrapper, on_sent
+from src.utils.config import get_env_bool, get_env_float, get_env_int
+
+# Latency samples kept per call type
+LATENCY_WINDOW = 200
+
+def get_call_type(request):
+    """
+    Group a request with others expected to take about as long.
+    
+    Latency mostly depends on the deployment, whether JSON mode is on and how
+    many output tokens may be generated, so max_tokens is bucketed by powers
+    of two.
+    
+    Args:
+        request: The keyword arguments for chat.completions.create
+    
+    Returns:
+        A hashable call type
+    """
+    max_tokens = request.get("max_tokens") or 0
+    return (
+        request.get("model"),
+        "json" if request.get("response_format") else "text",
+        max_tokens.bit_length() if isinstance(max_tokens, int) else 0
+    )
+
+class HedgingPolicy:
+    """
+    Decides when to send a duplicate of a slow request and keeps the statistics.
+    
+    Latencies are tracked per call type. Once a call type has `min_samples`
+    observations, a request still waiting at the `percentile` latency gets a
+    hedge. At most `max_inflight_hedges` hedges run at once, which caps the
+    extra load hedging can put on the deployment.
+    """
+
+    def __init__(self, percentile=0.95, min_samples=20, min_delay=0.5, max_inflight_hedges=2):
+        """
+        Initialize the policy.
+        
+        Args:
+            percentile: Latency percentile after which a request is hedged
+            min_samples: Observations needed before a call type is hedged
+            min_delay: Never hedge sooner than this many seconds
+            max_inflight_hedges: Maximum hedges running at the same time
+        """
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_inflight_hedges = max_inflight_hedges
+        self._latencies = {}
+        self._inflight_hedges = 0
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "hedged": 0, "hedge_wins": 0, "primary_wins": 0, "skipped_at_cap": 0}
+
+    def record(self, call_type, seconds):
+        """Record how long a completed request of `call_type` took."""
+        with self._lock:
+            samples = self._latencies.get(call_type)
+            if samples is None:
+                samples = self._latencies[call_type] = deque(maxlen=LATENCY_WINDOW)
+            samples.append(seconds)
+
+    def hedge_delay(self, call_type):
+        """
+        Return how long to wait before hedging a request.
+        
+        Returns:
+            Seconds, or None if the call type doesn't have enough history yet
+        """
+        with self._lock:
+            self.stats["requests"] += 1
+            samples = self._latencies.get(call_type)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile))
+        return max(self.min_delay, ordered[index])
+
+    def try_start_hedge(self):
+        """Claim a hedge slot. Returns False if max_inflight_hedges are already running."""
+        with self._lock:
+            if self._inflight_hedges >= self.max_inflight_hedges:
+                self.stats["skipped_at_cap"] += 1
+                return False
+            self._inflight_hedges += 1
+            self.stats["hedged"] += 1
+            return True
+
+    def finish_hedge(self, winner):
+        """Release a hedge slot and count which copy answered first ("primary", "hedge" or None)."""
+        with self._lock:
+            self._inflight_hedges -= 1
+            if winner == "hedge":
+                self.stats["hedge_wins"] += 1
+            elif winner == "primary":
+                self.stats["primary_wins"] += 1
+
+    def get_stats(self):
+        """Return a copy of the counters plus the share of hedges that won."""
+        with self._lock:
+            stats = dict(self.stats)
+        stats["hedge_win_rate"] = stats["hedge_wins"] / stats["hedged"] if stats["hedged"] else 0.0
+        return stats
+
+class HedgedChatClient(ChatClientWrapper):
+    """
+    Client wrapper that duplicates requests running past their call type's tail latency.
+    
+    Whichever copy answers first is returned and the other is cancelled (or,
+    for the sync client, left to finish in the background and discarded).
+    A primary that loses is still recorded, as a censored sample of the time
+    it had been running, so slow requests stay in the latency history.
+    Streaming requests are never hedged. This layer sits below the response
+    cache, so only cache misses are hedged and one response gets stored, and
+    above the rate limiter, so a hedge spends quota like any other request.
+    
+    Latency is timed from when the rate limiter actually sends the request
+    (see client_wrapper.on_sent()), and a request waiting for quota, a pool
+    member or a retry backoff is never hedged: its copy would only queue
+    behind it and push every other wait further out.
+    """
+
+    def __init__(self, client, policy):
+        super().__init__(client)
+        self.policy = policy
+        self._lock = threading.Lock()
+        self._executor = None if self.is_async else ThreadPoolExecutor(
+            max_workers=policy.max_inflight_hedges * 2 + 8,
+            thread_name_prefix="hedged-completion"
+        )
+
+    @staticmethod
+    def _new_attempt(wake=None):
+        """
+        Track one copy of a request.
+        
+        "sent_at" is when the copy was last sent, or None while it waits in
+        the layers below. Layers that don't report (see on_sent()) leave it at
+        the creation time. `wake` is an Event set whenever that changes.
+        """
+        return {"sent_at": time.monotonic(), "recorded": False, "wake": wake}
+
+    @staticmethod
+    def _sent_callback(attempt):
+        """Return the on_sent() callback that keeps `attempt`'s "sent_at" current."""
+        def callback(sent):
+            attempt["sent_at"] = time.monotonic() if sent else None
+            if attempt["wake"] is not None:
+                attempt["wake"].set()
+        return callback
+
+    def _record(self, call_type, attempt, sample=True):
+        """Record an attempt's latency so far, once; later calls for the same attempt do nothing."""
+        with self._lock:
+            if attempt["recorded"]:
+                return
+            attempt["recorded"] = True
+            sent_at = attempt["sent_at"]
+        # A copy that never got past the queue says nothing about the service's latency
+        if sample and sent_at is not None:
+            self.policy.record(call_type, time.monotonic() - sent_at)
+
+    @staticmethod
+    def _hedge_timeout(attempt, delay):
+        """Return seconds until the primary is due a hedge: None while it is queued, 0 if due now."""
+        sent_at = attempt["sent_at"]
+        if sent_at is None:
+            return None
+        return max(0.0, sent_at + delay - time.monotonic())
+
+    def _wait_to_hedge(self, primary, attempt, delay):
+        """Block until the primary has been sent for `delay` seconds (True) or is done (False)."""
+        primary.add_done_callback(lambda _: attempt["wake"].set())
+        while True:
+            attempt["wake"].clear()
+            if primary.done():
+                return False
+            timeout = self._hedge_timeout(attempt, delay)
+            if timeout == 0:
+                return True
+            attempt["wake"].wait(timeout)
+
+    async def _wait_to_hedge_async(self, primary, attempt, delay):
+        """Wait until the primary has been sent for `delay` seconds (True) or is done (False)."""
+        primary.add_done_callback(lambda _: attempt["wake"].set())
+        while True:
+            attempt["wake"].clear()
+            if primary.done():
+                return False
+            timeout = self._hedge_timeout(attempt, delay)
+            if timeout == 0:
+                return True
+            try:
+                await asyncio.wait_for(attempt["wake"].wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _abandon(self, call_type, primary, hedge, winner):
+        """
+        Account for the copy that lost.
+        
+        A losing primary has been running longer than the hedge delay and its
+        real latency is unknown, so the time so far is recorded as a censored
+        sample. Dropping it would leave the tail out of the history and pull
+        the hedge delay down. A losing hedge adds no sample: the request is
+        already counted through its primary.
+        """
+        if winner == "hedge":
+            self._record(call_type, primary)
+        elif winner == "primary":
+            self._record(call_type, hedge, sample=False)
+
+    def _timed_call(self, call_type, kwargs, attempt=None):
+        attempt = attempt or self._new_attempt()
+        with on_sent(self._sent_callback(attempt)):
+            response = self.client.chat.completions.create(**kwargs)
+        self._record(call_type, attempt)
+        return response
+
+    async def _timed_call_async(self, call_type, kwargs, attempt=None):
+        attempt = attempt or self._new_attempt()
+        with on_sent(self._sent_callback(attempt)):
+            response = await self.client.chat.completions.create(**kwargs)
+        self._record(call_type, attempt)
+        return response
+
+    def _create(self, **kwargs):
+        call_type = get_call_type(kwargs)
+        delay = None if kwargs.get("stream") else self.policy.hedge_delay(call_type)
+        if delay is None:
+            return self._timed_call(call_type, kwargs)
+        
+        primary_attempt = self._new_attempt(threading.Event())
+        primary = self._executor.submit(self._timed_call, call_type, kwargs, primary_attempt)
+        if not self._wait_to_hedge(primary, primary_attempt, delay) or not self.policy.try_start_hedge():
+            return primary.result()
+        
+        hedge_attempt = self._new_attempt()
+        hedge = self._executor.submit(self._timed_call, call_type, kwargs, hedge_attempt)
+        pending = {primary, hedge}
+        winner = None
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # A failed copy only matters if the other one fails too
+                    if future.exception() is None:
+                        winner = "hedge" if future is hedge else "primary"
+                        return future.result()
+            return primary.result()
+        finally:
+            # The losing copy finishes in the background; its late result isn't recorded
+            self._abandon(call_type, primary_attempt, hedge_attempt, winner)
+            self.policy.finish_hedge(winner)
+
+    async def _create_async(self, **kwargs):
+        call_type = get_call_type(kwargs)
+        delay = None if kwargs.get("stream") else self.policy.hedge_delay(call_type)
+        if delay is None:
+            return await self._timed_call_async(call_type, kwargs)
+        
+        primary_attempt = self._new_attempt(asyncio.Event())
+        primary = asyncio.ensure_future(self._timed_call_async(call_type, kwargs, primary_attempt))
+        try:
+            hedge_due = await self._wait_to_hedge_async(primary, primary_attempt, delay)
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        if not hedge_due or not self.policy.try_start_hedge():
+            return await primary
+        
+        hedge_attempt = self._new_attempt()
+        hedge = asyncio.ensure_future(self._timed_call_async(call_type, kwargs, hedge_attempt))
+        pending = {primary, hedge}
+        winner = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # A failed copy only matters if the other one fails too
+                    if task.exception() is None:
+                        winner = "hedge" if task is hedge else "primary"
+                        return task.result()
+            return primary.result()
+        finally:
+            self._abandon(call_type, primary_attempt, hedge_attempt, winner)
+            for task in (primary, hedge):
+                if not task.done():
+                    task.cancel()
+            self.policy.finish_hedge(winner)
+
+_hedging_policy = None
+_hedging_policy_lock = threading.Lock()
+
+def get_hedging_policy():
+    """
+    Return the process-wide hedging policy configured from the environment.
+    
+    Returns:
+        The shared HedgingPolicy, or None unless AZURE_HEDGING_ENABLED is true
+    """
+    global _hedging_policy
+    
+    if not get_env_bool("AZURE_HEDGING_ENABLED", False):
+        return None
+    
+    with _hedging_policy_lock:
+        if _hedging_policy is None:
+            _hedging_policy = HedgingPolicy(
+                percentile=get_env_float("AZURE_HEDGE_PERCENTILE", 0.95),
+                min_samples=get_env_int("AZURE_HEDGE_MIN_SAMPLES", 20),
+                min_delay=get_env_float("AZURE_HEDGE_MIN_DELAY_SECONDS", 0.5),
+                max_inflight_hedges=max(1, get_env_int("AZURE_HEDGE_MAX_INFLIGHT", 2))
+            )
+    return _hedging_policy
@@ -0,0 +1,366 @@
+"""
+Local stand-in for the Azure OpenAI chat completions API.
+
+Serves the same routes the AzureOpenAI client calls, including JSON mode and
+streaming, with configurable latency, token throughput and injected 429s.
+Responses are deterministic for a given request, so the pipeline can be
+benchmarked and load-tested offline without spending Azure quota.
+
+Run it with:
+    python -m src.utils.mock_azure_server --port 8765 --latency lognormal --latency-ms 800
+
+and point the app at it with AZURE_USE_MOCK_SERVER=true (or set
+AZURE_ENDPOINT=http://127.0.0.1:8765 directly).
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.utils.token_budget import count_message_tokens
+
+# Raised when writing to a client that has already hung up
+DISCONNECT_ERRORS = (BrokenPipeError, ConnectionResetError)
+
+CHAT_COMPLETIONS_PATH = re.compile(r"^/openai/deployments/(?P<deployment>[^/]+)/chat/completions$")
+
+# Words used to build deterministic report text
+VOCABULARY = (
+    "research analysis evidence findings data trend impact market study growth risk "
+    "policy adoption model system performance cost benefit review outcome signal"
+).split()
+
+class MockServerConfig:
+    """Behaviour of the mock server: latency, throughput and fault injection."""
+
+    def __init__(self, latency="fixed", latency_ms=500.0, latency_jitter_ms=200.0, tokens_per_second=80.0,
+                 rate_limit_probability=0.0, retry_after_ms=1000, server_error_probability=0.0,
+                 completion_tokens=400, seed=0):
+        """
+        Initialize the configuration.
+        
+        Args:
+            latency: Time-to-first-token distribution: "fixed", "uniform" or "lognormal"
+            latency_ms: Mean (fixed/lognormal) or centre (uniform) time to first token
+            latency_jitter_ms: Half-width for "uniform", standard deviation for "lognormal"
+            tokens_per_second: Simulated generation throughput after the first token
+            rate_limit_probability: Chance of answering a request with a 429
+            retry_after_ms: Retry-After sent with injected 429s
+            server_error_probability: Chance of answering a request with a 500
+            completion_tokens: Length of free-text answers (capped by max_tokens)
+            seed: Seed for the latency and fault-injection random stream
+        """
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.tokens_per_second = tokens_per_second
+        self.rate_limit_probability = rate_limit_probability
+        self.retry_after_ms = retry_after_ms
+        self.server_error_probability = server_error_probability
+        self.completion_tokens = completion_tokens
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "rate_limited": 0, "server_errors": 0, "streamed": 0, "disconnects": 0}
+
+    def sample_latency(self):
+        """Draw a time-to-first-token in seconds from the configured distribution."""
+        with self.lock:
+            if self.latency == "uniform":
+                value = self.random.uniform(self.latency_ms - self.latency_jitter_ms, self.latency_ms + self.latency_jitter_ms)
+            elif self.latency == "lognormal" and self.latency_ms > 0:
+                # Pick mu/sigma so the distribution has the requested mean and standard deviation
+                sigma = math.sqrt(math.log(1 + (self.latency_jitter_ms / self.latency_ms) ** 2))
+                mu = math.log(self.latency_ms) - sigma ** 2 / 2
+                value = self.random.lognormvariate(mu, sigma)
+            else:
+                value = self.latency_ms
+        return max(0.0, value) / 1000.0
+
+    def roll(self, probability):
+        """Return True with the given probability."""
+        if probability <= 0:
+            return False
+        with self.lock:
+            return self.random.random() < probability
+
+def _request_seed(request):
+    """Stable integer derived from the request, so identical requests get identical answers."""
+    canonical = json.dumps(request.get("messages", []), sort_keys=True)
+    return int(hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:12], 16)
+
+def _extract_topic(prompt):
+    """Find the quoted research topic in an agent prompt."""
+    match = re.search(r'"([^"\n]{1,200})"', prompt)
+    return match.group(1) if match else "the topic"
+
+def _mock_facts(topic, rng, count=3, source=None):
+    """Build `count` fact objects about `topic`."""
+    categories = ["Background", "Recent Developments", "Key Challenges", "Statistics"]
+    facts = []
+    for i in range(count):
+        number = rng.randint(1000, 9999)
+        facts.append({
+            "fact": f"Mock finding {number} about {topic}: {' '.join(rng.choice(VOCABULARY) for _ in range(8))}.",
+            "source": source or f"https://example.com/{topic.replace(' ', '-').lower()}/{number}",
+            "category": categories[(number + i) % len(categories)]
+        })
+    return facts
+
+def build_response_content(request, config):
+    """
+    Produce the deterministic answer for a chat completion request.
+    
+    JSON-mode requests get an object shaped like the agents expect (a research
+    plan, a list of facts or per-chunk lists of facts); other requests get
+    Markdown text.
+    
+    Args:
+        request: The parsed request body
+        config: The MockServerConfig
+    
+    Returns:
+        The answer text
+    """
+    rng = random.Random(_request_seed(request))
+    messages = request.get("messages", [])
+    prompt = messages[-1].get("content", "") if messages else ""
+    if not isinstance(prompt, str):
+        prompt = json.dumps(prompt)
+    topic = _extract_topic(prompt)
+    response_format = request.get("response_format") or {}
+    
+    if response_format.get("type") in ("json_object", "json_schema"):
+        if "search_queries" in prompt:
+            content = {
+                "query": topic,
+                "search_queries": [f"{topic} overview", f"{topic} recent studies", f"{topic} key facts", f"{topic} challenges"],
+                "focus_areas": ["Background", "Recent Developments", "Key Challenges"],
+                "main_objectives": ["Understand key concepts", "Identify major findings", "Synthesize information"]
+            }
+        else:
+            chunk_ids = re.findall(r'<chunk id="(\d+)"', prompt)
+            if chunk_ids:
+                content = {"chunks": [
+                    {"chunk_id": int(chunk_id), "facts": _mock_facts(topic, rng, source="Uploaded Document")}
+                    for chunk_id in chunk_ids
+                ]}
+            else:
+                content = {"facts": _mock_facts(topic, rng)}
+        return json.dumps(content)
+    
+    length = min(request.get("max_tokens") or config.completion_tokens, config.completion_tokens)
+    lines = [f"# Research Report: {topic}", "", "## Executive Summary"]
+    words = [rng.choice(VOCABULARY) for _ in range(max(1, length - 10))]
+    for start in range(0, len(words), 12):
+        lines.append(" ".join(words[start:start + 12]).capitalize() + ".")
+    return "\n".join(lines)
+
+class MockAzureOpenAIHandler(BaseHTTPRequestHandler):
+    """Request handler speaking the Azure OpenAI chat completions protocol."""
+    
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Keep benchmark output quiet
+        pass
+
+    def _client_gone(self):
+        """Stop handling a request whose client disconnected (a cancelled hedge, a timeout, an abandoned stream)."""
+        self.close_connection = True
+        with self.server.config.lock:
+            self.server.config.stats["disconnects"] += 1
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+        except DISCONNECT_ERRORS:
+            self._client_gone()
+
+    def do_HEAD(self):
+        # Connection prewarming probes the endpoint root
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        config = self.server.config
+        path = self.path.split("?", 1)[0]
+        match = CHAT_COMPLETIONS_PATH.match(path)
+        
+        length = int(self.headers.get("Content-Length", 0))
+        raw_body = self.rfile.read(length) if length else b""
+        if not match:
+            self._send_json(404, {"error": {"code": "404", "message": f"Resource not found: {path}"}})
+            return
+        
+        try:
+            request = json.loads(raw_body or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"code": "400", "message": "Request body is not valid JSON"}})
+            return
+        
+        with config.lock:
+            config.stats["requests"] += 1
+        
+        if config.roll(config.rate_limit_probability):
+            with config.lock:
+                config.stats["rate_limited"] += 1
+            self._send_json(
+                429,
+                {"error": {"code": "429", "message": "Requests to the deployment have exceeded the rate limit."}},
+                headers={
+                    "retry-after-ms": str(config.retry_after_ms),
+                    "retry-after": str(max(1, math.ceil(config.retry_after_ms / 1000)))
+                }
+            )
+            return
+        
+        if config.roll(config.server_error_probability):
+            with config.lock:
+                config.stats["server_errors"] += 1
+            self._send_json(500, {"error": {"code": "500", "message": "Injected server error."}})
+            return
+        
+        deployment = match.group("deployment")
+        content = build_response_content(request, config)
+        prompt_tokens = count_message_tokens(request.get("messages", []))
+        # Approximate tokens as whitespace-separated pieces for pacing and usage
+        pieces = re.findall(r"\S+\s*", content) or [content]
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(pieces),
+            "total_tokens": prompt_tokens + len(pieces)
+        }
+        completion_id = f"chatcmpl-mock-{_request_seed(request):x}"
+        
+        time.sleep(config.sample_latency())
+        
+        if request.get("stream"):
+            with config.lock:
+                config.stats["streamed"] += 1
+            self._stream(completion_id, deployment, pieces, config)
+            return
+        
+        if config.tokens_per_second > 0:
+            time.sleep(len(pieces) / config.tokens_per_second)
+        
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": deployment,
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content}
+            }],
+            "usage": usage
+        })
+
+    def _stream(self, completion_id, deployment, pieces, config):
+        """Send the answer as server-sent events, paced at tokens_per_second."""
+        try:
+            self._send_events(completion_id, deployment, pieces, config)
+        except DISCONNECT_ERRORS:
+            self._client_gone()
+
+    def _send_events(self, completion_id, deployment, pieces, config):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send_chunk(delta, finish_reason=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": deployment,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        
+        delay = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0
+        send_chunk({"role": "assistant", "content": ""})
+        for piece in pieces:
+            send_chunk({"content": piece})
+            if delay:
+                time.sleep(delay)
+        send_chunk({}, finish_reason="stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+def start_mock_server(config=None, host="127.0.0.1", port=0):
+    """
+    Start the mock server on a background thread.
+    
+    Args:
+        config: MockServerConfig (defaults to fixed 500 ms latency, no faults)
+        host: Interface to bind
+        port: Port to bind (0 picks a free port)
+    
+    Returns:
+        The running server; its endpoint is f"http://{host}:{server.server_port}".
+        Call server.shutdown() to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), MockAzureOpenAIHandler)
+    server.daemon_threads = True
+    server.config = config or MockServerConfig()
+    thread = threading.Thread(target=server.serve_forever, name="mock-azure-openai", daemon=True)
+    thread.start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Azure OpenAI chat completions API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default="fixed")
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=200.0)
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--rate-limit-probability", type=float, default=0.0)
+    parser.add_argument("--retry-after-ms", type=int, default=1000)
+    parser.add_argument("--server-error-probability", type=float, default=0.0)
+    parser.add_argument("--completion-tokens", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    config = MockServerConfig(
+        latency=args.latency,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        tokens_per_second=args.tokens_per_second,
+        rate_limit_probability=args.rate_limit_probability,
+        retry_after_ms=args.retry_after_ms,
+        server_error_probability=args.server_error_probability,
+        completion_tokens=args.completion_tokens,
+        seed=args.seed
+    )
+    server = ThreadingHTTPServer((args.host, args.port), MockAzureOpenAIHandler)
+    server.daemon_threads = True
+    server.config = config
+    print(f"Mock Azure OpenAI server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {config.stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Iterator
+import PyPDF2
+from src.utils.config import get_env_int
+
+# Pool processes import this module, so it deliberately stays light (no pandas, no Streamlit)
+
+# PDFs with at least this many pages are extracted in a process pool (PDF_PARALLEL_MIN_PAGES).
+# Spawning a worker costs 0.25-2 s while a text page takes 5-20 ms in this process,
+# so the pool only pays off well past a hundred pages.
+PDF_PARALLEL_MIN_PAGES = 200
+# Pages extracted per pool task
+PDF_PAGES_PER_TASK = 16
+
+_worker_pdf_reader = None
+
+def _init_pdf_worker(data):
+    """Open the PDF once in each pool process."""
+    global _worker_pdf_reader
+    _worker_pdf_reader = PyPDF2.PdfReader(BytesIO(data))
+
+def _extract_pdf_pages(start, end):
+    """Extract pages start:end of the PDF opened by _init_pdf_worker()."""
+    return [_worker_pdf_reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+def iter_pdf_pages(source, max_workers=None) -> Iterator[str]:
+    """
+    Yield the text of each page of a PDF, in page order, as soon as it is extracted.
+    
+    Page text extraction is CPU-bound, so large PDFs (PDF_PARALLEL_MIN_PAGES
+    or more, also settable in the environment) are split into ranges of
+    PDF_PAGES_PER_TASK pages spread over a process pool, where each worker
+    parses the file once. The first range is
+    extracted in this process while the pool starts up, and pages are yielded
+    in order as the later ranges finish. Smaller PDFs, or any PDF if the pool
+    can't be started, are extracted in this process.
+    
+    Args:
+        source: Path, raw bytes or binary file object of the PDF
+        max_workers: Pool processes (PDF_EXTRACTION_WORKERS, default the CPU count)
+    
+    Yields:
+        str: Text of each page
+    """
+    if isinstance(source, (bytes, bytearray)):
+        data = bytes(source)
+    elif isinstance(source, str):
+        with open(source, 'rb') as file:
+            data = file.read()
+    else:
+        data = source.read()
+    
+    pdf_reader = PyPDF2.PdfReader(BytesIO(data))
+    page_count = len(pdf_reader.pages)
+    max_workers = max_workers or get_env_int("PDF_EXTRACTION_WORKERS", os.cpu_count() or 1)
+    min_pages = get_env_int("PDF_PARALLEL_MIN_PAGES", PDF_PARALLEL_MIN_PAGES)
+    
+    next_page = 0
+    if page_count >= min_pages and max_workers > 1:
+        ranges = [(start, min(start + PDF_PAGES_PER_TASK, page_count)) for start in range(PDF_PAGES_PER_TASK, page_count, PDF_PAGES_PER_TASK)]
+        try:
+            # Spawned rather than forked: the Streamlit server has threads running
+            with ProcessPoolExecutor(
+                max_workers=min(max_workers, len(ranges)),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_pdf_worker,
+                initargs=(data,)
+            ) as pool:
+                futures = [pool.submit(_extract_pdf_pages, start, end) for start, end in ranges]
+                for page in pdf_reader.pages[:PDF_PAGES_PER_TASK]:
+                    yield page.extract_text() or ""
+                    next_page += 1
+                for future in futures:
+                    for text in future.result():
+                        yield text
+                        next_page += 1
+        except (OSError, BrokenProcessPool) as e:
+            print(f"Parallel PDF extraction failed ({e}), continuing in this process from page {next_page + 1}")
+    
+    for page in pdf_reader.pages[next_page:]:
+        yield page.extract_text() or ""
@@ -0,0 +1,255 @@
+import asyncio
+import random
+import threading
+import time
+from openai import APIConnectionError, InternalServerError, RateLimitError
+from src.utils.client_wrapper import ChatClientWrapper, report_sent
+from src.utils.config import get_env_float, get_env_int
+from src.utils.token_budget import count_message_tokens
+
+# Azure enforces per-minute quotas over short windows, so only allow a burst
+# of this many seconds' worth of quota at once
+BURST_WINDOW_SECONDS = 10
+
+# Errors worth retrying after a pause; anything else goes straight back to the caller
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+def estimate_request_tokens(request):
+    """
+    Estimate how many tokens Azure will charge a request against the TPM quota.
+    
+    Azure reserves quota from the prompt size plus the requested max_tokens
+    when the request arrives, so the estimate counts both.
+    
+    Args:
+        request: The keyword arguments for chat.completions.create
+    
+    Returns:
+        Estimated token count
+    """
+    return count_message_tokens(request.get("messages", [])) + (request.get("max_tokens") or 0)
+
+class RateLimiter:
+    """
+    Token-bucket limiter for requests-per-minute and tokens-per-minute quotas.
+    
+    Callers reserve capacity up front and the bucket is allowed to go into
+    debt, so each caller gets a wait time that reflects its place in line.
+    Requests queue first-come-first-served and the deployment is kept right
+    at its quota instead of being probed with requests that come back as 429s.
+    A 429 pauses every caller until its Retry-After has passed.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        """
+        Initialize the limiter.
+        
+        Args:
+            requests_per_minute: RPM quota, or None for no request limit
+            tokens_per_minute: TPM quota, or None for no token limit
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.request_capacity = max(1.0, (requests_per_minute or 0) * BURST_WINDOW_SECONDS / 60.0)
+        self.token_capacity = max(1.0, (tokens_per_minute or 0) * BURST_WINDOW_SECONDS / 60.0)
+        self._request_level = self.request_capacity
+        self._token_level = self.token_capacity
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "throttled": 0, "wait_seconds": 0.0, "rate_limited_responses": 0}
+
+    def _refill(self, now):
+        """Top both buckets up for the time since the last update. Caller holds the lock."""
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        if self.requests_per_minute:
+            self._request_level = min(
+                self.request_capacity,
+                self._request_level + elapsed * self.requests_per_minute / 60.0
+            )
+        if self.tokens_per_minute:
+            self._token_level = min(
+                self.token_capacity,
+                self._token_level + elapsed * self.tokens_per_minute / 60.0
+            )
+
+    def reserve(self, tokens):
+        """
+        Reserve quota for one request.
+        
+        Args:
+            tokens: Estimated tokens for the request
+        
+        Returns:
+            Seconds the caller must wait before sending the request
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            
+            wait = max(0.0, self._blocked_until - now)
+            if self.requests_per_minute:
+                self._request_level -= 1
+                if self._request_level < 0:
+                    wait = max(wait, -self._request_level * 60.0 / self.requests_per_minute)
+            if self.tokens_per_minute:
+                self._token_level -= tokens
+                if self._token_level < 0:
+                    wait = max(wait, -self._token_level * 60.0 / self.tokens_per_minute)
+            
+            self.stats["requests"] += 1
+            if wait > 0:
+                self.stats["throttled"] += 1
+                self.stats["wait_seconds"] += wait
+        return wait
+
+    def acquire(self, tokens):
+        """Block until there is quota for a request of `tokens` estimated tokens."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens):
+        """Wait without blocking the event loop until there is quota for the request."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def block_for(self, seconds):
+        """Hold every caller back for `seconds`, e.g. after the service returned a 429."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self.stats["rate_limited_responses"] += 1
+
+    def blocked_for(self):
+        """Return how many more seconds callers are held back by block_for()."""
+        with self._lock:
+            return max(0.0, self._blocked_until - time.monotonic())
+
+def get_retry_after(error):
+    """
+    Read the server's requested retry delay from an API error.
+    
+    Args:
+        error: An openai.APIStatusError (or subclass)
+    
+    Returns:
+        Delay in seconds, or None if the response didn't specify one
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        # Retry-After may also be an HTTP date; fall back to backoff
+        pass
+    return None
+
+class RateLimitedChatClient(ChatClientWrapper):
+    """
+    Client wrapper that queues calls against a shared RateLimiter and retries throttled calls.
+    
+    429s, 5xx responses and connection errors are retried up to `max_retries`
+    times. The wait honors Retry-After when the service sends one and otherwise
+    uses exponential backoff with full jitter.
+    """
+
+    def __init__(self, client, limiter, max_retries=6, backoff_base=1.0, backoff_max=60.0):
+        super().__init__(client)
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def _retry_delay(self, error, attempt):
+        """Work out how long to wait before retrying after `error`."""
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            delay = retry_after + random.uniform(0, self.backoff_base)
+        else:
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        
+        if isinstance(error, RateLimitError):
+            # The quota is shared, so everyone waits, not just this caller
+            self.limiter.block_for(delay)
+        
+        print(f"Azure OpenAI call failed ({error.__class__.__name__}), retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+        return delay
+
+    def _create(self, **kwargs):
+        tokens = estimate_request_tokens(kwargs)
+        attempt = 0
+        while True:
+            report_sent(False)
+            self.limiter.acquire(tokens)
+            report_sent(True)
+            try:
+                return self.client.chat.completions.create(**kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                report_sent(False)
+                time.sleep(self._retry_delay(e, attempt))
+                attempt += 1
+
+    async def _create_async(self, **kwargs):
+        tokens = estimate_request_tokens(kwargs)
+        attempt = 0
+        while True:
+            report_sent(False)
+            await self.limiter.acquire_async(tokens)
+            report_sent(True)
+            try:
+                return await self.client.chat.completions.create(**kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                report_sent(False)
+                await asyncio.sleep(self._retry_delay(e, attempt))
+                attempt += 1
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+    """
+    Return the process-wide rate limiter configured from the environment.
+    
+    AZURE_RPM_LIMIT and AZURE_TPM_LIMIT set the deployment's quotas; leave
+    them unset (or 0) to only react to 429 responses.
+    """
+    global _rate_limiter
+    
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter(
+                requests_per_minute=get_env_int("AZURE_RPM_LIMIT", 0) or None,
+                tokens_per_minute=get_env_int("AZURE_TPM_LIMIT", 0) or None
+            )
+    return _rate_limiter
+
+def wrap_with_rate_limiter(client, limiter=None):
+    """
+    Wrap `client` so its calls queue on the shared rate limiter and retry when throttled.
+    
+    Args:
+        client: The client to wrap
+        limiter: Limiter to use (defaults to get_rate_limiter())
+    
+    Returns:
+        A RateLimitedChatClient
+    """
+    return RateLimitedChatClient(
+        client,
+        limiter or get_rate_limiter(),
+        max_retries=get_env_int("AZURE_MAX_RETRIES", 6),
+        backoff_base=get_env_float("AZURE_BACKOFF_BASE_SECONDS", 1.0),
+        backoff_max=get_env_float("AZURE_BACKOFF_MAX_SECONDS", 60.0)
+    )
@@ -0,0 +1,257 @@
+import json
+import re
+from src.utils.config import get_env_bool
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# How many cut points parse_json() tries when repairing, newest first, before giving up
+MAX_REPAIR_ATTEMPTS = 25
+
+FACT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "fact": {"type": "string"},
+        "source": {"type": "string"},
+        "category": {"type": "string"}
+    },
+    "required": ["fact", "source", "category"],
+    "additionalProperties": False
+}
+
+FACTS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "facts": {"type": "array", "items": FACT_SCHEMA}
+    },
+    "required": ["facts"],
+    "additionalProperties": False
+}
+
+# Strict schemas can't have free-form keys, so packed facts are a list of per-chunk entries
+PACKED_FACTS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "chunks": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "chunk_id": {"type": "integer"},
+                    "facts": {"type": "array", "items": FACT_SCHEMA}
+                },
+                "required": ["chunk_id", "facts"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["chunks"],
+    "additionalProperties": False
+}
+
+PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "query": {"type": "string"},
+        "search_queries": {"type": "array", "items": {"type": "string"}},
+        "focus_areas": {"type": "array", "items": {"type": "string"}},
+        "main_objectives": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["query", "search_queries", "focus_areas", "main_objectives"],
+    "additionalProperties": False
+}
+
+_TYPE_CHECKS = {
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+    "string": lambda value: isinstance(value, str),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "null": lambda value: value is None
+}
+
+def compile_validator(schema, path="$"):
+    """
+    Turn a JSON schema into a validation function, once, ahead of time.
+    
+    Supports the subset used for structured outputs: "type", "properties",
+    "required", "items" and "enum". Extra properties are not rejected; with
+    structured outputs the API already enforces additionalProperties.
+    
+    Args:
+        schema: The JSON schema
+        path: Location reported in error messages
+    
+    Returns:
+        A function that raises ValueError if its argument doesn't match
+    """
+    checks = []
+    
+    types = schema.get("type")
+    if types:
+        types = [types] if isinstance(types, str) else list(types)
+        type_checks = [_TYPE_CHECKS[name] for name in types]
+        expected = " or ".join(types)
+
+        def check_type(value):
+            if not any(type_check(value) for type_check in type_checks):
+                raise ValueError(f"{path}: expected {expected}, got {type(value).__name__}")
+        checks.append(check_type)
+    
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+
+        def check_enum(value):
+            if value not in allowed:
+                raise ValueError(f"{path}: {value!r} is not one of {allowed}")
+        checks.append(check_enum)
+    
+    required = list(schema.get("required", ()))
+    properties = [
+        (name, compile_validator(subschema, f"{path}.{name}"))
+        for name, subschema in schema.get("properties", {}).items()
+    ]
+    if required or properties:
+        def check_properties(value):
+            if not isinstance(value, dict):
+                return
+            for name in required:
+                if name not in value:
+                    raise ValueError(f"{path}: missing required property '{name}'")
+            for name, validate in properties:
+                if name in value:
+                    validate(value[name])
+        checks.append(check_properties)
+    
+    if "items" in schema:
+        validate_item = compile_validator(schema["items"], f"{path}[]")
+
+        def check_items(value):
+            if isinstance(value, list):
+                for item in value:
+                    validate_item(item)
+        checks.append(check_items)
+
+    def validate(value):
+        for check in checks:
+            check(value)
+    return validate
+
+validate_facts = compile_validator(FACTS_SCHEMA)
+validate_packed_facts = compile_validator(PACKED_FACTS_SCHEMA)
+validate_plan = compile_validator(PLAN_SCHEMA)
+
+def json_schema_format(name, schema):
+    """
+    Build the response_format for a request that must match `schema`.
+    
+    Uses strict JSON-schema structured outputs unless AZURE_STRUCTURED_OUTPUTS
+    is false (for deployments or API versions without them), in which case
+    plain JSON mode is requested and the schema is only checked locally.
+    
+    Args:
+        name: Schema name sent to the API
+        schema: The JSON schema
+    
+    Returns:
+        The response_format argument for chat.completions.create
+    """
+    if not get_env_bool("AZURE_STRUCTURED_OUTPUTS", True):
+        return {"type": "json_object"}
+    return {"type": "json_schema", "json_schema": {"name": name, "schema": schema, "strict": True}}
+
+def loads(text):
+    """Parse JSON with orjson when it is installed, else the standard library. Raises ValueError."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+def _strip_code_fence(text):
+    """Remove a ```json ... ``` wrapper some models add even in JSON mode."""
+    match = re.match(r"^\s*```(?:json)?\s*(.*?)\s*(?:```\s*)?$", text, re.DOTALL)
+    return match.group(1) if match else text
+
+def _repair_candidates(text):
+    """
+    Yield closed-off versions of truncated JSON, longest first.
+    
+    The text is scanned once, noting every point where it could be cut
+    cleanly (after a complete value or an opening bracket) together with the
+    brackets still open there. Each candidate is the text up to such a point
+    with a dangling comma dropped and the open brackets closed.
+    """
+    stack = []
+    cuts = []
+    in_string = False
+    escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+            cuts.append((index + 1, "".join(reversed(stack))))
+        elif char in "}]":
+            if stack:
+                stack.pop()
+            cuts.append((index + 1, "".join(reversed(stack))))
+        elif char == ",":
+            cuts.append((index, "".join(reversed(stack))))
+    
+    for end, closers in reversed(cuts[-MAX_REPAIR_ATTEMPTS:]):
+        yield text[:end].rstrip().rstrip(",") + closers
+
+def parse_json(text, validate=None, return_repaired=False):
+    """
+    Parse and validate a model's JSON answer, repairing truncated output locally.
+    
+    If the text doesn't parse (typically because the answer hit max_tokens
+    mid-object), the longest prefix that can be closed into valid JSON and
+    passes `validate` is returned instead, so the facts written before the
+    cut-off are kept without another request.
+    
+    Args:
+        text: The response content
+        validate: Optional callable that raises ValueError for an unusable result
+        return_repaired: Also return whether the result was repaired, i.e. is
+            missing whatever came after the cut-off
+    
+    Returns:
+        The parsed JSON, or a tuple of (parsed JSON, repaired) with return_repaired
+    
+    Raises:
+        ValueError: If the text can't be parsed or repaired into a valid result
+    """
+    if not text:
+        raise ValueError("empty response")
+    text = _strip_code_fence(text)
+    
+    try:
+        result = loads(text)
+    except ValueError as e:
+        error = e
+    else:
+        if validate is not None:
+            validate(result)
+        return (result, False) if return_repaired else result
+    
+    for candidate in _repair_candidates(text):
+        try:
+            result = loads(candidate)
+            if validate is not None:
+                validate(result)
+        except ValueError:
+            continue
+        print(f"Repaired truncated JSON response locally ({len(text)} characters received)")
+        return (result, True) if return_repaired else result
+    raise ValueError(f"invalid JSON: {error}")
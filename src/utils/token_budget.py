@@ -0,0 +1,193 @@
+import functools
+import logging
+import os
+from src.utils.config import get_env_int
+from src.utils.tracing import log_operation
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# gpt-4o and gpt-4o-mini tokenizer; override with AZURE_TOKENIZER_ENCODING
+DEFAULT_ENCODING = "o200k_base"
+
+DEFAULT_CONTEXT_WINDOW_TOKENS = 128000
+DEFAULT_MAX_OUTPUT_TOKENS = 16384
+
+# Where tiktoken keeps downloaded encodings; pre-fetch them here to run offline
+# (override with TIKTOKEN_CACHE_DIR)
+DEFAULT_TIKTOKEN_CACHE_DIR = os.path.join(".cache", "tiktoken")
+
+# Characters-per-token ratio used when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+# Chat format overhead: tokens added per message and to prime the reply
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+def get_context_window_tokens():
+    """Return the deployment's context window in tokens (AZURE_CONTEXT_WINDOW_TOKENS)."""
+    return get_env_int("AZURE_CONTEXT_WINDOW_TOKENS", DEFAULT_CONTEXT_WINDOW_TOKENS)
+
+def get_max_output_tokens():
+    """Return the most tokens the deployment will generate per response (AZURE_MAX_OUTPUT_TOKENS)."""
+    return get_env_int("AZURE_MAX_OUTPUT_TOKENS", DEFAULT_MAX_OUTPUT_TOKENS)
+
+@functools.lru_cache(maxsize=None)
+def _load_encoding(name):
+    """
+    Load a tiktoken encoding once, or return None if it isn't available.
+    
+    tiktoken downloads an encoding on first use and keeps it in
+    TIKTOKEN_CACHE_DIR, which defaults to .cache/tiktoken so that a file
+    fetched once (python -m src.utils.token_budget) also works offline.
+    """
+    if tiktoken is None:
+        print("tiktoken is not installed; estimating token counts from characters")
+        return None
+    os.environ.setdefault("TIKTOKEN_CACHE_DIR", DEFAULT_TIKTOKEN_CACHE_DIR)
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        print(
+            f"Could not load tokenizer '{name}' ({e}); estimating token counts from characters. "
+            f"Fetch it into {os.environ['TIKTOKEN_CACHE_DIR']} with: python -m src.utils.token_budget"
+        )
+        return None
+
+def get_encoding():
+    """Return the tokenizer for the configured deployment, or None to fall back to estimates."""
+    return _load_encoding(os.environ.get("AZURE_TOKENIZER_ENCODING", DEFAULT_ENCODING))
+
+def count_tokens(text):
+    """
+    Count the tokens in a piece of text.
+    
+    Args:
+        text: The text to count
+    
+    Returns:
+        Number of tokens (an estimate if no tokenizer is available)
+    """
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+def count_message_tokens(messages):
+    """
+    Count the prompt tokens a list of chat messages will use.
+    
+    Args:
+        messages: Chat messages as passed to chat.completions.create
+    
+    Returns:
+        Number of prompt tokens
+    """
+    total = TOKENS_PER_REPLY
+    for message in messages:
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        total += TOKENS_PER_MESSAGE + count_tokens(content)
+    return total
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    Cut text down to at most `max_tokens` tokens.
+    
+    Args:
+        text: The text to truncate
+        max_tokens: Token limit
+    
+    Returns:
+        The text, shortened if needed
+    """
+    if not text or max_tokens <= 0:
+        return ""
+    encoding = get_encoding()
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+class TokenBudget:
+    """
+    Token accounting against a deployment's context window and output limit.
+    
+    Prompt builders use it to decide how much input they can include and how
+    many output tokens they can request, and to log what each call uses.
+    """
+
+    def __init__(self, context_window=None, max_output_tokens=None):
+        """
+        Initialize the budget.
+        
+        Args:
+            context_window: Total tokens per request (defaults to AZURE_CONTEXT_WINDOW_TOKENS)
+            max_output_tokens: Output cap per response (defaults to AZURE_MAX_OUTPUT_TOKENS)
+        """
+        self.context_window = context_window or get_context_window_tokens()
+        self.max_output_tokens = max_output_tokens or get_max_output_tokens()
+
+    def input_tokens_available(self, reserved_output_tokens, used_tokens=0):
+        """
+        Return how many more prompt tokens fit once output is reserved.
+        
+        Args:
+            reserved_output_tokens: Output tokens the call will request
+            used_tokens: Prompt tokens already spent (instructions, persona, ...)
+        
+        Returns:
+            Remaining prompt tokens (never negative)
+        """
+        output_tokens = min(reserved_output_tokens, self.max_output_tokens)
+        return max(0, self.context_window - output_tokens - used_tokens)
+
+    def plan_call(self, call_name, messages, requested_output_tokens):
+        """
+        Fit a call's output limit to the budget and log the budget use.
+        
+        Args:
+            call_name: Label for the log line, e.g. "research.web"
+            messages: The chat messages for the call
+            requested_output_tokens: The max_tokens the caller would like
+        
+        Returns:
+            The max_tokens to send
+        """
+        prompt_tokens = count_message_tokens(messages)
+        max_tokens = max(1, min(
+            requested_output_tokens,
+            self.max_output_tokens,
+            self.context_window - prompt_tokens
+        ))
+        
+        used = (prompt_tokens + max_tokens) / self.context_window
+        details = f"{call_name}: {prompt_tokens} prompt + {max_tokens} output tokens of {self.context_window} ({used:.1%})"
+        if get_encoding() is None:
+            log_operation(
+                "Token budget",
+                f"{details} - estimated from characters, tokenizer unavailable",
+                level=logging.WARNING
+            )
+        else:
+            log_operation("Token budget", details)
+        if prompt_tokens >= self.context_window:
+            log_operation("Token budget exceeded", f"{call_name}: prompt is {prompt_tokens} tokens")
+        return max_tokens
+
+def plan_call(call_name, messages, requested_output_tokens):
+    """Fit `requested_output_tokens` to the default deployment budget; see TokenBudget.plan_call()."""
+    return TokenBudget().plan_call(call_name, messages, requested_output_tokens)
+
+if __name__ == "__main__":
+    # Download the configured encoding into TIKTOKEN_CACHE_DIR so later runs work offline
+    if get_encoding() is None:
+        raise SystemExit(1)
+    print(f"Tokenizer cached in {os.environ['TIKTOKEN_CACHE_DIR']}")
@@ -32,15 +32,16 @@ def get_tracing_data():
     # Retrieve the collected tracing data
     pass
 
-def log_operation(operation_name, details=None):
+def log_operation(operation_name, details=None, level=logging.INFO):
     """
     Log an operation with optional details.
     
     Args:
         operation_name: Name of the operation
         details: Optional details about the operation
+        level: Logging level, e.g. logging.WARNING for degraded operations
     """
     if details:
-        logger.info(f"Operation: {operation_name} - {details}")
+        logger.log(level, f"Operation: {operation_name} - {details}")
     else:
-        logger.info(f"Operation: {operation_name}")
\ No newline at end of file
+        logger.log(level, f"Operation: {operation_name}")
\ No newline at end of file
@@ -0,0 +1,141 @@
+import math
+import zlib
+from collections import Counter
+import numpy as np
+from src.utils.bm25 import tokenize
+from src.utils.document_store import document_digest
+
+# Hashed feature space; large enough that collisions barely affect ranking
+DEFAULT_FEATURES = 1 << 18
+
+class HashingVectorizer:
+    """
+    Turns text into sparse term-frequency vectors without a vocabulary or model download.
+    
+    Words and adjacent word pairs are hashed (CRC32, so the same text maps to
+    the same features in every process) into `n_features` buckets, and each
+    count is damped to 1 + log(count).
+    """
+
+    def __init__(self, n_features=DEFAULT_FEATURES, bigrams=True):
+        """
+        Initialize the vectorizer.
+        
+        Args:
+            n_features: Number of hash buckets
+            bigrams: Whether adjacent word pairs are features too
+        """
+        self.n_features = n_features
+        self.bigrams = bigrams
+
+    def transform(self, text):
+        """
+        Vectorize one text.
+        
+        Returns:
+            Tuple of (feature indices, weights) as NumPy arrays
+        """
+        words = tokenize(text)
+        terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])] if self.bigrams else words
+        counts = Counter(zlib.crc32(term.encode("utf-8")) % self.n_features for term in terms)
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        weights = np.fromiter((1 + math.log(count) for count in counts.values()), dtype=np.float64, count=len(counts))
+        return indices, weights
+
+class VectorIndex:
+    """
+    TF-IDF cosine search over the passages of several documents.
+    
+    Documents are added and removed by name. Their vectors are kept per
+    document and concatenated into flat NumPy arrays the first time the index
+    is searched after a change, so adding a document only vectorizes that
+    document. A search is a single weighted bincount over those arrays, and
+    only the best `k` passages are returned, so the prompt built from them
+    stays the same size however many documents are indexed.
+    """
+
+    def __init__(self, vectorizer=None):
+        """
+        Initialize an empty index.
+        
+        Args:
+            vectorizer: HashingVectorizer to use (a default one if None)
+        """
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self.documents = {}
+        self._matrix = None
+
+    def add(self, name, content, chunks):
+        """
+        Index a document, replacing any earlier document with the same name.
+        
+        Does nothing if the document is already indexed with the same content,
+        so it is safe to call on every Streamlit rerun.
+        
+        Args:
+            name: Document name
+            content: The document text or its DocumentHandle
+            chunks: The document's TextChunk records, as from chunk_document()
+        """
+        digest = document_digest(content)
+        if name in self.documents and self.documents[name]["digest"] == digest:
+            return
+        vectors = [self.vectorizer.transform(chunk.text) for chunk in chunks]
+        self.documents[name] = {"digest": digest, "chunks": list(chunks), "vectors": vectors}
+        self._matrix = None
+        print(f"Indexed {name} for chat ({len(vectors)} passages)")
+
+    def remove(self, name):
+        """Drop a document from the index, if present."""
+        if self.documents.pop(name, None) is not None:
+            self._matrix = None
+
+    def __len__(self):
+        return sum(len(document["chunks"]) for document in self.documents.values())
+
+    def _build(self):
+        """Concatenate the per-document vectors and compute IDF weights and passage norms."""
+        passages = []
+        rows, indices, weights = [], [], []
+        for name, document in self.documents.items():
+            for chunk, (chunk_indices, chunk_weights) in zip(document["chunks"], document["vectors"]):
+                rows.append(np.full(len(chunk_indices), len(passages), dtype=np.int64))
+                indices.append(chunk_indices)
+                weights.append(chunk_weights)
+                passages.append((name, chunk))
+        
+        if passages:
+            rows, indices, weights = np.concatenate(rows), np.concatenate(indices), np.concatenate(weights)
+        else:
+            rows, indices, weights = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0))
+        
+        document_frequency = np.bincount(indices, minlength=self.vectorizer.n_features)
+        idf = np.log((1 + len(passages)) / (1 + document_frequency)) + 1
+        norms = np.sqrt(np.bincount(rows, weights=(weights * idf[indices]) ** 2, minlength=len(passages)))
+        self._matrix = (passages, rows, indices, weights, idf, np.maximum(norms, 1e-9))
+
+    def search(self, query, k):
+        """
+        Return the `k` passages most similar to `query`.
+        
+        Args:
+            query: Free text, typically the user's question
+            k: Number of passages
+        
+        Returns:
+            List of (document name, TextChunk, score) tuples, best first;
+            passages sharing no terms with the query are left out
+        """
+        if self._matrix is None:
+            self._build()
+        passages, rows, indices, weights, idf, norms = self._matrix
+        if not passages:
+            return []
+        
+        query_indices, query_weights = self.vectorizer.transform(query)
+        query_vector = np.zeros(self.vectorizer.n_features)
+        query_vector[query_indices] = query_weights * idf[query_indices] ** 2
+        scores = np.bincount(rows, weights=query_vector[indices] * weights, minlength=len(passages)) / norms
+        
+        best = np.argsort(-scores, kind="stable")[:k]
+        return [(passages[i][0], passages[i][1], float(scores[i])) for i in best if scores[i] > 0]
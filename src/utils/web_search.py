@@ -1,6 +1,7 @@
 from typing import List, Dict
 import requests
 from bs4 import BeautifulSoup
+from src.utils.fact_store import get_fact_store
 
 def perform_web_search(query: str) -> List[Dict[str, str]]:
     search_url = f"https://www.google.com/search?q={query}"
@@ -28,5 +29,12 @@ def perform_web_search(query: str) -> List[Dict[str, str]]:
     return results
 
 def save_facts(facts: List[Dict[str, str]], source: str) -> None:
-    # This function would implement logic to save facts with source attribution
-    pass
\ No newline at end of file
+    # Save facts to the fact store, attributing any without a source to `source`
+    store = get_fact_store()
+    if store is None:
+        return
+    
+    for fact in facts:
+        attributed = dict(fact, source=fact.get("source") or source)
+        store.add_facts(fact.get("topic") or fact.get("query") or source, [attributed])
+    store.flush()
\ No newline at end of file
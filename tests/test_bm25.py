@@ -0,0 +1,48 @@
+import math
+from collections import Counter
+import pytest
+from src.utils.bm25 import BM25Index, tokenize
+
+TEXTS = [
+    "Solar panels convert sunlight into electricity.",
+    "Wind turbines generate electricity from wind; offshore wind is growing.",
+    "Battery storage smooths the output of solar and wind farms.",
+    "The history of the printing press."
+]
+
+def _reference_score(texts, query, k1=1.5, b=0.75):
+    """Textbook BM25 over whole-text loops, to check the vectorized version against."""
+    documents = [Counter(tokenize(text)) for text in texts]
+    average_length = sum(sum(document.values()) for document in documents) / len(documents)
+    scores = []
+    for document in documents:
+        length = sum(document.values())
+        score = 0.0
+        for term, query_frequency in Counter(tokenize(query)).items():
+            containing = sum(1 for other in documents if term in other)
+            if not containing:
+                continue
+            idf = math.log(1 + (len(documents) - containing + 0.5) / (containing + 0.5))
+            frequency = document[term]
+            score += idf * (1 + math.log(query_frequency)) * frequency * (k1 + 1) / (frequency + k1 * (1 - b + b * length / average_length))
+        scores.append(score)
+    return scores
+
+def test_tokenize_drops_stopwords_and_single_characters():
+    assert tokenize("The cost of a 5 MW wind farm, in 2024") == ["cost", "mw", "wind", "farm", "2024"]
+
+def test_scores_match_the_reference_formula():
+    index = BM25Index(TEXTS)
+    for query in ("wind electricity", "solar storage solar", "printing", "unrelated words"):
+        assert list(index.scores(query)) == pytest.approx(_reference_score(TEXTS, query))
+
+def test_search_ranks_best_first_and_keeps_text_order_on_ties():
+    index = BM25Index(TEXTS)
+    
+    assert [text_id for text_id, _ in index.search("wind", 2)] == [1, 2]
+    assert [text_id for text_id, _ in index.search("nothing matches", 3)] == [0, 1, 2]
+
+def test_empty_index():
+    index = BM25Index([])
+    
+    assert index.search("wind", 3) == []
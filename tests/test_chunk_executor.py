@@ -0,0 +1,77 @@
+import asyncio
+from src.utils.chunk_executor import ChunkExecutor
+
+def _run(coro):
+    return asyncio.run(coro)
+
+def test_results_are_reduced_in_item_order():
+    async def slow_for_low(item):
+        await asyncio.sleep(0.01 * (5 - item))
+        return item * 10
+    executor = ChunkExecutor(max_concurrency=5)
+    
+    assert _run(executor.map_reduce(slow_for_low, range(5), list)) == [0, 10, 20, 30, 40]
+    assert executor.completed == executor.total == 5
+
+def test_invalid_answers_and_timeouts_are_retried():
+    attempts = {}
+    
+    async def flaky(item):
+        attempts[item] = attempts.get(item, 0) + 1
+        if attempts[item] == 1:
+            raise ValueError("invalid JSON") if item else asyncio.TimeoutError()
+        return item
+    executor = ChunkExecutor(max_concurrency=2, max_retries=2, backoff_base=0.001)
+    
+    assert _run(executor.map_reduce(flaky, [0, 1], list)) == [0, 1]
+    assert attempts == {0: 2, 1: 2}
+    assert executor.failures == []
+
+def test_other_errors_are_not_retried_and_failures_are_isolated():
+    attempts = []
+    progress = []
+    
+    async def extract(item):
+        attempts.append(item)
+        if item == 1:
+            raise ConnectionError("already retried by the client")
+        if item == 2:
+            raise ValueError("still invalid")
+        return item
+    executor = ChunkExecutor(max_concurrency=1, max_retries=2, backoff_base=0.001,
+                             on_progress=lambda *counts: progress.append(counts))
+    
+    assert _run(executor.map_reduce(extract, [0, 1, 2, 3], list)) == [0, 3]
+    assert attempts.count(1) == 1
+    assert attempts.count(2) == 3
+    assert sorted(index for index, _ in executor.failures) == [1, 2]
+    assert progress[-1] == (4, 4, 2)
+
+def test_shared_semaphore_bounds_concurrency_across_executors():
+    semaphore = asyncio.Semaphore(2)
+    inflight = peak = 0
+    
+    async def work(item):
+        nonlocal inflight, peak
+        inflight += 1
+        peak = max(peak, inflight)
+        await asyncio.sleep(0.01)
+        inflight -= 1
+        return item
+    
+    async def both():
+        executors = [ChunkExecutor(max_concurrency=2, semaphore=semaphore) for _ in range(3)]
+        return await asyncio.gather(*(executor.map_reduce(work, range(4), list) for executor in executors))
+    
+    assert _run(both()) == [[0, 1, 2, 3]] * 3
+    assert peak == 2
+
+def test_map_yields_results_as_they_complete():
+    async def delayed(item):
+        await asyncio.sleep(item)
+        return item
+    
+    async def collect():
+        return [index async for index, _ in ChunkExecutor(max_concurrency=2).map(delayed, [0.03, 0.0])]
+    
+    assert _run(collect()) == [1, 0]
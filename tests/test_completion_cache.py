@@ -0,0 +1,86 @@
+import time
+from types import SimpleNamespace
+from openai.types.chat import ChatCompletion
+from src.utils.completion_cache import CachedChatClient, CompletionCache
+
+REQUEST = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}], "temperature": 0, "max_tokens": 10}
+
+def _completion(content):
+    return ChatCompletion.model_validate({
+        "id": "chatcmpl-1",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o-mini",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}]
+    })
+
+class CountingClient:
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return _completion(f"answer {self.calls}")
+
+def test_key_ignores_field_order_and_skips_uncacheable_requests():
+    reordered = dict(reversed(list(REQUEST.items())))
+    
+    assert CompletionCache.make_key(REQUEST) == CompletionCache.make_key(reordered)
+    assert CompletionCache.make_key(REQUEST) != CompletionCache.make_key({**REQUEST, "temperature": 1})
+    assert CompletionCache.make_key({**REQUEST, "stream": True}) is None
+
+def test_disk_tier_survives_a_new_process(tmp_path):
+    path = str(tmp_path / "completions.sqlite3")
+    key = CompletionCache.make_key(REQUEST)
+    CompletionCache(path=path).set(key, _completion("cached"))
+    
+    cache = CompletionCache(path=path)
+    
+    assert cache.get(key).choices[0].message.content == "cached"
+    assert cache.get(key).choices[0].message.content == "cached"
+    assert cache.get_stats()["disk_hits"] == 1
+    assert cache.get_stats()["memory_hits"] == 1
+
+def test_memory_tier_is_lru_bounded():
+    cache = CompletionCache(path=None, max_memory_entries=2)
+    for name in "abc":
+        cache.set(name, _completion(name))
+    
+    assert cache.get("a") is None
+    assert cache.get("c").choices[0].message.content == "c"
+    assert cache.get_stats()["hit_rate"] == 0.5
+
+def test_expired_entries_are_misses_and_evicted(tmp_path):
+    cache = CompletionCache(path=str(tmp_path / "c.sqlite3"), ttl_seconds=0.05)
+    cache.set("k", _completion("old"))
+    time.sleep(0.1)
+    
+    assert cache.get("k") is None
+    cache.evict()
+    assert cache.get_stats()["evictions"] == 1
+
+def test_disk_tier_is_trimmed_least_recently_used_first(tmp_path):
+    cache = CompletionCache(path=str(tmp_path / "c.sqlite3"))
+    cache.set("old", _completion("old"))
+    time.sleep(0.01)
+    cache.set("new", _completion("new"))
+    size = cache._connect().execute("SELECT size FROM completions WHERE key = 'new'").fetchone()[0]
+    cache.max_disk_bytes = size
+    
+    cache.evict()
+    
+    keys = [row[0] for row in cache._connect().execute("SELECT key FROM completions")]
+    assert keys == ["new"]
+
+def test_cached_client_serves_repeats_and_honours_use_cache():
+    client = CountingClient()
+    cached = CachedChatClient(client, CompletionCache(path=None))
+    
+    first = cached.chat.completions.create(**REQUEST)
+    second = cached.chat.completions.create(**REQUEST)
+    bypass = cached.chat.completions.create(use_cache=False, **REQUEST)
+    
+    assert first.choices[0].message.content == second.choices[0].message.content == "answer 1"
+    assert bypass.choices[0].message.content == "answer 2"
+    assert client.calls == 2
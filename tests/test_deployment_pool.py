@@ -0,0 +1,160 @@
+import asyncio
+import time
+from types import SimpleNamespace
+import httpx
+import pytest
+from openai import AuthenticationError, BadRequestError, InternalServerError, RateLimitError
+from src.utils.deployment_pool import DeploymentPool, PooledChatClient, PoolMember
+
+def _error(cls, status, headers=None):
+    request = httpx.Request("POST", "https://example.invalid/chat/completions")
+    return cls("error", response=httpx.Response(status, headers=headers or {}, request=request), body=None)
+
+def _pool(*names, threshold=3, cooldown=30.0):
+    members = [PoolMember(name, f"https://{name}.invalid", "key") for name in names]
+    return DeploymentPool(members, failure_threshold=threshold, cooldown_seconds=cooldown)
+
+def _fail(pool, member, error, trial=False):
+    member.outstanding += 1
+    pool.release(member, error=error, trial=trial)
+
+def test_circuit_opens_once_at_threshold():
+    pool = _pool("a", threshold=3)
+    member = pool.members[0]
+    for _ in range(10):
+        _fail(pool, member, _error(InternalServerError, 500))
+    assert member.stats["ejections"] == 1
+    assert member.open_until > time.monotonic()
+
+def test_rate_limits_use_retry_after_not_the_breaker():
+    pool = _pool("a", threshold=2, cooldown=30.0)
+    member = pool.members[0]
+    for _ in range(5):
+        _fail(pool, member, _error(RateLimitError, 429, {"retry-after-ms": "50"}))
+    assert member.consecutive_failures == 0
+    assert member.stats["ejections"] == 0
+    assert member.open_until == 0.0
+    assert 0 < member.limiter.blocked_for() <= 0.05
+    
+    _, wait, _ = pool.acquire(None)
+    assert wait <= 0.05
+
+def test_half_open_allows_a_single_trial():
+    pool = _pool("a", threshold=1, cooldown=0.05)
+    member = pool.members[0]
+    _fail(pool, member, _error(InternalServerError, 500))
+    time.sleep(0.06)
+    
+    _, wait, trial = pool.acquire(None)
+    assert wait == 0 and trial
+    # A request from before the ejection finishing must not free the trial slot
+    member.outstanding += 1
+    pool.release(member, error=_error(InternalServerError, 500))
+    _, wait, second_trial = pool.acquire(None)
+    assert not second_trial and wait > 0
+
+def test_failed_trial_reopens_and_successful_trial_rejoins():
+    pool = _pool("a", threshold=1, cooldown=0.0)
+    member = pool.members[0]
+    _fail(pool, member, _error(InternalServerError, 500))
+    
+    _, _, trial = pool.acquire(None)
+    pool.release(member, error=_error(InternalServerError, 500), trial=trial)
+    assert member.stats["ejections"] == 2
+    
+    _, _, trial = pool.acquire(None)
+    assert trial
+    pool.release(member, latency=0.1, trial=trial)
+    assert member.consecutive_failures == 0
+    assert not member.trial_in_flight
+    _, _, trial = pool.acquire(None)
+    assert not trial
+
+def test_requests_prefer_healthy_members():
+    pool = _pool("a", "b", threshold=1)
+    broken = pool.members[0]
+    _fail(pool, broken, _error(InternalServerError, 500))
+    for _ in range(5):
+        member, wait, _ = pool.acquire(None)
+        assert member is pool.members[1] and wait == 0
+
+class MemberClient:
+    """Fake async client for one pool member that raises `error` (if any) or answers."""
+    is_async = True
+
+    def __init__(self, error=None, delay=0.0):
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return "ok"
+
+def test_cancelled_trial_leaves_the_circuit_half_open():
+    pool = _pool("a", threshold=1, cooldown=0.0)
+    member = pool.members[0]
+    _fail(pool, member, _error(InternalServerError, 500))
+    
+    _, _, trial = pool.acquire(None)
+    pool.cancel(member, trial=trial)
+    
+    assert member.consecutive_failures == 1
+    assert member.health < 1.0
+    assert member.outstanding == 0
+    _, _, trial = pool.acquire(None)
+    assert trial
+
+def test_cancelled_request_does_not_count_as_a_success():
+    pool = _pool("a", threshold=1, cooldown=0.0)
+    member = pool.members[0]
+    _fail(pool, member, _error(InternalServerError, 500))
+    health = member.health
+    client = PooledChatClient([MemberClient(delay=1.0)], pool)
+    
+    async def cancel_soon():
+        task = asyncio.ensure_future(client.chat.completions.create(model="gpt"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(cancel_soon())
+    
+    assert member.consecutive_failures == 1
+    assert member.health == health
+    assert not member.trial_in_flight and member.outstanding == 0
+
+def test_auth_errors_fail_over_and_count_against_the_member():
+    pool = _pool("a", "b", threshold=2)
+    bad, good = MemberClient(_error(AuthenticationError, 401)), MemberClient()
+    client = PooledChatClient([bad, good], pool)
+    pool.members[1].outstanding = 5  # Make the broken member the first pick
+    
+    for _ in range(3):
+        assert asyncio.run(client.chat.completions.create(model="gpt")) == "ok"
+    
+    member = pool.members[0]
+    assert bad.calls == 2
+    assert member.stats["failures"] == 2 and member.health < 1.0
+    assert member.stats["ejections"] == 1
+
+def test_auth_error_is_raised_once_no_member_is_left():
+    pool = _pool("a")
+    client = PooledChatClient([MemberClient(_error(AuthenticationError, 401))], pool)
+    
+    with pytest.raises(AuthenticationError):
+        asyncio.run(client.chat.completions.create(model="gpt"))
+    assert pool.members[0].stats["failures"] == 1
+
+def test_request_errors_leave_member_health_alone():
+    pool = _pool("a")
+    client = PooledChatClient([MemberClient(_error(BadRequestError, 400))], pool)
+    
+    with pytest.raises(BadRequestError):
+        asyncio.run(client.chat.completions.create(model="gpt"))
+    member = pool.members[0]
+    assert member.health == 1.0 and member.stats["failures"] == 0 and member.outstanding == 0
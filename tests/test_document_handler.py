@@ -0,0 +1,157 @@
+import random
+from io import BytesIO
+import pytest
+from reportlab.pdfgen import canvas
+from src.utils import document_handler
+from src.utils.document_handler import (
+    PAGE_BREAK, ExtractionError, chunk_document, chunk_text, extract_text, get_extraction_stats, register_extractor, supported_extensions
+)
+from src.utils.token_budget import count_tokens
+
+def _report(seed=0, sections=6):
+    rng = random.Random(seed)
+    words = "solar wind storage grid capacity demand price region output growth".split()
+    parts = []
+    for section in range(sections):
+        parts.append(f"## Section {section + 1}")
+        for _ in range(rng.randint(1, 4)):
+            sentences = [" ".join(rng.choice(words) for _ in range(rng.randint(4, 30))).capitalize() + "."
+                         for _ in range(rng.randint(1, 8))]
+            parts.append(" ".join(sentences))
+        if section % 2:
+            parts.append("| Region | Output |\n| North | 12 |\n| South | 7 |")
+    return "\n\n".join(parts)
+
+def _covered(chunks, length):
+    covered = [False] * length
+    for chunk in chunks:
+        covered[chunk.start:chunk.end] = [True] * (chunk.end - chunk.start)
+    return covered
+
+def test_chunks_are_slices_that_cover_the_text():
+    for seed in range(5):
+        text = _report(seed)
+        chunks = chunk_document(text, max_chunk_tokens=60)
+        covered = _covered(chunks, len(text))
+        
+        assert all(0 <= chunk.start < chunk.end <= len(text) for chunk in chunks)
+        assert all(chunk.text == text[chunk.start:chunk.end] for chunk in chunks)
+        assert all(earlier.end <= later.start for earlier, later in zip(chunks, chunks[1:]))
+        assert all(covered[i] for i, char in enumerate(text) if not char.isspace())
+        # The budget sums the blocks' own tokens; the blank lines between them may add one each
+        assert all(count_tokens(chunk.text) <= 60 + chunk.text.count("\n\n") for chunk in chunks)
+
+def test_headings_start_chunks():
+    text = _report(1)
+    chunks = chunk_document(text, max_chunk_tokens=400)
+    heading_offsets = {text.index(f"## Section {i}") for i in range(1, 7)}
+    
+    assert heading_offsets <= {chunk.start for chunk in chunks}
+    assert not any(chunk.text.rstrip().endswith(("## Section 2", "## Section 3")) for chunk in chunks)
+
+def test_overlap_repeats_whole_trailing_sentences():
+    text = " ".join(f"Sentence number {i} is about storage." for i in range(60))
+    chunks = chunk_document(text, max_chunk_tokens=50, overlap_tokens=12)
+    
+    assert len(chunks) > 2
+    for earlier, later in zip(chunks, chunks[1:]):
+        assert earlier.start < later.start < earlier.end
+        assert text[later.start:later.start + 9] == "Sentence "
+        assert later.text.startswith(text[later.start:earlier.end])
+
+def test_pages_follow_page_breaks():
+    pages = [f"Page {i} text. " * 40 for i in range(1, 4)]
+    text = PAGE_BREAK.join(pages)
+    chunks = chunk_document(text, max_chunk_tokens=100)
+    
+    for chunk in chunks:
+        assert chunk.page == text.count(PAGE_BREAK, 0, chunk.start) + 1
+        assert chunk.last_page == text.count(PAGE_BREAK, 0, chunk.end - 1) + 1
+        assert chunk.location() == {"start": chunk.start, "end": chunk.end, "page": chunk.page, "last_page": chunk.last_page}
+    assert {chunk.page for chunk in chunks} == {1, 2, 3}
+
+def test_oversized_sentence_is_cut_without_losing_text():
+    text = " ".join(["word"] * 2000)
+    chunks = chunk_document(text, max_chunk_tokens=100)
+    
+    assert len(chunks) > 1
+    assert "".join(chunk.text for chunk in chunks) == text
+    assert all(count_tokens(chunk.text) <= 100 for chunk in chunks)
+
+def test_chunks_slice_from_the_given_source():
+    class Source(str):
+        slices = 0
+        
+        def __getitem__(self, key):
+            Source.slices += 1
+            return str.__getitem__(self, key)
+    
+    text = _report(2)
+    source = Source(text)
+    chunks = chunk_document(text, max_chunk_tokens=80, source=source)
+    
+    assert all(chunk.source is source for chunk in chunks)
+    assert chunks[0].text == text[chunks[0].start:chunks[0].end]
+    assert Source.slices == 1
+
+def test_empty_text_has_no_chunks():
+    assert chunk_document("") == []
+    assert chunk_text("") == []
+
+def test_chunk_text_sizes_chunks_in_characters():
+    text = _report(3)
+    
+    assert chunk_text(text, max_chunk_size=400, overlap=0) == [chunk.text for chunk in chunk_document(text, max_chunk_tokens=100)]
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Let a test register extractors without affecting the module's registry."""
+    monkeypatch.setattr(document_handler, "_EXTRACTORS", dict(document_handler._EXTRACTORS))
+    monkeypatch.setattr(document_handler, "_MIME_TYPES", dict(document_handler._MIME_TYPES))
+
+def test_builtin_formats_are_registered():
+    assert {"pdf", "docx", "txt", "md", "csv", "xlsx"} <= set(supported_extensions())
+
+def test_text_upload_is_read_from_memory():
+    upload = BytesIO("Ünïcode notes\n".encode("utf-8"))
+    upload.name = "notes.TXT"
+    
+    assert extract_text(upload, upload.name) == "Ünïcode notes\n"
+    assert extract_text(b"a,b\n1,2\n", "table.csv").split() == ["a", "b", "0", "1", "2"]
+
+def test_pdf_pages_are_joined_with_page_breaks_and_reported():
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for page in range(3):
+        pdf.drawString(40, 800, f"Page {page + 1}")
+        pdf.showPage()
+    pdf.save()
+    progress = []
+    
+    text = extract_text(buffer.getvalue(), "scan.pdf", on_progress=progress.append)
+    
+    assert [page.strip() for page in text.split(PAGE_BREAK)] == ["Page 1", "Page 2", "Page 3"]
+    assert progress == [1, 2, 3]
+
+def test_registered_extractor_is_found_by_extension_or_mime_type(registry):
+    @register_extractor(["rtf"], ["application/rtf"])
+    def extract_rtf(file):
+        return file.read().decode("ascii").upper()
+    
+    assert "rtf" in supported_extensions()
+    assert extract_text(b"hello", "letter.rtf") == "HELLO"
+    assert extract_text(b"hello", "download", mime_type="application/rtf") == "HELLO"
+    assert get_extraction_stats()["rtf"]["files"] >= 2
+
+def test_extraction_errors(registry):
+    @register_extractor(["bad"])
+    def extract_bad(file):
+        raise RuntimeError("corrupt")
+    
+    with pytest.raises(ExtractionError, match="Unsupported file format: .exe"):
+        extract_text(b"MZ", "setup.exe")
+    with pytest.raises(ExtractionError, match="limit is"):
+        extract_text(b"x" * 100, "big.txt", max_bytes=10)
+    with pytest.raises(ExtractionError, match="Could not read broken.bad: corrupt"):
+        extract_text(b"", "broken.bad")
+    assert get_extraction_stats()["bad"]["failures"] >= 1
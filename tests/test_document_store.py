@@ -0,0 +1,73 @@
+import gc
+import os
+import random
+import pytest
+from src.utils.document_store import CHECKPOINT_INTERVAL, DocumentStore
+
+def _mixed_text(length, seed=0):
+    alphabet = "abc déf ñ 東京 😀\n"
+    rng = random.Random(seed)
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+def test_non_ascii_slices_match_the_text(tmp_path):
+    store = DocumentStore(directory=str(tmp_path))
+    text = _mixed_text(CHECKPOINT_INTERVAL * 3 + 17)
+    handle = store.put(text, "mixed.txt")
+    rng = random.Random(1)
+    
+    bounds = [(0, len(text)), (0, 0), (CHECKPOINT_INTERVAL - 1, CHECKPOINT_INTERVAL + 1),
+              (CHECKPOINT_INTERVAL, CHECKPOINT_INTERVAL * 2), (len(text) - 5, len(text))]
+    bounds += [sorted((rng.randrange(len(text) + 1), rng.randrange(len(text) + 1))) for _ in range(200)]
+    for start, end in bounds:
+        assert handle[start:end] == text[start:end]
+    assert handle[-10:] == text[-10:]
+    assert handle[5:2] == ""
+    assert handle.read() == text
+    assert len(handle) == len(text)
+
+def test_ascii_text_has_no_checkpoints(tmp_path):
+    store = DocumentStore(directory=str(tmp_path))
+    text = "plain ascii " * 1000
+    handle = store.put(text, "plain.txt")
+    
+    assert handle[100:250] == text[100:250]
+    assert store._load(handle.digest)["checkpoints"] == []
+
+def test_handles_only_support_contiguous_slices(tmp_path):
+    handle = DocumentStore(directory=str(tmp_path)).put("abcdef", "a.txt")
+    
+    with pytest.raises(TypeError):
+        handle[1]
+    with pytest.raises(TypeError):
+        handle[::2]
+
+def test_reupload_is_found_by_file_digest(tmp_path):
+    store = DocumentStore(directory=str(tmp_path))
+    upload_digest = DocumentStore.digest_bytes(b"raw file bytes")
+    
+    assert store.find_upload(upload_digest, "report.pdf") is None
+    store.put("extracted text", "report.pdf", upload_digest=upload_digest)
+    handle = store.find_upload(upload_digest, "copy.pdf")
+    
+    assert handle.read() == "extracted text"
+    assert handle.name == "copy.pdf"
+    assert store.get_stats()["upload_hits"] == 1
+    assert store.get_stats()["writes"] == 1
+
+def test_eviction_skips_documents_with_live_handles(tmp_path):
+    store = DocumentStore(directory=str(tmp_path), max_disk_bytes=2500)
+    kept = store.put("k" * 1000, "kept.txt")
+    released = store.put("r" * 1000, "released.txt")
+    released_digest = released.digest
+    del released
+    gc.collect()
+    # Make the referenced document the least recently used one
+    os.utime(store._path(kept.digest), (0, 0))
+    
+    new = store.put("n" * 1000, "new.txt")
+    
+    assert kept.read() == "k" * 1000
+    assert new.read() == "n" * 1000
+    assert not os.path.exists(store._path(released_digest))
+    assert store.get_stats()["evictions"] == 1
+    assert store.get_stats()["referenced_documents"] == 2
@@ -0,0 +1,42 @@
+from src.utils.extraction_cache import ExtractionCache
+
+FACTS = [{"fact": "Solar capacity doubled", "source": "Uploaded Document", "category": "Energy"}]
+
+def test_key_separates_query_persona_and_model():
+    key = ExtractionCache.make_key("chunk text", "Solar power", "persona", "gpt-4o-mini")
+    
+    assert key == ExtractionCache.make_key("chunk text", "  solar POWER? ", "persona", "gpt-4o-mini")
+    assert key != ExtractionCache.make_key("other text", "Solar power", "persona", "gpt-4o-mini")
+    assert key != ExtractionCache.make_key("chunk text", "Wind power", "persona", "gpt-4o-mini")
+    assert key != ExtractionCache.make_key("chunk text", "Solar power", "another persona", "gpt-4o-mini")
+    assert key != ExtractionCache.make_key("chunk text", "Solar power", "persona", "gpt-4o")
+    assert key != ExtractionCache.make_key("chunk text", "Solar power", "persona", None)
+
+def test_facts_and_empty_results_round_trip(tmp_path):
+    path = str(tmp_path / "extractions.sqlite3")
+    ExtractionCache(path=path).set_many({"with-facts": FACTS, "no-facts": []})
+    cache = ExtractionCache(path=path)
+    
+    found = cache.get_many(["with-facts", "no-facts", "unknown"])
+    
+    assert found == {"with-facts": FACTS, "no-facts": []}
+    assert cache.get_stats()["hits"] == 2
+    assert cache.get_stats()["misses"] == 1
+
+def test_lookups_larger_than_the_parameter_limit(tmp_path):
+    cache = ExtractionCache(path=str(tmp_path / "extractions.sqlite3"))
+    cache.set_many({f"key {i}": [] for i in range(1200)})
+    
+    assert len(cache.get_many(f"key {i}" for i in range(0, 2400, 2))) == 600
+
+def test_eviction_drops_least_recently_used_entries(tmp_path):
+    cache = ExtractionCache(path=str(tmp_path / "extractions.sqlite3"))
+    cache.set_many({"old": FACTS})
+    cache._connect().execute("UPDATE chunk_facts SET accessed_at = 0 WHERE key = 'old'")
+    cache.set_many({"new": FACTS})
+    cache.max_disk_bytes = cache._connect().execute("SELECT size FROM chunk_facts WHERE key = 'new'").fetchone()[0]
+    
+    cache.evict()
+    
+    assert set(cache.get_many(["old", "new"])) == {"new"}
+    assert cache.get_stats()["evictions"] == 1
@@ -0,0 +1,44 @@
+import pytest
+from src.utils.fact_dedup import FactDeduplicator, deduplicate_facts
+
+def _fact(text, source):
+    return {"fact": text, "source": source, "category": "Energy"}
+
+def test_reworded_duplicates_are_merged_with_their_sources():
+    facts = [
+        _fact("Global solar capacity doubled between 2019 and 2023.", "https://a.example"),
+        _fact("Global solar capacity doubled between 2019 and 2023!", "https://b.example"),
+        _fact("global SOLAR capacity doubled between 2019 and 2023", "https://a.example"),
+        _fact("Offshore wind auctions were undersubscribed in 2023.", "https://c.example")
+    ]
+    
+    result = deduplicate_facts(facts)
+    
+    assert [fact["fact"] for fact in result] == [facts[0]["fact"], facts[3]["fact"]]
+    assert result[0]["sources"] == ["https://a.example", "https://b.example"]
+    assert result[1]["sources"] == ["https://c.example"]
+
+def test_distinct_facts_are_kept_and_inputs_untouched():
+    facts = [_fact(f"Region {name} added {gw} GW of storage capacity last year.", "s")
+             for name, gw in (("north", 4), ("south", 11), ("east", 27))]
+    deduplicator = FactDeduplicator()
+    
+    result = deduplicator.add_all(facts)
+    
+    assert len(result) == 3
+    assert deduplicator.duplicates == 0
+    assert "sources" not in facts[0]
+
+def test_add_returns_the_representative_fact():
+    deduplicator = FactDeduplicator()
+    first = deduplicator.add(_fact("Battery prices fell by 14 percent in 2023.", "x"))
+    
+    merged = deduplicator.add({"fact": "Battery prices fell by 14 percent in 2023", "sources": ["y", "x"]})
+    
+    assert merged is first
+    assert first["sources"] == ["x", "y"]
+    assert deduplicator.duplicates == 1
+
+def test_signature_length_must_split_into_bands():
+    with pytest.raises(ValueError):
+        FactDeduplicator(num_perm=64, bands=10)
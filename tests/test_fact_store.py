@@ -0,0 +1,55 @@
+import time
+from src.utils.fact_store import FactStore
+
+def _fact(text, query, source="https://example.org"):
+    return {"fact": text, "query": query, "source": source, "category": "Energy"}
+
+def _stored_count(store):
+    return store._connect().execute("SELECT COUNT(*) FROM facts").fetchone()[0]
+
+def test_facts_are_buffered_until_the_batch_fills(tmp_path):
+    store = FactStore(path=str(tmp_path / "facts.sqlite3"), batch_size=3)
+    store.add_facts("energy", [_fact("Solar is cheap", "solar cost"), _fact("Wind is growing", "wind growth")])
+    
+    assert _stored_count(store) == 0
+    store.add_facts("energy", [_fact("Hydro is steady", "hydro output")])
+    assert _stored_count(store) == 3
+
+def test_same_fact_for_a_topic_is_stored_once(tmp_path):
+    store = FactStore(path=str(tmp_path / "facts.sqlite3"))
+    store.add_facts("energy", [_fact("Solar is cheap.", "solar cost", "a")])
+    store.add_facts("energy", [_fact("solar is CHEAP", "solar prices", "b")])
+    store.add_facts("housing", [_fact("Solar is cheap.", "rooftop solar", "c")])
+    
+    results = store.search("solar cheap")
+    
+    assert len(results) == 2
+    assert {(fact["topic"], fact["query"], tuple(fact["sources"])) for fact in results} == {
+        ("energy", "solar prices", ("b",)), ("housing", "rooftop solar", ("c",))
+    }
+
+def test_find_for_query_matches_reordered_words_within_the_age_limit(tmp_path):
+    store = FactStore(path=str(tmp_path / "facts.sqlite3"))
+    store.add_facts("energy", [_fact("Panels cost less", "cost of solar panels")])
+    store.add_facts("energy", [_fact("A plant opened", "solar panels")], origin="document")
+    
+    assert [fact["fact"] for fact in store.find_for_query("solar panels cost", max_age_seconds=60)] == ["Panels cost less"]
+    assert store.find_for_query("solar panels price", max_age_seconds=60) == []
+    assert store.find_for_query("the of", max_age_seconds=60) == []
+    time.sleep(0.05)
+    assert store.find_for_query("solar panels cost", max_age_seconds=0.01) == []
+
+def test_user_text_cannot_inject_fts_operators(tmp_path):
+    store = FactStore(path=str(tmp_path / "facts.sqlite3"))
+    store.add_facts("energy", [_fact("Grid NEAR capacity", "grid")])
+    
+    assert [fact["fact"] for fact in store.search('grid NEAR "capacity')] == ["Grid NEAR capacity"]
+    assert store.search("fact: *") == []
+
+def test_prune_removes_old_facts_from_the_index(tmp_path):
+    store = FactStore(path=str(tmp_path / "facts.sqlite3"))
+    store.add_facts("energy", [_fact("Old fact about coal", "coal")])
+    time.sleep(0.05)
+    
+    assert store.prune(max_age_seconds=0.01) == 1
+    assert store.search("coal") == []
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from src.utils.hedging import HedgedChatClient, HedgingPolicy, get_call_type
+from src.utils.rate_limiter import RateLimitedChatClient, RateLimiter
+
+REQUEST = {"model": "gpt-4o-mini", "messages": [], "max_tokens": 100}
+
+class SlowFirstAsyncClient:
+    """Fake async client whose first call is slow and later calls are fast."""
+    is_async = True
+
+    def __init__(self, slow=0.5, fast=0.01):
+        self.calls = 0
+        self.slow = slow
+        self.fast = fast
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.slow if self.calls == 1 else self.fast)
+        return f"response {self.calls}"
+
+class SlowFirstSyncClient:
+    def __init__(self, slow=0.5, fast=0.01):
+        self.calls = 0
+        self.slow = slow
+        self.fast = fast
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        time.sleep(self.slow if self.calls == 1 else self.fast)
+        return f"response {self.calls}"
+
+def _policy(samples=0.05):
+    policy = HedgingPolicy(percentile=0.95, min_samples=3, min_delay=0.05)
+    for _ in range(3):
+        policy.record(get_call_type(REQUEST), samples)
+    return policy
+
+def _samples(policy):
+    return sorted(policy._latencies[get_call_type(REQUEST)])
+
+def test_async_losing_primary_is_recorded_as_censored_sample():
+    policy = _policy()
+    client = HedgedChatClient(SlowFirstAsyncClient(), policy)
+    
+    assert asyncio.run(client.chat.completions.create(**REQUEST)) == "response 2"
+    samples = _samples(policy)
+    # Three seeded samples, the winning hedge and the cancelled primary
+    assert len(samples) == 5
+    assert samples[-1] >= 0.05
+    assert policy.get_stats()["hedge_wins"] == 1
+
+def test_sync_losing_primary_is_recorded_once():
+    policy = _policy()
+    client = HedgedChatClient(SlowFirstSyncClient(slow=0.3), policy)
+    
+    assert client.chat.completions.create(**REQUEST) == "response 2"
+    assert len(_samples(policy)) == 5
+    # The discarded primary finishing later doesn't add another sample
+    time.sleep(0.4)
+    assert len(_samples(policy)) == 5
+
+def _throttled(client, seconds):
+    """Put `client` behind a rate limiter that is holding requests back for `seconds`, as after a 429."""
+    limiter = RateLimiter()
+    limiter.block_for(seconds)
+    return RateLimitedChatClient(client, limiter)
+
+def test_async_time_queued_behind_the_limiter_is_not_hedged_or_recorded():
+    policy = _policy()
+    client = HedgedChatClient(_throttled(SlowFirstAsyncClient(slow=0.01), 0.3), policy)
+    
+    assert asyncio.run(client.chat.completions.create(**REQUEST)) == "response 1"
+    assert policy.get_stats()["hedged"] == 0
+    assert _samples(policy)[-1] < 0.2
+
+def test_sync_time_queued_behind_the_limiter_is_not_hedged_or_recorded():
+    policy = _policy()
+    client = HedgedChatClient(_throttled(SlowFirstSyncClient(slow=0.01), 0.3), policy)
+    
+    assert client.chat.completions.create(**REQUEST) == "response 1"
+    assert policy.get_stats()["hedged"] == 0
+    assert _samples(policy)[-1] < 0.2
+
+def test_async_request_slow_after_leaving_the_queue_is_still_hedged():
+    policy = _policy()
+    client = HedgedChatClient(_throttled(SlowFirstAsyncClient(slow=0.5), 0.1), policy)
+    
+    assert asyncio.run(client.chat.completions.create(**REQUEST)) == "response 2"
+    assert policy.get_stats()["hedge_wins"] == 1
@@ -0,0 +1,30 @@
+import json
+import socket
+import time
+from src.utils.mock_azure_server import MockServerConfig, start_mock_server
+
+def _post_and_hang_up(port, body):
+    payload = json.dumps(body).encode("utf-8")
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, b"\x01\x00\x00\x00\x00\x00\x00\x00")
+        sock.sendall(
+            b"POST /openai/deployments/test/chat/completions HTTP/1.1\r\n"
+            b"Host: localhost\r\nContent-Type: application/json\r\n"
+            + f"Content-Length: {len(payload)}\r\n\r\n".encode("ascii") + payload
+        )
+        # Read the first bytes of the stream, then close with a reset
+        sock.recv(64)
+
+def test_client_disconnect_mid_stream_is_quiet(capfd):
+    config = MockServerConfig(latency_ms=0, tokens_per_second=200, completion_tokens=400)
+    server = start_mock_server(config)
+    try:
+        _post_and_hang_up(server.server_port, {"messages": [{"role": "user", "content": "Write a report"}], "stream": True})
+        deadline = time.monotonic() + 5
+        while config.stats["disconnects"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        server.shutdown()
+    
+    assert config.stats["disconnects"] == 1
+    assert "Traceback" not in capfd.readouterr().err
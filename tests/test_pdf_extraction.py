@@ -0,0 +1,27 @@
+from io import BytesIO
+from reportlab.pdfgen import canvas
+from src.utils.pdf_extraction import PDF_PAGES_PER_TASK, iter_pdf_pages
+
+def _pdf(pages):
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for page in range(pages):
+        pdf.drawString(40, 800, f"Page {page + 1} of the report")
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+def test_small_pdf_is_extracted_in_process(monkeypatch):
+    monkeypatch.setenv("PDF_PARALLEL_MIN_PAGES", "1000")
+    
+    pages = list(iter_pdf_pages(_pdf(3), max_workers=2))
+    
+    assert [page.strip() for page in pages] == [f"Page {i} of the report" for i in (1, 2, 3)]
+
+def test_pool_extraction_keeps_page_order(monkeypatch):
+    page_count = PDF_PAGES_PER_TASK * 2 + 5
+    monkeypatch.setenv("PDF_PARALLEL_MIN_PAGES", "2")
+    
+    pages = list(iter_pdf_pages(_pdf(page_count), max_workers=2))
+    
+    assert [page.strip() for page in pages] == [f"Page {i} of the report" for i in range(1, page_count + 1)]
@@ -0,0 +1,94 @@
+import asyncio
+from types import SimpleNamespace
+import httpx
+import pytest
+from openai import BadRequestError, RateLimitError
+from src.utils.rate_limiter import RateLimitedChatClient, RateLimiter, estimate_request_tokens, get_retry_after
+
+def _error(cls, status, headers=None):
+    request = httpx.Request("POST", "https://example.invalid/chat/completions")
+    return cls("error", response=httpx.Response(status, headers=headers or {}, request=request), body=None)
+
+class ScriptedClient:
+    """Fake sync client that raises or returns the scripted outcomes in order."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+class ScriptedAsyncClient(ScriptedClient):
+    is_async = True
+
+    async def create(self, **kwargs):
+        return ScriptedClient.create(self, **kwargs)
+
+def test_burst_is_free_then_callers_queue_in_order():
+    limiter = RateLimiter(requests_per_minute=60)
+    # 60 RPM allows a 10 request burst
+    waits = [limiter.reserve(0) for _ in range(12)]
+    
+    assert waits[:10] == [0.0] * 10
+    assert waits[10] == pytest.approx(1.0, abs=0.05)
+    assert waits[11] == pytest.approx(2.0, abs=0.05)
+    assert limiter.stats["throttled"] == 2
+
+def test_token_quota_charges_prompt_and_max_tokens():
+    request = {"messages": [{"role": "user", "content": "hello"}], "max_tokens": 600}
+    limiter = RateLimiter(tokens_per_minute=6000)
+    
+    assert estimate_request_tokens(request) > 600
+    assert limiter.reserve(estimate_request_tokens(request)) == 0.0
+    assert limiter.reserve(estimate_request_tokens(request)) > 0.0
+
+def test_block_for_holds_every_caller():
+    limiter = RateLimiter()
+    limiter.block_for(5)
+    
+    assert 4.9 < limiter.reserve(0) <= 5.0
+    assert 4.9 < limiter.blocked_for() <= 5.0
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after-ms": "250"}, 0.25),
+    ({"retry-after": "3"}, 3.0),
+    ({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}, None),
+    ({}, None)
+])
+def test_retry_after_headers(headers, expected):
+    assert get_retry_after(_error(RateLimitError, 429, headers)) == expected
+
+def test_429_is_retried_after_retry_after_and_blocks_the_limiter():
+    limiter = RateLimiter()
+    client = ScriptedClient(_error(RateLimitError, 429, {"retry-after-ms": "10"}), "ok")
+    wrapped = RateLimitedChatClient(client, limiter, backoff_base=0.01)
+    
+    assert wrapped.chat.completions.create(messages=[]) == "ok"
+    assert client.calls == 2
+    assert limiter.stats["rate_limited_responses"] == 1
+
+def test_non_retryable_errors_and_exhausted_retries_are_raised():
+    limiter = RateLimiter()
+    client = ScriptedClient(_error(BadRequestError, 400))
+    with pytest.raises(BadRequestError):
+        RateLimitedChatClient(client, limiter).chat.completions.create(messages=[])
+    assert client.calls == 1
+    
+    client = ScriptedClient(*[_error(RateLimitError, 429, {"retry-after-ms": "1"})] * 3)
+    with pytest.raises(RateLimitError):
+        RateLimitedChatClient(client, limiter, max_retries=2, backoff_base=0.001).chat.completions.create(messages=[])
+    assert client.calls == 3
+
+def test_async_client_is_retried():
+    client = ScriptedAsyncClient(_error(RateLimitError, 429, {"retry-after-ms": "10"}), "ok")
+    wrapped = RateLimitedChatClient(client, RateLimiter(), backoff_base=0.01)
+    
+    assert wrapped.is_async
+    assert asyncio.run(wrapped.chat.completions.create(messages=[])) == "ok"
+    assert client.calls == 2
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+import pytest
+from src.agents.research_agent import ResearchAgent
+from src.utils.extraction_cache import ExtractionCache
+
+@pytest.fixture(autouse=True)
+def no_persistent_caches(monkeypatch):
+    for name in ("COMPLETION_CACHE_ENABLED", "FACT_STORE_ENABLED", "EXTRACTION_CACHE_ENABLED"):
+        monkeypatch.setenv(name, "false")
+
+class CountingAsyncClient:
+    """Fake async client answering fact requests and tracking how many are in flight."""
+    is_async = True
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.inflight = 0
+        self.max_inflight = 0
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        self.inflight += 1
+        self.max_inflight = max(self.max_inflight, self.inflight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.inflight -= 1
+        prompt = kwargs["messages"][-1]["content"]
+        def fact(label):
+            return {"fact": f"fact {self.calls}.{label}", "source": "https://example.org", "category": "General"}
+        chunk_ids = [int(chunk_id) for chunk_id in re.findall(r'<chunk id="(\d+)">', prompt)]
+        if chunk_ids:
+            content = {"chunks": [{"chunk_id": chunk_id, "facts": [fact(chunk_id)]} for chunk_id in chunk_ids]}
+        else:
+            content = {"facts": [fact(0)]}
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(content)))])
+
+def _document(topic, paragraphs=12):
+    return "\n\n".join(f"{topic} paragraph {i}. " + "Some detail about the subject. " * 20 for i in range(paragraphs))
+
+def test_max_concurrency_is_shared_by_web_and_document_extraction():
+    client = CountingAsyncClient()
+    agent = ResearchAgent(async_client=client, max_concurrency=2, pack_chunks=False)
+    documents = {f"doc{i}.txt": _document(f"Document {i}") for i in range(3)}
+    
+    facts, _ = agent.gather_information_incremental("solar power", [f"query {i}" for i in range(4)], documents)
+    
+    assert client.calls > 6
+    assert facts
+    assert client.max_inflight <= 2
+
+class TruncatingAsyncClient(CountingAsyncClient):
+    """Fake client whose packed answers are cut off after `keep` chunks, like a max_tokens stop."""
+
+    def __init__(self, keep):
+        super().__init__(delay=0)
+        self.keep = keep
+
+    async def create(self, **kwargs):
+        response = await super().create(**kwargs)
+        content = response.choices[0].message.content
+        chunk_ids = [int(chunk_id) for chunk_id in re.findall(r'<chunk id="(\d+)">', kwargs["messages"][-1]["content"])]
+        if len(chunk_ids) > self.keep:
+            # Cut inside the entry after the last one kept
+            content = content[:content.index(f'{{"chunk_id": {chunk_ids[self.keep]},') + 20]
+            response.choices[0].finish_reason = "length"
+        else:
+            response.choices[0].finish_reason = "stop"
+        response.choices[0].message.content = content
+        return response
+
+def test_chunks_lost_to_a_cut_off_answer_are_not_cached_as_empty(tmp_path):
+    cache = ExtractionCache(path=str(tmp_path / "extractions.sqlite3"))
+    document = _document("Report", paragraphs=9)
+    
+    def run(client):
+        agent = ResearchAgent(async_client=client, max_concurrency=2, pack_chunks=True)
+        agent.top_k_chunks = 0
+        agent.extraction_cache = cache
+        return agent, asyncio.run(agent._extract_document_facts_async("solar power", document))
+    
+    agent, facts = run(TruncatingAsyncClient(keep=5))
+    chunk_count = len(agent.index_document(document)[0])
+    assert chunk_count > 5
+    assert {fact["chunk_id"] for fact in facts} == set(range(5))
+    # The fifth answered chunk could have lost facts to the cut-off too
+    assert cache.get_stats()["writes"] == 4
+    
+    client = TruncatingAsyncClient(keep=chunk_count)
+    _, facts = run(client)
+    assert client.calls == 1
+    assert {fact["chunk_id"] for fact in facts} == set(range(chunk_count))
+    
+    client = TruncatingAsyncClient(keep=chunk_count)
+    run(client)
+    assert client.calls == 0
+
+class GarbageAsyncClient(CountingAsyncClient):
+    """Fake client whose document answers are never valid JSON."""
+
+    async def create(self, **kwargs):
+        response = await super().create(**kwargs)
+        if "<chunk id=" in kwargs["messages"][-1]["content"]:
+            response.choices[0].message.content = "Sorry, I can't help with that."
+        return response
+
+def test_documents_with_unparseable_answers_are_extracted_again_next_run():
+    documents = {"report.txt": _document("Report", paragraphs=3)}
+    
+    client = GarbageAsyncClient(delay=0)
+    agent = ResearchAgent(async_client=client, pack_chunks=True)
+    agent.chunk_retries = 1
+    agent.gather_information_incremental("solar power", ["query"], documents)
+    assert agent.chunk_progress["report.txt"]["failed"] == 1
+    assert client.calls == 1 + 2
+    assert agent.last_run["documents"] == {}
+    
+    agent.async_client = client = CountingAsyncClient(delay=0)
+    facts, _ = agent.gather_information_incremental("solar power", ["query"], documents, previous_run=agent.last_run)
+    assert client.calls == 1
+    assert any(fact.get("document") == "report.txt" for fact in facts)
+    assert len(agent.last_run["documents"]) == 1
@@ -0,0 +1,63 @@
+import json
+import pytest
+from src.utils.structured_output import compile_validator, parse_json, validate_facts
+
+FACTS = {"facts": [
+    {"fact": "Solar capacity doubled", "source": "https://example.org/a", "category": "Energy"},
+    {"fact": "Wind output fell, then rose", "source": "https://example.org/b", "category": "Energy"}
+]}
+
+def test_parses_complete_json():
+    assert parse_json(json.dumps(FACTS), validate=validate_facts) == FACTS
+
+def test_strips_code_fence():
+    assert parse_json("```json\n" + json.dumps(FACTS) + "\n```") == FACTS
+
+def test_repairs_answer_truncated_inside_a_fact():
+    text = json.dumps(FACTS)
+    truncated = text[:text.index("Wind") + 6]
+    
+    result = parse_json(truncated, validate=validate_facts)
+    
+    assert result == {"facts": FACTS["facts"][:1]}
+
+def test_repairs_answer_truncated_after_a_comma():
+    text = json.dumps(FACTS)
+    truncated = text[:text.index("}, {") + 2]
+    
+    assert parse_json(truncated, validate=validate_facts) == {"facts": FACTS["facts"][:1]}
+
+def test_repair_skips_candidates_that_fail_validation():
+    # Cut inside the second fact's keys: closing it there would leave a fact without "category"
+    text = json.dumps(FACTS)
+    truncated = text[:text.index('"category"', text.index("Wind"))]
+    
+    assert parse_json(truncated, validate=validate_facts) == {"facts": FACTS["facts"][:1]}
+
+def test_brackets_inside_strings_are_ignored():
+    facts = {"facts": [{"fact": "Values like [1, 2} are quoted", "source": "s", "category": "c"}]}
+    truncated = json.dumps(facts)[:-2] + ', {"fact": "cut'
+    
+    assert parse_json(truncated, validate=validate_facts) == facts
+
+def test_validation_error_on_complete_json_is_raised():
+    with pytest.raises(ValueError, match="missing required property 'facts'"):
+        parse_json('{"items": []}', validate=validate_facts)
+
+@pytest.mark.parametrize("text", ["", "not json at all", "```\n```"])
+def test_unrepairable_text_raises(text):
+    with pytest.raises(ValueError):
+        parse_json(text)
+
+def test_compiled_validator_reports_the_failing_path():
+    validate = compile_validator({"type": "object", "properties": {"n": {"type": "integer"}}})
+    
+    validate({"n": 1})
+    with pytest.raises(ValueError, match=r"\$\.n: expected integer, got bool"):
+        validate({"n": True})
+
+def test_return_repaired_reports_whether_text_was_cut():
+    text = json.dumps(FACTS)
+    
+    assert parse_json(text, return_repaired=True) == (FACTS, False)
+    assert parse_json(text[:text.index("Wind")], validate_facts, return_repaired=True) == ({"facts": FACTS["facts"][:1]}, True)
@@ -0,0 +1,52 @@
+import logging
+
+import pytest
+
+from src.utils import token_budget
+from src.utils.token_budget import TokenBudget
+
+
+@pytest.fixture
+def no_tokenizer(monkeypatch):
+    monkeypatch.setattr(token_budget, "get_encoding", lambda: None)
+
+
+def test_load_encoding_defaults_cache_dir(monkeypatch):
+    monkeypatch.delenv("TIKTOKEN_CACHE_DIR", raising=False)
+    token_budget._load_encoding.cache_clear()
+    try:
+        token_budget._load_encoding("no_such_encoding")
+    finally:
+        token_budget._load_encoding.cache_clear()
+    
+    assert token_budget.os.environ["TIKTOKEN_CACHE_DIR"] == token_budget.DEFAULT_TIKTOKEN_CACHE_DIR
+
+
+def test_estimates_from_characters_without_tokenizer(no_tokenizer):
+    assert token_budget.count_tokens("a" * 10) == 3
+    assert token_budget.truncate_to_tokens("a" * 10, 2) == "a" * 8
+
+
+def test_plan_call_warns_when_estimating(no_tokenizer, caplog):
+    messages = [{"role": "user", "content": "hello"}]
+    
+    with caplog.at_level(logging.INFO, logger="research_agents"):
+        TokenBudget(context_window=1000, max_output_tokens=100).plan_call("test.call", messages, 500)
+        TokenBudget(context_window=1000, max_output_tokens=100).plan_call("test.call", messages, 500)
+    
+    warnings = [r for r in caplog.records if r.levelno == logging.WARNING]
+    assert len(warnings) == 2
+    assert "tokenizer unavailable" in warnings[0].getMessage()
+
+
+def test_plan_call_logs_info_with_tokenizer(monkeypatch, caplog):
+    encoding = type("Encoding", (), {"encode": lambda self, text, disallowed_special=(): text.split()})()
+    monkeypatch.setattr(token_budget, "get_encoding", lambda: encoding)
+    
+    with caplog.at_level(logging.INFO, logger="research_agents"):
+        max_tokens = TokenBudget(context_window=1000, max_output_tokens=100).plan_call(
+            "test.call", [{"role": "user", "content": "two words"}], 500
+        )
+    
+    assert max_tokens == 100
+    assert [r.levelno for r in caplog.records] == [logging.INFO]
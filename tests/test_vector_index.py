@@ -0,0 +1,49 @@
+import math
+from src.utils.document_handler import chunk_document
+from src.utils.vector_index import HashingVectorizer, VectorIndex
+
+SOLAR = "Solar panels convert sunlight into electricity.\n\nPanel prices fell sharply over the decade."
+WIND = "Offshore wind farms generate electricity at sea.\n\nTurbines keep getting taller."
+
+def _index():
+    index = VectorIndex(HashingVectorizer(n_features=1 << 12))
+    for name, text in (("solar.txt", SOLAR), ("wind.txt", WIND)):
+        index.add(name, text, chunk_document(text, max_chunk_tokens=12))
+    return index
+
+def test_vectorizer_is_deterministic_and_damps_counts():
+    vectorizer = HashingVectorizer(n_features=1 << 12, bigrams=False)
+    indices, weights = vectorizer.transform("wind wind wind solar")
+    
+    again_indices, again_weights = vectorizer.transform("wind wind wind solar")
+    assert list(indices) == list(again_indices) and list(weights) == list(again_weights)
+    assert sorted(weights) == [1.0, 1 + math.log(3)]
+
+def test_search_returns_the_matching_passage_first():
+    results = _index().search("how tall are the turbines", 3)
+    
+    name, chunk, score = results[0]
+    assert name == "wind.txt"
+    assert chunk.text == "Turbines keep getting taller."
+    assert score > 0
+    assert all(result_score > 0 for _, _, result_score in results)
+
+def test_search_limits_results_and_skips_unrelated_passages():
+    index = _index()
+    
+    assert len(index.search("electricity", 1)) == 1
+    assert {name for name, _, _ in index.search("electricity", 5)} == {"solar.txt", "wind.txt"}
+    assert index.search("printing press", 5) == []
+
+def test_documents_can_be_replaced_and_removed():
+    index = _index()
+    passages = len(index)
+    
+    index.add("wind.txt", WIND, chunk_document(WIND, max_chunk_tokens=12))
+    assert len(index) == passages
+    index.add("wind.txt", "Hydro dams store water.", chunk_document("Hydro dams store water."))
+    assert index.search("turbines", 5) == []
+    assert index.search("dams", 5)[0][0] == "wind.txt"
+    index.remove("wind.txt")
+    assert index.search("dams", 5) == []
+    assert VectorIndex().search("anything", 3) == []